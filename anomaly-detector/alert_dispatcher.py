@@ -0,0 +1,209 @@
+import logging
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Queue marker telling one sender thread to exit
+_STOP = object()
+
+
+class AlertDispatcher:
+    """Bounded alert queue drained by background sender threads"""
+
+    def __init__(
+        self,
+        alert_manager,
+        max_queue: int = 1000,
+        workers: int = 2,
+        batch_size: int = 1,
+        linger_seconds: float = 0.5
+    ):
+        """
+        Initialize alert dispatcher
+
+        generate_and_send_alert only logs the anomaly and enqueues its
+        payload (if the alert manager does not suppress it), so detection
+        never waits on the webhook. Sender threads take up to
+        batch_size alerts, waiting at most linger_seconds for a batch to
+        fill, and post them through the alert manager. When the queue is
+        full new alerts are dropped and counted.
+
+        Args:
+            alert_manager: AlertManager that formats and sends the alerts
+            max_queue: Maximum number of alerts waiting to be sent
+            workers: Number of sender threads
+            batch_size: Maximum alerts per webhook request; above 1 the
+                receiver must accept a JSON array
+            linger_seconds: Time a sender waits for more alerts to batch
+        """
+        self.alert_manager = alert_manager
+        self.batch_size = max(1, batch_size)
+        self.linger_seconds = linger_seconds
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._stats = {
+            'enqueued': 0,
+            'dropped': 0,
+            'sent': 0,
+            'failed': 0,
+            'batches': 0,
+            'max_queue_depth': 0,
+            'max_latency_seconds': 0.0
+        }
+        self._threads = [
+            threading.Thread(target=self._run, name=f'alert-sender-{i}', daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(
+            f"Initialized AlertDispatcher with max_queue={max_queue}, workers={workers}, "
+            f"batch_size={batch_size}, linger={linger_seconds}s"
+        )
+
+    def generate_and_send_alert(self, anomaly_result: Dict, service_name: str = 'demo-app') -> bool:
+        """
+        Log an anomaly and queue its alert without blocking
+
+        Args:
+            anomaly_result: Result from anomaly detection
+            service_name: Name of the service being monitored
+
+        Returns:
+            True if the alert was queued, False if it was suppressed or the queue was full
+        """
+        self.alert_manager.log_anomaly(anomaly_result, service_name)
+        return self._enqueue(self.alert_manager.prepare_alert(anomaly_result, service_name), anomaly_result)
+
+    def resolve_alert(self, result: Dict, service_name: str = 'demo-app') -> bool:
+        """
+        Queue a resolved notification if a normal result ends a firing alert
+
+        Args:
+            result: Non-anomalous result from anomaly detection
+            service_name: Name of the service being monitored
+
+        Returns:
+            True if a resolved notification was queued, False otherwise
+        """
+        return self._enqueue(self.alert_manager.prepare_resolved(result, service_name), result)
+
+    def _enqueue(self, payload: Optional[Dict], result: Dict) -> bool:
+        """Queue a formatted payload, counting a drop when the queue is full"""
+        if payload is None:
+            return False
+        try:
+            self._queue.put_nowait((time.monotonic(), payload))
+        except queue.Full:
+            self.alert_manager.record_delivery(payload, False)
+            with self._lock:
+                self._stats['dropped'] += 1
+            logger.warning(f"Alert queue full, dropping alert for {result.get('metric')}")
+            return False
+
+        depth = self._queue.qsize()
+        with self._lock:
+            self._stats['enqueued'] += 1
+            self._stats['max_queue_depth'] = max(self._stats['max_queue_depth'], depth)
+        return True
+
+    def _next_batch(self) -> Tuple[List[Tuple], bool]:
+        """
+        Wait for one alert, then gather more until the batch is full or the linger expires
+
+        Returns:
+            Tuple of (queued items, whether the thread was asked to stop)
+        """
+        item = self._queue.get()
+        if item is _STOP:
+            return [], True
+
+        batch = [item]
+        deadline = time.monotonic() + self.linger_seconds
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        """Sender thread loop"""
+        stop = False
+        while not stop:
+            batch, stop = self._next_batch()
+            if batch:
+                self._send(batch)
+
+    def _send(self, batch: List[Tuple]):
+        """Post one batch, recording the outcome"""
+        try:
+            payloads = [payload for _, payload in batch]
+            if len(payloads) == 1:
+                success = self.alert_manager.send_webhook(payloads[0])
+            else:
+                success = self.alert_manager.send_batch(payloads)
+        except Exception as e:
+            logger.error(f"Error dispatching {len(batch)} alerts: {e}")
+            success = False
+        for _, payload in batch:
+            self.alert_manager.record_delivery(payload, success)
+
+        latency = time.monotonic() - batch[0][0]
+        with self._lock:
+            self._stats['sent' if success else 'failed'] += len(batch)
+            self._stats['batches'] += 1
+            self._stats['max_latency_seconds'] = max(self._stats['max_latency_seconds'], latency)
+        if not success:
+            logger.error(f"Failed to send {len(batch)} alerts")
+
+    def stats(self) -> Dict:
+        """
+        Backpressure counters since start
+
+        Returns:
+            Dictionary with the current queue depth, enqueued, dropped, sent,
+            failed, batches, max_queue_depth and max_latency_seconds
+        """
+        with self._lock:
+            return {'queue_depth': self._queue.qsize(), **self._stats}
+
+    def log_stats(self):
+        """Log the backpressure counters"""
+        stats = self.stats()
+        message = (
+            f"Alert queue: depth {stats['queue_depth']} (max {stats['max_queue_depth']}), "
+            f"{stats['sent']} sent, {stats['failed']} failed, {stats['dropped']} dropped "
+            f"in {stats['batches']} batches, max latency {stats['max_latency_seconds']:.2f}s"
+        )
+        if stats['dropped']:
+            logger.warning(message)
+        else:
+            logger.info(message)
+
+    def close(self, timeout: float = 10.0):
+        """
+        Send what is queued and stop the sender threads
+
+        Args:
+            timeout: Seconds to wait for the queue to drain
+        """
+        deadline = time.monotonic() + timeout
+        for _ in self._threads:
+            try:
+                self._queue.put(_STOP, timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Full:
+                break
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        if self._queue.qsize():
+            logger.warning(f"Stopped with {self._queue.qsize()} alerts unsent")
@@ -1,22 +1,38 @@
 import logging
 import json
 import requests
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Union
 from datetime import datetime
+from alert_state import AlertStateStore, fingerprint
 
 logger = logging.getLogger(__name__)
 
+SUCCESS_STATUSES = (200, 201, 202)
+
+# Webhook timeout in seconds, independent of the shared session's query timeout
+WEBHOOK_TIMEOUT_SECONDS = 10
+
 class AlertManager:
     """Manages alert generation and notification"""
     
-    def __init__(self, webhook_url: str):
+    def __init__(
+        self,
+        webhook_url: str,
+        session: Optional[requests.Session] = None,
+        state_store: Optional[AlertStateStore] = None
+    ):
         """
         Initialize alert manager
         
         Args:
             webhook_url: URL to send alert webhooks
+            session: Optional shared session (e.g. PooledSession) for webhooks
+            state_store: Optional AlertStateStore; when set, repeats of a firing
+                alert are suppressed and resolved notifications are sent
         """
         self.webhook_url = webhook_url
+        self.session = session
+        self.state_store = state_store
         logger.info(f"Initialized AlertManager with webhook URL: {webhook_url}")
     
     def format_alert_payload(
@@ -43,13 +59,16 @@ class AlertManager:
         severity = anomaly_result.get('severity', 'medium')
         confidence = anomaly_result.get('confidence', 0)
         timestamp = anomaly_result.get('timestamp', datetime.now().isoformat())
+        series = anomaly_result.get('series', '')
+        labels = anomaly_result.get('labels') or {}
+        service_name = labels.get('service_name', service_name)
         
         # Build alert title
-        title = f"Anomaly Detected: {metric}"
+        title = f"Anomaly Detected: {metric}{series}"
         
         # Build alert description
         description = (
-            f"An anomaly has been detected in metric '{metric}' for service '{service_name}'.\n\n"
+            f"An anomaly has been detected in metric '{metric}{series}' for service '{service_name}'.\n\n"
             f"**Details:**\n"
             f"- Expected Value: {expected_value:.2f}\n"
             f"- Actual Value: {actual_value:.2f}\n"
@@ -62,12 +81,26 @@ class AlertManager:
             f"historical patterns. This may indicate a performance degradation or anomalous behavior."
         )
         
+        # Short anomalies between cycles found by backfill scoring
+        backfill = anomaly_result.get('backfill') or {}
+        intervals = backfill.get('intervals') or []
+        if intervals:
+            worst = backfill['worst']
+            description += (
+                f"\n\n**Since the last check:**\n"
+                f"- Anomalous intervals: "
+                + ", ".join(f"{i['start']} to {i['end']} ({i['points']} points)" for i in intervals)
+                + f"\n- Worst point: {worst['actual_value']:.2f} at {worst['timestamp']} "
+                f"(expected {worst['expected_value']:.2f}, {worst['deviation_std']:.2f} standard deviations)"
+            )
+        
         # Build alert payload (Grafana-compatible format)
         payload = {
             'title': title,
             'message': description,
             'severity': severity,
             'tags': {
+                **labels,
                 'service': service_name,
                 'metric': metric,
                 'anomaly_type': 'ml_detection',
@@ -79,7 +112,9 @@ class AlertManager:
                 'deviation': str(deviation),
                 'deviation_std': str(deviation_std),
                 'confidence': str(confidence),
-                'timestamp': timestamp
+                'timestamp': timestamp,
+                'fingerprint': fingerprint(anomaly_result),
+                **({'anomalous_intervals': str(len(intervals))} if intervals else {})
             },
             'state': 'alerting',
             'evalMatches': [
@@ -87,6 +122,7 @@ class AlertManager:
                     'metric': metric,
                     'value': actual_value,
                     'tags': {
+                        **labels,
                         'service': service_name
                     }
                 }
@@ -96,44 +132,199 @@ class AlertManager:
         logger.debug(f"Formatted alert payload for {metric}")
         return payload
     
-    def send_webhook(self, payload: Dict) -> bool:
+    def format_resolved_payload(
+        self,
+        result: Dict,
+        service_name: str = 'demo-app'
+    ) -> Dict:
+        """
+        Format the notification that a firing alert has resolved
+        
+        Args:
+            result: Latest non-anomalous result for the series
+            service_name: Name of the service being monitored
+            
+        Returns:
+            Alert payload with state 'ok'
+        """
+        metric = result.get('metric', 'unknown')
+        series = result.get('series', '')
+        actual_value = result.get('actual_value', 0)
+        expected_value = result.get('expected_value', 0)
+        timestamp = result.get('timestamp', datetime.now().isoformat())
+        labels = result.get('labels') or {}
+        service_name = labels.get('service_name', service_name)
+        
+        return {
+            'title': f"Resolved: {metric}{series}",
+            'message': (
+                f"Metric '{metric}{series}' for service '{service_name}' is back within its "
+                f"expected range.\n\n"
+                f"**Details:**\n"
+                f"- Expected Value: {expected_value:.2f}\n"
+                f"- Actual Value: {actual_value:.2f}\n"
+                f"- Timestamp: {timestamp}"
+            ),
+            'severity': 'ok',
+            'tags': {
+                **labels,
+                'service': service_name,
+                'metric': metric,
+                'anomaly_type': 'ml_detection',
+                'source': 'anomaly_detector'
+            },
+            'annotations': {
+                'expected_value': str(expected_value),
+                'actual_value': str(actual_value),
+                'timestamp': timestamp,
+                'fingerprint': fingerprint(result)
+            },
+            'state': 'ok',
+            'evalMatches': []
+        }
+    
+    def prepare_alert(
+        self,
+        anomaly_result: Dict,
+        service_name: str = 'demo-app'
+    ) -> Optional[Dict]:
+        """
+        Alert payload for an anomaly, unless the state store suppresses it
+        
+        Args:
+            anomaly_result: Result from anomaly detection
+            service_name: Name of the service being monitored
+            
+        Returns:
+            Alert payload, or None if the alert is already firing and no
+            re-send is due; pass the payload to record_delivery once sent
+        """
+        notification = None
+        if self.state_store is not None:
+            notification = self.state_store.on_anomaly(anomaly_result)
+            if notification is None:
+                logger.info(
+                    f"Alert for {anomaly_result.get('metric')}{anomaly_result.get('series', '')} "
+                    f"already firing, not re-sent"
+                )
+                return None
+        
+        payload = self.format_alert_payload(anomaly_result, service_name)
+        if notification is not None:
+            payload['annotations']['notification'] = notification
+        return payload
+    
+    def prepare_resolved(
+        self,
+        result: Dict,
+        service_name: str = 'demo-app'
+    ) -> Optional[Dict]:
+        """
+        Resolved payload for a normal result, if it resolves a firing alert
+        
+        Args:
+            result: Non-anomalous result from anomaly detection
+            service_name: Name of the service being monitored
+            
+        Returns:
+            Resolved payload, or None if nothing resolved; pass the payload
+            to record_delivery once sent
+        """
+        if self.state_store is None or not self.state_store.on_normal(result):
+            return None
+        return self.format_resolved_payload(result, service_name)
+    
+    def record_delivery(self, payload: Dict, success: bool):
+        """
+        Commit or roll back the notification state of a prepared payload
+        
+        A failed, dropped or expired notification leaves the alert unsent,
+        so the next result for the series sends it again.
+        
+        Args:
+            payload: Payload from prepare_alert or prepare_resolved
+            success: Whether the receiver accepted it
+        """
+        key = payload.get('annotations', {}).get('fingerprint')
+        if self.state_store is None or key is None:
+            return
+        if success:
+            self.state_store.delivered(key, payload['state'], payload.get('severity'))
+        else:
+            self.state_store.failed(key, payload['state'])
+    
+    def send_webhook(self, payload: Union[Dict, List[Dict]], url: Optional[str] = None) -> bool:
         """
         Send alert webhook to configured endpoint
         
         Args:
-            payload: Alert payload to send
+            payload: Alert payload to send, or a list of payloads for
+                receivers that accept several alerts per request
+            url: Webhook URL, defaults to the configured one
             
         Returns:
             True if webhook was sent successfully, False otherwise
         """
+        return self.post_webhook(payload, url) in SUCCESS_STATUSES
+    
+    def post_webhook(self, payload: Union[Dict, List[Dict]], url: Optional[str] = None) -> Optional[int]:
+        """
+        Send alert webhook and report the receiver's answer
+        
+        Args:
+            payload: Alert payload to send, or a list of payloads
+            url: Webhook URL, defaults to the configured one
+            
+        Returns:
+            HTTP status code, or None if no response was received
+        """
+        url = url or self.webhook_url
         try:
-            logger.info(f"Sending alert webhook to {self.webhook_url}")
+            logger.info(f"Sending alert webhook to {url}")
             
-            response = requests.post(
-                self.webhook_url,
+            http = self.session if self.session is not None else requests
+            response = http.post(
+                url,
                 json=payload,
                 headers={'Content-Type': 'application/json'},
-                timeout=10
+                timeout=WEBHOOK_TIMEOUT_SECONDS
             )
             
-            if response.status_code in [200, 201, 202]:
+            if response.status_code in SUCCESS_STATUSES:
                 logger.info(f"Alert webhook sent successfully: {response.status_code}")
-                return True
             else:
                 logger.warning(
                     f"Alert webhook returned non-success status: {response.status_code} - {response.text}"
                 )
-                return False
+            return response.status_code
                 
         except requests.exceptions.Timeout:
             logger.error("Alert webhook timed out")
-            return False
+            return None
         except requests.exceptions.ConnectionError as e:
             logger.error(f"Alert webhook connection error: {e}")
-            return False
+            return None
         except Exception as e:
             logger.error(f"Error sending alert webhook: {e}")
-            return False
+            return None
+    
+    def send_batch(self, payloads: List[Dict]) -> bool:
+        """
+        Send several alerts in one request as a JSON array
+        
+        Only for receivers that accept a list body (e.g. Alertmanager's
+        /api/v2/alerts); a single payload is sent on its own.
+        
+        Args:
+            payloads: Alert payloads to send
+            
+        Returns:
+            True if the request succeeded, False otherwise
+        """
+        if len(payloads) == 1:
+            return self.send_webhook(payloads[0])
+        logger.info(f"Sending {len(payloads)} alerts in one request")
+        return self.send_webhook(payloads)
     
     def log_anomaly(self, anomaly_result: Dict, service_name: str = 'demo-app'):
         """
@@ -143,7 +334,7 @@ class AlertManager:
             anomaly_result: Result from anomaly detection
             service_name: Name of the service being monitored
         """
-        metric = anomaly_result.get('metric', 'unknown')
+        metric = anomaly_result.get('metric', 'unknown') + anomaly_result.get('series', '')
         severity = anomaly_result.get('severity', 'medium')
         actual_value = anomaly_result.get('actual_value', 0)
         expected_value = anomaly_result.get('expected_value', 0)
@@ -182,16 +373,19 @@ class AlertManager:
             service_name: Name of the service being monitored
             
         Returns:
-            True if alert was sent successfully, False otherwise
+            True if alert was sent successfully, False if it failed or was suppressed
         """
         # Log the anomaly
         self.log_anomaly(anomaly_result, service_name)
         
-        # Format alert payload
-        payload = self.format_alert_payload(anomaly_result, service_name)
+        # Format alert payload, skipping repeats of a firing alert
+        payload = self.prepare_alert(anomaly_result, service_name)
+        if payload is None:
+            return False
         
         # Send webhook
         success = self.send_webhook(payload)
+        self.record_delivery(payload, success)
         
         if success:
             logger.info(f"Alert generated and sent for {anomaly_result.get('metric')}")
@@ -199,3 +393,30 @@ class AlertManager:
             logger.error(f"Failed to send alert for {anomaly_result.get('metric')}")
         
         return success
+    
+    def resolve_alert(
+        self,
+        result: Dict,
+        service_name: str = 'demo-app'
+    ) -> bool:
+        """
+        Send a resolved notification if a normal result ends a firing alert
+        
+        Args:
+            result: Non-anomalous result from anomaly detection
+            service_name: Name of the service being monitored
+            
+        Returns:
+            True if a resolved notification was sent successfully, False otherwise
+        """
+        payload = self.prepare_resolved(result, service_name)
+        if payload is None:
+            return False
+        
+        success = self.send_webhook(payload)
+        self.record_delivery(payload, success)
+        if success:
+            logger.info(f"Resolved alert sent for {result.get('metric')}{result.get('series', '')}")
+        else:
+            logger.error(f"Failed to send resolved alert for {result.get('metric')}")
+        return success
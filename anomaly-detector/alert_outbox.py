@@ -0,0 +1,443 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+from alert_manager import SUCCESS_STATUSES
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_FILE = 'alert_outbox.jsonl'
+
+# Client errors worth retrying; any other 4xx will fail the same way again
+RETRYABLE_CLIENT_ERRORS = (408, 429)
+
+
+def is_permanent_failure(status: Optional[int]) -> bool:
+    """
+    Whether a webhook response means the alert can never be delivered as is
+
+    Args:
+        status: HTTP status code, None if no response was received
+
+    Returns:
+        True for 4xx responses other than 408 and 429
+    """
+    return status is not None and 400 <= status < 500 and status not in RETRYABLE_CLIENT_ERRORS
+
+
+class OutboxEntry:
+    """One alert waiting for delivery"""
+
+    def __init__(self, entry_id: int, destination: str, payload: Dict, created: float):
+        """
+        Initialize entry
+
+        Args:
+            entry_id: Sequence number within the outbox
+            destination: Webhook URL the alert goes to
+            payload: Alert payload
+            created: Time the alert was written to the outbox
+        """
+        self.id = entry_id
+        self.destination = destination
+        self.payload = payload
+        self.created = created
+        self.attempts = 0
+        self.next_attempt = 0.0
+        # Taken by a sender thread
+        self.in_flight = False
+
+
+class AlertOutbox:
+    """Append-only alert log on disk, drained by background senders with retries"""
+
+    def __init__(
+        self,
+        alert_manager,
+        directory: str,
+        workers: int = 2,
+        per_destination: int = 2,
+        base_backoff_seconds: float = 1.0,
+        max_backoff_seconds: float = 300.0,
+        max_age_seconds: float = 86400,
+        compact_after: int = 100
+    ):
+        """
+        Initialize alert outbox
+
+        generate_and_send_alert appends the alert to the outbox file and
+        returns, so detection never waits on the webhook. Sender threads post
+        the oldest due alert, at most per_destination at a time to one
+        webhook, and append an acknowledgement once it is accepted. A failed
+        delivery is retried after an exponential backoff with jitter until
+        the alert is older than max_age_seconds; one the receiver rejects
+        with a client error (4xx other than 408 and 429) is dropped at once.
+        The alert deduplication state is only committed once the receiver
+        accepts the alert, and rolled back when it is dropped. Records are
+        fsynced by a background thread, so detection never waits on the
+        disk. Alerts still pending at shutdown are delivered after the next start. Once
+        compact_after acknowledgements have accumulated the file is
+        rewritten with only the pending alerts.
+
+        Args:
+            alert_manager: AlertManager that formats and sends the alerts
+            directory: Directory holding the outbox file; mount a persistent
+                volume for delivery across restarts
+            workers: Number of sender threads
+            per_destination: Maximum concurrent requests to one webhook
+            base_backoff_seconds: Delay before the first retry
+            max_backoff_seconds: Upper bound of the retry delay
+            max_age_seconds: Age after which an undelivered alert is dropped
+            compact_after: Acknowledgements that trigger a compaction
+        """
+        self.alert_manager = alert_manager
+        self.path = os.path.join(directory, OUTBOX_FILE)
+        self.per_destination = max(1, per_destination)
+        self.base_backoff_seconds = base_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.max_age_seconds = max_age_seconds
+        self.compact_after = max(1, compact_after)
+        # Delivery outcomes since start: enqueued, sent, retried, rejected, expired, compactions
+        self.counts: Counter = Counter()
+        self._entries: Dict[int, OutboxEntry] = {}
+        self._in_flight: Counter = Counter()
+        self._acked_since_compact = 0
+        self._next_id = 1
+        self._stopping = False
+        self._cond = threading.Condition()
+        # Set when records were appended since the last fsync
+        self._unsynced = threading.Event()
+
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+        created = not os.path.exists(self.path)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        if created:
+            self._fsync_directory()
+        if self._entries:
+            logger.info(f"Resuming delivery of {len(self._entries)} alerts from {self.path}")
+
+        self._threads = [
+            threading.Thread(target=self._run, name=f'alert-outbox-{i}', daemon=True)
+            for i in range(max(1, workers))
+        ]
+        self._syncer = threading.Thread(target=self._sync_loop, name='alert-outbox-sync', daemon=True)
+        for thread in self._threads + [self._syncer]:
+            thread.start()
+        logger.info(
+            f"Initialized AlertOutbox in {directory} with workers={workers}, "
+            f"per_destination={per_destination}, max_backoff={max_backoff_seconds}s"
+        )
+
+    def _load(self):
+        """Replay the outbox file, keeping alerts without an acknowledgement"""
+        if not os.path.exists(self.path):
+            return
+        acked = 0
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A write cut short by a crash leaves a partial last line
+                    logger.warning(f"Skipping unreadable outbox record in {self.path}")
+                    continue
+                self._next_id = max(self._next_id, record['id'] + 1)
+                if record['op'] == 'add':
+                    self._entries[record['id']] = OutboxEntry(
+                        record['id'], record['destination'], record['payload'], record['created']
+                    )
+                elif self._entries.pop(record['id'], None) is not None:
+                    acked += 1
+        self._acked_since_compact = acked
+
+    def _append(self, record: Dict):
+        """Write one record and schedule its fsync; caller holds the lock"""
+        self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+        self._unsynced.set()
+
+    def _sync(self):
+        """Fsync the records appended so far, without holding the lock during the disk write"""
+        with self._cond:
+            if self._file.closed:
+                return
+            # A duplicate stays valid even if compaction swaps the file meanwhile
+            fd = os.dup(self._file.fileno())
+        try:
+            os.fsync(fd)
+        except OSError as e:
+            logger.error(f"Could not fsync alert outbox: {e}")
+        finally:
+            os.close(fd)
+
+    def _sync_loop(self):
+        """Fsync thread loop; records appended while it syncs are batched into the next fsync"""
+        while True:
+            self._unsynced.wait()
+            self._unsynced.clear()
+            self._sync()
+            if self._stopping:
+                return
+
+    def _fsync_directory(self):
+        """Make the creation or replacement of the outbox file durable"""
+        fd = os.open(os.path.dirname(self.path), os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def put(self, payload: Optional[Dict], destination: Optional[str] = None) -> bool:
+        """
+        Write an alert to the outbox for background delivery
+
+        Args:
+            payload: Alert payload, None is ignored
+            destination: Webhook URL, defaults to the alert manager's
+
+        Returns:
+            True if the alert was written, False otherwise
+        """
+        if payload is None:
+            return False
+        destination = destination or self.alert_manager.webhook_url
+        with self._cond:
+            entry = OutboxEntry(self._next_id, destination, payload, time.time())
+            try:
+                self._append({
+                    'op': 'add', 'id': entry.id, 'destination': destination,
+                    'payload': payload, 'created': entry.created
+                })
+            except (OSError, TypeError, ValueError) as e:
+                logger.error(f"Could not write alert to outbox: {e}")
+                return False
+            self._next_id += 1
+            self._entries[entry.id] = entry
+            self.counts['enqueued'] += 1
+            self._cond.notify()
+        return True
+
+    def generate_and_send_alert(self, anomaly_result: Dict, service_name: str = 'demo-app') -> bool:
+        """
+        Log an anomaly and write its alert to the outbox without blocking
+
+        Args:
+            anomaly_result: Result from anomaly detection
+            service_name: Name of the service being monitored
+
+        Returns:
+            True if the alert was written, False if it was suppressed or the write failed
+        """
+        self.alert_manager.log_anomaly(anomaly_result, service_name)
+        return self._accept(self.alert_manager.prepare_alert(anomaly_result, service_name))
+
+    def resolve_alert(self, result: Dict, service_name: str = 'demo-app') -> bool:
+        """
+        Write a resolved notification if a normal result ends a firing alert
+
+        Args:
+            result: Non-anomalous result from anomaly detection
+            service_name: Name of the service being monitored
+
+        Returns:
+            True if a resolved notification was written, False otherwise
+        """
+        return self._accept(self.alert_manager.prepare_resolved(result, service_name))
+
+    def _accept(self, payload: Optional[Dict]) -> bool:
+        """Write a prepared payload; its notification state stays pending until delivery"""
+        if payload is None:
+            return False
+        written = self.put(payload)
+        if not written:
+            self.alert_manager.record_delivery(payload, False)
+        return written
+
+    def _backoff(self, attempts: int) -> float:
+        """Exponential delay with jitter, so retries after an outage spread out"""
+        delay = min(self.max_backoff_seconds, self.base_backoff_seconds * 2 ** (attempts - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _next_entry(self) -> Optional[OutboxEntry]:
+        """
+        Wait for the oldest due alert whose destination has a free slot
+
+        Returns:
+            Entry to deliver, or None when the outbox is stopping
+        """
+        with self._cond:
+            while not self._stopping:
+                now = time.time()
+                wake = None
+                for entry in self._entries.values():
+                    if entry.in_flight:
+                        continue
+                    if entry.next_attempt > now:
+                        wake = min(wake or entry.next_attempt, entry.next_attempt)
+                        continue
+                    if self._in_flight[entry.destination] >= self.per_destination:
+                        continue
+                    entry.in_flight = True
+                    self._in_flight[entry.destination] += 1
+                    return entry
+                self._cond.wait(None if wake is None else wake - now)
+        return None
+
+    def _run(self):
+        """Sender thread loop"""
+        while True:
+            entry = self._next_entry()
+            if entry is None:
+                return
+            self._deliver(entry)
+
+    def _deliver(self, entry: OutboxEntry):
+        """Post one alert and acknowledge, drop or reschedule it"""
+        try:
+            status = self.alert_manager.post_webhook(entry.payload, url=entry.destination)
+        except Exception as e:
+            logger.error(f"Error delivering alert {entry.id}: {e}")
+            status = None
+
+        if status in SUCCESS_STATUSES:
+            outcome = 'sent'
+        elif is_permanent_failure(status):
+            logger.error(
+                f"Dropping alert {entry.id}: {entry.destination} rejected it with status {status}"
+            )
+            outcome = 'rejected'
+        elif time.time() - entry.created > self.max_age_seconds:
+            outcome = 'expired'
+        else:
+            outcome = None
+        if outcome is not None:
+            # Settle the dedup state before the outcome becomes visible in stats
+            self.alert_manager.record_delivery(entry.payload, outcome == 'sent')
+
+        with self._cond:
+            entry.in_flight = False
+            self._in_flight[entry.destination] -= 1
+            if outcome is not None:
+                self._ack(entry, outcome)
+            else:
+                entry.attempts += 1
+                entry.next_attempt = time.time() + self._backoff(entry.attempts)
+                self.counts['retried'] += 1
+                logger.warning(
+                    f"Delivery of alert {entry.id} to {entry.destination} failed "
+                    f"(attempt {entry.attempts}), retrying in {entry.next_attempt - time.time():.1f}s"
+                )
+            self._cond.notify_all()
+
+    def _ack(self, entry: OutboxEntry, outcome: str):
+        """Record a delivered, rejected or expired alert; caller holds the lock"""
+        if outcome == 'expired':
+            logger.error(f"Dropping alert {entry.id} after {entry.attempts} attempts, older than max age")
+        del self._entries[entry.id]
+        self.counts[outcome] += 1
+        try:
+            self._append({'op': 'ack', 'id': entry.id})
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not acknowledge alert {entry.id} in outbox: {e}")
+        self._acked_since_compact += 1
+        if self._acked_since_compact >= self.compact_after:
+            self._compact()
+
+    def _compact(self):
+        """Rewrite the outbox with only pending alerts; caller holds the lock"""
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for entry in self._entries.values():
+                    f.write(json.dumps({
+                        'op': 'add', 'id': entry.id, 'destination': entry.destination,
+                        'payload': entry.payload, 'created': entry.created
+                    }) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self._file.close()
+            os.replace(tmp_path, self.path)
+            self._fsync_directory()
+        except OSError as e:
+            logger.error(f"Outbox compaction failed: {e}")
+        finally:
+            if self._file.closed:
+                self._file = open(self.path, 'a', encoding='utf-8')
+        self._acked_since_compact = 0
+        self.counts['compactions'] += 1
+        logger.debug(f"Compacted outbox to {len(self._entries)} pending alerts")
+
+    def pending(self) -> List[Dict]:
+        """
+        Payloads not yet delivered, oldest first
+
+        Returns:
+            List of alert payloads
+        """
+        with self._cond:
+            return [entry.payload for entry in self._entries.values()]
+
+    def stats(self) -> Dict:
+        """
+        Delivery counters since start
+
+        Returns:
+            Dictionary with pending, oldest_pending_seconds, enqueued, sent,
+            retried, rejected, expired and compactions
+        """
+        with self._cond:
+            oldest = min((entry.created for entry in self._entries.values()), default=None)
+            return {
+                'pending': len(self._entries),
+                'oldest_pending_seconds': time.time() - oldest if oldest is not None else 0.0,
+                **{key: self.counts[key] for key in ('enqueued', 'sent', 'retried', 'rejected', 'expired', 'compactions')}
+            }
+
+    def log_stats(self):
+        """Log the delivery counters"""
+        stats = self.stats()
+        message = (
+            f"Alert outbox: {stats['pending']} pending (oldest {stats['oldest_pending_seconds']:.0f}s), "
+            f"{stats['sent']} sent, {stats['retried']} retried, "
+            f"{stats['rejected']} rejected, {stats['expired']} expired"
+        )
+        if stats['expired'] or stats['rejected'] or stats['oldest_pending_seconds'] > self.max_backoff_seconds:
+            logger.warning(message)
+        else:
+            logger.info(message)
+
+    def close(self, timeout: float = 10.0):
+        """
+        Deliver what is due within the timeout and stop the sender threads
+
+        Undelivered alerts stay in the outbox for the next start.
+
+        Args:
+            timeout: Seconds to wait for due alerts to be delivered
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while (
+                any(not e.in_flight and e.next_attempt <= time.time() for e in self._entries.values())
+                or sum(self._in_flight.values())
+            ):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            self._stopping = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        # Final fsync of everything appended, including the last acknowledgements
+        self._unsynced.set()
+        self._syncer.join()
+        with self._cond:
+            self._file.close()
+            if self._entries:
+                logger.warning(f"Stopped with {len(self._entries)} alerts left in the outbox")
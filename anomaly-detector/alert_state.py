@@ -0,0 +1,258 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+SEVERITY_RANK = {'low': 0, 'medium': 1, 'high': 2, 'critical': 3}
+
+
+def fingerprint(anomaly_result: Dict) -> str:
+    """
+    Stable identifier of the series an alert is about
+
+    Severity is not part of it, so an escalating anomaly stays one alert.
+
+    Args:
+        anomaly_result: Result from anomaly detection
+
+    Returns:
+        16-character hex fingerprint of the metric, series and labels
+    """
+    labels = anomaly_result.get('labels') or {}
+    key = [anomaly_result.get('metric', 'unknown'), anomaly_result.get('series', ''), sorted(labels.items())]
+    return hashlib.sha1(json.dumps(key).encode()).hexdigest()[:16]
+
+
+class AlertState:
+    """Notification state of one firing alert"""
+
+    def __init__(self, severity: str, now: float):
+        """
+        Initialize alert state
+
+        Args:
+            severity: Severity of the first anomaly
+            now: Time the anomaly was first seen
+        """
+        self.severity = severity
+        self.first_seen = now
+        self.last_seen = now
+        self.last_sent: Optional[float] = None
+        self.sent_severity: Optional[str] = None
+        # Notification handed to a sender but not yet confirmed
+        self.pending_since: Optional[float] = None
+        self.pending_severity: Optional[str] = None
+        # Resolved notification handed to a sender but not yet confirmed
+        self.resolve_pending_since: Optional[float] = None
+        # Consecutive normal results since the last anomaly
+        self.normal_streak = 0
+
+
+class AlertStateStore:
+    """Firing alerts keyed by fingerprint, deciding which notifications to send"""
+
+    def __init__(
+        self,
+        repeat_interval_seconds: float = 3600,
+        resolve_after: int = 2,
+        ttl_seconds: float = 86400,
+        max_entries: int = 10000
+    ):
+        """
+        Initialize alert state store
+
+        A firing alert is sent when first seen, again as soon as its
+        severity rises above the last sent one, and otherwise at most once
+        per repeat interval. A notification only counts as sent once the
+        sender reports it delivered (see delivered/failed), so a failed or
+        dropped one is retried on the next result. It resolves after
+        resolve_after consecutive normal results, so a series flapping
+        around the threshold stays one alert. Alerts not seen for
+        ttl_seconds, or the least recently seen beyond max_entries, are
+        forgotten.
+
+        Args:
+            repeat_interval_seconds: Minimum time between re-sends of an unchanged alert
+            resolve_after: Consecutive normal results that resolve an alert
+            ttl_seconds: Time after which an alert that is no longer reported is dropped
+            max_entries: Maximum number of alerts kept
+        """
+        self.repeat_interval_seconds = repeat_interval_seconds
+        self.resolve_after = max(1, resolve_after)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # Notifications by decision: new, escalated, repeat, suppressed, resolved, failed, evicted
+        self.counts: Counter = Counter()
+        self._states: 'OrderedDict[str, AlertState]' = OrderedDict()
+        self._lock = threading.Lock()
+        logger.info(
+            f"Initialized AlertStateStore with repeat_interval={repeat_interval_seconds}s, "
+            f"resolve_after={resolve_after}, ttl={ttl_seconds}s"
+        )
+
+    def on_anomaly(self, anomaly_result: Dict, now: Optional[float] = None) -> Optional[str]:
+        """
+        Record an anomalous result and decide whether to notify
+
+        Args:
+            anomaly_result: Result from anomaly detection
+            now: Current time, defaults to time.time()
+
+        Returns:
+            'new', 'escalated' or 'repeat' if a notification is due, None to suppress it
+        """
+        now = now if now is not None else time.time()
+        key = fingerprint(anomaly_result)
+        severity = anomaly_result.get('severity', 'medium')
+
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                state = self._states[key] = AlertState(severity, now)
+            self._states.move_to_end(key)
+            state.last_seen = now
+            state.severity = severity
+            state.normal_streak = 0
+
+            # An unconfirmed notification counts as sent
+            pending = self._pending(state, now)
+            last_sent = state.pending_since if pending else state.last_sent
+            last_severity = state.pending_severity if pending else state.sent_severity
+
+            if last_sent is None:
+                decision = 'new'
+            elif SEVERITY_RANK.get(severity, 1) > SEVERITY_RANK.get(last_severity, 1):
+                decision = 'escalated'
+            elif now - last_sent >= self.repeat_interval_seconds:
+                decision = 'repeat'
+            else:
+                decision = None
+
+            if decision is not None:
+                state.pending_since = now
+                state.pending_severity = severity
+            self.counts[decision or 'suppressed'] += 1
+            self._evict(now)
+        return decision
+
+    def on_normal(self, result: Dict, now: Optional[float] = None) -> bool:
+        """
+        Record a normal result for a series that may have a firing alert
+
+        Args:
+            result: Non-anomalous result from anomaly detection
+            now: Current time, defaults to time.time()
+
+        Returns:
+            True if the alert has resolved and a resolved notification is due;
+            the alert is only forgotten once delivered() confirms it, and no
+            further resolve is due while that one is in flight
+        """
+        now = now if now is not None else time.time()
+        key = fingerprint(result)
+
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                return False
+            self._states.move_to_end(key)
+            state.last_seen = now
+            state.normal_streak += 1
+            if state.normal_streak < self.resolve_after or self._pending(state, now):
+                return False
+            if state.last_sent is None:
+                # Nothing was ever delivered, so there is nothing to resolve
+                del self._states[key]
+                return False
+            if self._pending_since(state.resolve_pending_since, now):
+                return False
+            state.resolve_pending_since = now
+        return True
+
+    def _pending(self, state: AlertState, now: float) -> bool:
+        """Whether a firing notification is in flight"""
+        return self._pending_since(state.pending_since, now)
+
+    def _pending_since(self, since: Optional[float], now: float) -> bool:
+        """Whether a notification handed over at since is in flight; unconfirmed after the repeat interval it is void"""
+        return since is not None and now - since < self.repeat_interval_seconds
+
+    def delivered(self, key: str, state: str, severity: Optional[str] = None, now: Optional[float] = None):
+        """
+        Confirm that a notification reached the receiver
+
+        Args:
+            key: Fingerprint of the alert
+            state: Payload state, 'alerting' or 'ok' for a resolved notification
+            severity: Severity that was sent
+            now: Current time, defaults to time.time()
+        """
+        now = now if now is not None else time.time()
+        with self._lock:
+            alert = self._states.get(key)
+            if alert is None:
+                return
+            if state == 'ok':
+                self.counts['resolved'] += 1
+                if alert.normal_streak >= self.resolve_after:
+                    del self._states[key]
+                else:
+                    # Fired again while the resolve was in flight: the next
+                    # notification for it is a new alert
+                    alert.resolve_pending_since = None
+                    alert.last_sent = None
+                    alert.sent_severity = None
+                return
+            alert.last_sent = now
+            alert.sent_severity = severity
+            alert.pending_since = None
+            alert.pending_severity = None
+
+    def failed(self, key: str, state: str = 'alerting'):
+        """
+        Record that a notification was not delivered, so the next result retries it
+
+        Args:
+            key: Fingerprint of the alert
+            state: Payload state, 'alerting' or 'ok' for a resolved notification
+        """
+        with self._lock:
+            alert = self._states.get(key)
+            if alert is not None and state == 'ok':
+                alert.resolve_pending_since = None
+            elif alert is not None:
+                alert.pending_since = None
+                alert.pending_severity = None
+            self.counts['failed'] += 1
+
+    def _evict(self, now: float):
+        """Drop expired and excess alerts; the dict is ordered by last_seen"""
+        while self._states:
+            key, state = next(iter(self._states.items()))
+            if now - state.last_seen <= self.ttl_seconds and len(self._states) <= self.max_entries:
+                break
+            del self._states[key]
+            self.counts['evicted'] += 1
+            logger.info(f"Forgot alert {key}, last seen {now - state.last_seen:.0f}s ago")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._states)
+
+    def log_stats(self):
+        """Log notification decisions since start"""
+        with self._lock:
+            counts = dict(self.counts)
+            firing = len(self._states)
+        logger.info(
+            f"Alert notifications since start: {counts.get('new', 0)} new, "
+            f"{counts.get('escalated', 0)} escalated, {counts.get('repeat', 0)} repeated, "
+            f"{counts.get('suppressed', 0)} suppressed, {counts.get('resolved', 0)} resolved, "
+            f"{counts.get('failed', 0)} failed; "
+            f"{firing} firing"
+        )
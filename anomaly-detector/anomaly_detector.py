@@ -1,25 +1,191 @@
 import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import TimeoutError as FitTimeout
 import numpy as np
-from typing import List, Tuple, Optional, Dict
+from typing import TYPE_CHECKING, Tuple, Optional, Dict, List
 from datetime import datetime
-from sklearn.preprocessing import StandardScaler
-from statsmodels.tsa.holtwinters import ExponentialSmoothing
+from timeseries import TimeSeriesBuffer, as_buffer
+from model_registry import HoltWintersState
+from batch_holt_winters import BatchHoltWinters
+from forecast_table import ForecastTable
+from multi_resolution import CoarseFit, MultiResolutionModel, MultiResolutionStore
+from fourier_regression import FourierModel, FourierRegression
+from sharding import Shard
+from shared_arrays import RowSpec, SharedArray, attach_row
+
+if TYPE_CHECKING:
+    from statsmodels.tsa.holtwinters import ExponentialSmoothing
 
 logger = logging.getLogger(__name__)
 
+
+def _fit_values(
+    values: np.ndarray,
+    seasonal_periods: int,
+    max_iterations: Optional[int] = None,
+    time_limit: Optional[float] = None
+):
+    """
+    Fit an additive Holt-Winters model to raw values
+    
+    Kept at module level so it can be pickled and run in a worker process.
+    statsmodels is imported here so that services restoring models from a
+    checkpoint or using the batch engine never load it.
+    
+    Args:
+        values: Series values, oldest first
+        seasonal_periods: Number of periods in a seasonal cycle
+        max_iterations: Cap on optimiser iterations, None for the statsmodels default
+        time_limit: Seconds the optimiser may run, None for no limit
+        
+    Returns:
+        Fitted HoltWintersResults
+        
+    Raises:
+        FitTimeout: If the optimiser is still iterating after time_limit
+    """
+    from statsmodels.tsa.holtwinters import ExponentialSmoothing
+    
+    model = ExponentialSmoothing(
+        values,
+        seasonal_periods=seasonal_periods,
+        trend='add',
+        seasonal='add',
+        initialization_method='estimated'
+    )
+    minimize_kwargs = {}
+    if max_iterations:
+        minimize_kwargs['options'] = {'maxiter': max_iterations}
+    if time_limit is not None:
+        if time_limit <= 0:
+            raise FitTimeout("No time left for the fit")
+        deadline = time.monotonic() + time_limit
+        
+        def check_deadline(*args):
+            # Called by the optimiser after every iteration
+            if time.monotonic() > deadline:
+                raise FitTimeout(f"Fit still running after {time_limit:.1f}s")
+        
+        minimize_kwargs['callback'] = check_deadline
+    return model.fit(optimized=True, minimize_kwargs=minimize_kwargs or None)
+
+
+def _fit_shared(
+    spec: RowSpec,
+    seasonal_periods: int,
+    max_iterations: Optional[int] = None,
+    time_limit: Optional[float] = None
+) -> Optional[Tuple]:
+    """
+    Fit one series held in shared memory and return compact parameters
+    
+    Runs in a worker process: the history is mapped, not unpickled, and
+    only HoltWintersState.compact output is sent back. The time limit is
+    enforced in the worker, so a fit the caller has abandoned does not keep
+    holding a pool slot.
+    
+    Args:
+        spec: Row of a SharedArray holding the series values
+        seasonal_periods: Number of periods in a seasonal cycle
+        max_iterations: Cap on optimiser iterations
+        time_limit: Seconds the optimiser may run, None for no limit
+        
+    Returns:
+        Compact fitted parameters, or None for a constant series
+    """
+    with attach_row(spec) as values:
+        if np.std(values) == 0:
+            return None
+        fitted_model = _fit_values(
+            values, min(seasonal_periods, len(values) // 2), max_iterations, time_limit
+        )
+        compact = HoltWintersState.compact(fitted_model)
+        del fitted_model
+    return compact
+
+
 class AnomalyDetector:
     """Anomaly detection using Holt-Winters exponential smoothing"""
     
-    def __init__(self, threshold: float = 2.5, min_data_points: int = 100):
+    def __init__(
+        self,
+        threshold: float = 2.5,
+        min_data_points: int = 100,
+        history_cache=None,
+        fit_executor=None,
+        model_registry=None,
+        batch_min_series: int = 50,
+        current_value_max_age: Optional[float] = None,
+        forecast_horizon: int = 12,
+        backfill: bool = True,
+        screen_threshold: Optional[float] = None,
+        screen_window: int = 288,
+        screen_recent_points: int = 1,
+        fit_max_iterations: Optional[int] = None,
+        fit_timeout: Optional[float] = None,
+        multi_resolution: Optional[MultiResolutionStore] = None,
+        fourier: Optional[FourierRegression] = None,
+        shard: Optional[Shard] = None
+    ):
         """
         Initialize anomaly detector
         
         Args:
             threshold: Number of standard deviations for anomaly classification
             min_data_points: Minimum number of data points required for detection
+            history_cache: Optional MetricHistoryCache for incremental fetches
+            fit_executor: Optional executor (e.g. a process pool) that runs model fits
+            model_registry: Optional ModelRegistry to update models between refits
+            batch_min_series: Series count from which fit_many uses the batch engine
+            current_value_max_age: If set, use the newest history point as the
+                current value when it is at most this many seconds old
+            forecast_horizon: Steps precomputed per model for fast-path checks
+            backfill: Also score every point that arrived since the last cycle
+            screen_threshold: Robust z-score above which a series goes on to
+                Holt-Winters; None sends every series to Holt-Winters
+            screen_window: History points the screening median/MAD is taken over
+            screen_recent_points: Newest history points screened with the current value
+            fit_max_iterations: Cap on optimiser iterations per statsmodels fit
+            fit_timeout: Seconds one fit may take, in-process or on
+                fit_executor, before giving up on it
+            multi_resolution: Optional MultiResolutionStore; when set, models
+                are fitted on downsampled history and the fetched history only
+                serves as the full-resolution residual window
+            fourier: Optional FourierRegression used instead of Holt-Winters
+                to model several seasonalities at once
+            shard: Optional Shard; series owned by other replicas are dropped
+                before modelling
         """
         self.threshold = threshold
         self.min_data_points = min_data_points
+        self.history_cache = history_cache
+        self.fit_executor = fit_executor
+        self.model_registry = model_registry
+        self.batch_min_series = batch_min_series
+        self.current_value_max_age = current_value_max_age
+        self.forecast_horizon = forecast_horizon
+        self.backfill = backfill
+        self.screen_threshold = screen_threshold
+        self.screen_window = screen_window
+        self.screen_recent_points = screen_recent_points
+        self.fit_max_iterations = fit_max_iterations
+        self.fit_timeout = fit_timeout
+        self.multi_resolution = multi_resolution
+        self.fourier = fourier
+        self.shard = shard
+        # Series handled by each tier: 'screened', the model engine that scored
+        # them ('holt_winters', 'multi_resolution', 'fourier') or 'fallback'
+        self.tier_counts: Counter = Counter()
+        self.forecast_tables: Dict[Tuple[str, str], ForecastTable] = {}
+        # One-step-ahead residuals of the points each stored model was advanced over
+        self._new_point_residuals: Dict[Tuple[str, str], Tuple] = {}
+        self._last_scored: Dict[Tuple[str, str], float] = {}
+        # Series whose refit was skipped or abandoned this cycle
+        self.degraded: List[Dict] = []
+        self._deadline: Optional[float] = None
+        self._lock = threading.Lock()
         logger.info(f"Initialized AnomalyDetector with threshold={threshold}")
     
     def fetch_historical_metrics(
@@ -27,7 +193,7 @@ class AnomalyDetector:
         prom_client,
         metric_name: str,
         days: int = 7
-    ) -> Optional[List[Tuple[float, float]]]:
+    ) -> Optional[TimeSeriesBuffer]:
         """
         Fetch historical metrics from Prometheus
         
@@ -37,15 +203,23 @@ class AnomalyDetector:
             days: Number of days of historical data
             
         Returns:
-            List of (timestamp, value) tuples or None if insufficient data
+            TimeSeriesBuffer with the history or None if insufficient data
         """
         logger.info(f"Fetching {days} days of historical data for {metric_name}")
         
-        time_series = prom_client.get_metric_history(
-            metric_name=metric_name,
-            days=days,
-            aggregation='avg'
-        )
+        if self.history_cache is not None:
+            time_series = self.history_cache.get_history(
+                prom_client,
+                metric_name=metric_name,
+                days=days,
+                aggregation='avg'
+            )
+        else:
+            time_series = prom_client.get_metric_history(
+                metric_name=metric_name,
+                days=days,
+                aggregation='avg'
+            )
         
         if not time_series:
             logger.warning(f"No historical data available for {metric_name}")
@@ -59,43 +233,69 @@ class AnomalyDetector:
             return None
         
         logger.info(f"Retrieved {len(time_series)} data points for {metric_name}")
-        return time_series
+        return as_buffer(time_series)
     
     def fit_holt_winters(
         self,
-        time_series: List[Tuple[float, float]],
+        time_series: TimeSeriesBuffer,
         seasonal_periods: int = 288  # 24 hours with 5-minute intervals
-    ) -> Optional[ExponentialSmoothing]:
+    ) -> Optional['ExponentialSmoothing']:
         """
         Fit Holt-Winters model to time series data
         
         Args:
-            time_series: List of (timestamp, value) tuples
+            time_series: TimeSeriesBuffer (or list of (timestamp, value) tuples)
             seasonal_periods: Number of periods in a seasonal cycle
             
         Returns:
-            Fitted ExponentialSmoothing model or None if fitting fails
+            Fitted ExponentialSmoothing model (a HoltWintersState when fitted
+            through fit_executor) or None if fitting fails
         """
         try:
-            # Extract values
-            values = np.array([v for _, v in time_series])
+            # Zero-copy view of the values
+            time_series = as_buffer(time_series)
+            values = time_series.values
             
             # Check for constant values
             if np.std(values) == 0:
                 logger.warning("Time series has constant values, cannot fit model")
                 return None
             
+            if len(values) < 2 * seasonal_periods:
+                logger.warning(
+                    f"Only {len(values)} points for a {seasonal_periods}-point season, "
+                    f"fitting a {len(values) // 2}-point season instead"
+                )
+            
             # Fit Holt-Winters model
             # Use additive model for simplicity
-            model = ExponentialSmoothing(
-                values,
-                seasonal_periods=min(seasonal_periods, len(values) // 2),
-                trend='add',
-                seasonal='add',
-                initialization_method='estimated'
-            )
-            
-            fitted_model = model.fit(optimized=True)
+            if self._out_of_time():
+                # Nothing submitted, so no fit is left running past the budget
+                logger.warning("Cycle budget spent, skipping Holt-Winters fit")
+                return None
+            if self.fit_executor is not None:
+                # Worker maps the values from shared memory and returns a compact state
+                with SharedArray([values]) as shared:
+                    wait = self._fit_wait()
+                    future = self.fit_executor.submit(
+                        _fit_shared, shared.spec(0), seasonal_periods, self.fit_max_iterations, wait
+                    )
+                    try:
+                        compact = future.result(timeout=wait)
+                    except FitTimeout:
+                        future.cancel()
+                        logger.warning("Holt-Winters fit ran out of time, abandoning it")
+                        return None
+                fitted_model = HoltWintersState.from_compact(compact, time_series.timestamps)
+            else:
+                seasonal_periods = min(seasonal_periods, len(values) // 2)
+                try:
+                    fitted_model = _fit_values(
+                        values, seasonal_periods, self.fit_max_iterations, self._fit_wait()
+                    )
+                except FitTimeout:
+                    logger.warning("Holt-Winters fit ran out of time, abandoning it")
+                    return None
             logger.info("Successfully fitted Holt-Winters model")
             return fitted_model
             
@@ -103,9 +303,461 @@ class AnomalyDetector:
             logger.error(f"Error fitting Holt-Winters model: {e}")
             return None
     
+    def fit_many(
+        self,
+        series: Dict[str, TimeSeriesBuffer],
+        seasonal_periods: int = 288
+    ) -> Dict[str, Optional[HoltWintersState]]:
+        """
+        Fit Holt-Winters models for many series
+        
+        Below batch_min_series each series is fitted with statsmodels. From
+        there on series with identical timestamps are fitted together with
+        the vectorized BatchHoltWinters engine.
+        
+        Args:
+            series: Histories keyed by series identifier
+            seasonal_periods: Number of periods in a seasonal cycle
+            
+        Returns:
+            Fitted HoltWintersState (or None if fitting failed) per series
+        """
+        return self._fit_many(series, seasonal_periods)[0]
+    
+    def _fit_many(
+        self,
+        series: Dict[str, TimeSeriesBuffer],
+        seasonal_periods: int = 288
+    ) -> Tuple[Dict[str, Optional[HoltWintersState]], List[str]]:
+        """
+        fit_many, also reporting the series left unfitted by the time budget
+        
+        Args:
+            series: Histories keyed by series identifier
+            seasonal_periods: Number of periods in a seasonal cycle
+            
+        Returns:
+            Tuple of (model or None per series, keys that timed out or were skipped)
+        """
+        series = {key: as_buffer(ts) for key, ts in series.items()}
+        models: Dict[str, Optional[HoltWintersState]] = {key: None for key in series}
+        
+        if len(series) < self.batch_min_series and self.fit_executor is not None:
+            return self._fit_in_pool(series, seasonal_periods)
+        
+        if len(series) < self.batch_min_series:
+            skipped = []
+            for key, time_series in series.items():
+                if self._out_of_time():
+                    skipped.append(key)
+                    continue
+                start = time.monotonic()
+                fitted_model = self.fit_holt_winters(time_series, seasonal_periods)
+                if fitted_model is not None:
+                    models[key] = HoltWintersState.from_fitted(fitted_model, time_series.timestamps)
+                elif self._timed_out(start):
+                    skipped.append(key)
+            return models, skipped
+        
+        # Constant series cannot be fitted, same as fit_holt_winters
+        keys = [key for key, ts in series.items() if len(ts) and np.std(ts.values) > 0]
+        if not keys:
+            return models, []
+        
+        # Only series on the same timestamps share seasonal phase; gaps or
+        # different start times split them into their own batch
+        groups: Dict[bytes, List[str]] = {}
+        for key in keys:
+            groups.setdefault(series[key].timestamps.tobytes(), []).append(key)
+        
+        engine = BatchHoltWinters(seasonal_periods=seasonal_periods)
+        for group in groups.values():
+            timestamps = series[group[0]].timestamps
+            values = np.stack([series[key].values for key in group])
+            try:
+                result = engine.fit(values)
+            except Exception as e:
+                logger.error(f"Error batch fitting {len(group)} series: {e}")
+                continue
+            if result is not None:
+                models.update(zip(group, result.to_states(timestamps)))
+        if len(groups) > 1:
+            logger.info(f"Batch fitted {len(keys)} series in {len(groups)} timestamp groups")
+        return models, []
+    
+    def _fit_in_pool(
+        self,
+        series: Dict[str, TimeSeriesBuffer],
+        seasonal_periods: int
+    ) -> Tuple[Dict[str, Optional[HoltWintersState]], List[str]]:
+        """
+        Fit every series concurrently on fit_executor
+        
+        All histories are copied once into a single shared memory block;
+        each task carries only the block name and its row. Results are
+        awaited in order for at most fit_timeout each and never past the
+        cycle deadline; fits not back by then are abandoned. Abandoned fits
+        that have not started are cancelled, and running ones stop themselves
+        once their time limit passes, so they do not hold workers needed by
+        the next cycle.
+        
+        Args:
+            series: Histories keyed by series identifier
+            seasonal_periods: Number of periods in a seasonal cycle
+            
+        Returns:
+            Tuple of (model or None per series, keys whose fit was abandoned)
+        """
+        keys = list(series)
+        models: Dict[str, Optional[HoltWintersState]] = {key: None for key in keys}
+        if self._out_of_time():
+            return models, keys
+        skipped = []
+        with SharedArray([series[key].values for key in keys]) as shared:
+            # Queued fits wait for a worker, so each one gets the full limit
+            # from when it starts rather than from submission
+            limit = self._fit_wait()
+            futures = {
+                key: self.fit_executor.submit(
+                    _fit_shared, shared.spec(row), seasonal_periods, self.fit_max_iterations, limit
+                )
+                for row, key in enumerate(keys)
+            }
+            for key, future in futures.items():
+                try:
+                    compact = future.result(timeout=self._fit_wait())
+                except FitTimeout:
+                    future.cancel()
+                    skipped.append(key)
+                    continue
+                except Exception as e:
+                    logger.error(f"Error fitting Holt-Winters model for {key}: {e}")
+                    continue
+                if compact is not None:
+                    models[key] = HoltWintersState.from_compact(compact, series[key].timestamps)
+        
+        fitted = sum(1 for model in models.values() if model is not None)
+        logger.info(f"Fitted {fitted} of {len(keys)} series in the process pool")
+        if skipped:
+            logger.warning(f"Abandoned {len(skipped)} fits that ran out of time")
+        return models, skipped
+    
+    def start_cycle(self, budget_seconds: Optional[float] = None):
+        """
+        Start a detection cycle with an optional time budget
+        
+        Once the budget is spent, due refits are skipped: those series keep
+        their last good model or use the statistical fallback, and are listed
+        in degraded until the next cycle starts.
+        
+        Args:
+            budget_seconds: Seconds the cycle may take, None for no limit
+        """
+        with self._lock:
+            self._deadline = time.monotonic() + budget_seconds if budget_seconds else None
+            self.degraded = []
+    
+    def finish_cycle(self) -> List[Dict]:
+        """
+        Report the series degraded by the time budget this cycle, and log
+        the registry's refit counts by reason
+        
+        Returns:
+            Degraded series with their refit reason, cause and stand-in model
+        """
+        with self._lock:
+            degraded = list(self.degraded)
+        if degraded:
+            logger.warning(
+                f"{len(degraded)} series degraded by the time budget: " + ", ".join(
+                    f"{d['metric']}{d['series']} ({d['cause']}, {d['used']})" for d in degraded
+                )
+            )
+        if self.model_registry is not None and self.model_registry.refit_counts:
+            logger.info(
+                "Model refits since start: " + ", ".join(
+                    f"{count} {reason}" for reason, count in sorted(self.model_registry.refit_counts.items())
+                )
+            )
+        return degraded
+    
+    def _time_left(self) -> Optional[float]:
+        """Seconds left in the cycle budget, None without a budget"""
+        if self._deadline is None:
+            return None
+        return max(0.0, self._deadline - time.monotonic())
+    
+    def _out_of_time(self) -> bool:
+        return self._time_left() == 0.0
+    
+    def _timed_out(self, start: float) -> bool:
+        """Whether a fit started at start failed by running out of time rather than on the data"""
+        elapsed = time.monotonic() - start
+        return self._out_of_time() or bool(self.fit_timeout and elapsed >= self.fit_timeout)
+    
+    def _fit_wait(self) -> Optional[float]:
+        """Seconds to wait for one pooled fit: fit_timeout capped by the cycle budget"""
+        limits = [t for t in (self.fit_timeout, self._time_left()) if t is not None]
+        return min(limits) if limits else None
+    
+    def _degrade(
+        self,
+        metric_name: str,
+        series_key: str,
+        state: Optional[HoltWintersState],
+        reason: str,
+        time_series: TimeSeriesBuffer,
+        cause: str
+    ) -> Optional[HoltWintersState]:
+        """
+        Stand in for a refit that was skipped or abandoned
+        
+        Args:
+            metric_name: Name of the metric
+            series_key: Identifier of the series within the metric
+            state: Stored state, already advanced unless reason is 'gap'
+            reason: Why the refit was due
+            time_series: History for the series
+            cause: 'deadline' (cycle budget spent) or 'timeout' (fit abandoned)
+            
+        Returns:
+            The last good state, or None to use the statistical fallback
+        """
+        if state is not None and reason == 'gap':
+            # Keep the last good parameters and run them over the new window
+            state.update_many(time_series.timestamps, time_series.values)
+        used = 'last_good' if state is not None else 'fallback'
+        with self._lock:
+            self.degraded.append({
+                'metric': metric_name,
+                'series': series_key,
+                'refit_reason': reason,
+                'cause': cause,
+                'used': used
+            })
+        logger.warning(
+            f"Refit of {metric_name}{series_key} ({reason}) skipped: {cause}, using {used}"
+        )
+        return state
+    
+    def _advance_stored_model(
+        self,
+        metric_name: str,
+        time_series: TimeSeriesBuffer,
+        series_key: str = ''
+    ) -> Tuple[Optional[HoltWintersState], Optional[str]]:
+        """
+        Advance the registry state for a series over its new points
+        
+        Args:
+            metric_name: Name of the metric
+            time_series: History for the series
+            series_key: Identifier of the series within the metric
+            
+        Returns:
+            Tuple of (stored state or None, refit reason or None if still valid)
+        """
+        state = self.model_registry.get(metric_name, series_key)
+        if state is not None and state.last_timestamp < time_series.timestamps[0]:
+            return state, 'gap'
+        if state is not None:
+            start = int(np.searchsorted(time_series.timestamps, state.last_timestamp, side='right'))
+            residual_std = state.residual_std
+            residuals = state.update_many(time_series.timestamps, time_series.values)
+            if self.backfill and len(residuals):
+                with self._lock:
+                    self._new_point_residuals[(metric_name, series_key)] = (
+                        time_series.timestamps[start:], time_series.values[start:],
+                        residuals, residual_std
+                    )
+        return state, self.model_registry.refit_reason(state)
+    
+    def get_models(
+        self,
+        metric_name: str,
+        histories: Dict[str, TimeSeriesBuffer]
+    ) -> Dict[str, Optional[HoltWintersState]]:
+        """
+        Get up-to-date models for every series of a metric
+        
+        Stored states are advanced where possible; the remaining series are
+        refitted together through fit_many. Refits skipped or abandoned for
+        lack of time fall back to the last good state (see start_cycle).
+        
+        Args:
+            metric_name: Name of the metric
+            histories: History per series key
+            
+        Returns:
+            Model (or None if fitting failed) per series key
+        """
+        if self.model_registry is None:
+            models, skipped = self._fit_many(histories)
+            for key in skipped:
+                self._degrade(metric_name, key, None, 'missing', histories[key], 'timeout')
+            return models
+        
+        models = {}
+        refit = {}
+        stored = {}
+        for key, time_series in histories.items():
+            state, reason = self._advance_stored_model(metric_name, time_series, key)
+            if reason is None:
+                models[key] = state
+            else:
+                refit[key] = time_series
+                stored[key] = (state, reason)
+        
+        if refit and self._out_of_time():
+            for key, time_series in refit.items():
+                models[key] = self._degrade(metric_name, key, *stored[key], time_series, 'deadline')
+        elif refit:
+            logger.info(f"Refitting {len(refit)} of {len(histories)} series for {metric_name}")
+            fitted, skipped = self._fit_many(refit)
+            for key, state in fitted.items():
+                models[key] = state
+                if state is not None:
+                    self.model_registry.put(metric_name, state, key, reason=stored[key][1])
+            for key in skipped:
+                models[key] = self._degrade(metric_name, key, *stored[key], refit[key], 'timeout')
+        
+        return models
+    
+    def get_model(
+        self,
+        metric_name: str,
+        time_series: TimeSeriesBuffer,
+        series_key: str = ''
+    ) -> Optional[HoltWintersState]:
+        """
+        Get an up-to-date model, advancing the stored state or refitting
+        
+        Without a registry this always runs a full fit. With one, the stored
+        state is advanced over the new points and a full fit only runs when
+        the registry says it is due.
+        
+        Args:
+            metric_name: Name of the metric
+            time_series: History for the series
+            series_key: Identifier of the series within the metric
+            
+        Returns:
+            Fitted model (HoltWintersState when a registry is used) or None
+        """
+        if self.model_registry is None:
+            return self.fit_holt_winters(time_series)
+        
+        time_series = as_buffer(time_series)
+        state, reason = self._advance_stored_model(metric_name, time_series, series_key)
+        
+        if reason is None:
+            logger.debug(f"Advanced model state for {metric_name} ({state.updates} updates)")
+            return state
+        
+        if self._out_of_time():
+            return self._degrade(metric_name, series_key, state, reason, time_series, 'deadline')
+        
+        logger.info(f"Refitting model for {metric_name}: {reason}")
+        start = time.monotonic()
+        fitted_model = self.fit_holt_winters(time_series)
+        if fitted_model is None:
+            if self._timed_out(start):
+                return self._degrade(metric_name, series_key, state, reason, time_series, 'timeout')
+            return None
+        
+        state = fitted_model
+        if not isinstance(state, HoltWintersState):
+            state = HoltWintersState.from_fitted(fitted_model, time_series.timestamps)
+        self.model_registry.put(metric_name, state, series_key, reason=reason)
+        return state
+    
+    def get_multi_resolution_models(
+        self,
+        prom_client,
+        metric_name: str,
+        histories: Dict[str, TimeSeriesBuffer],
+        group_by: Optional[List[str]] = None,
+        series: Optional[List[Dict[str, str]]] = None
+    ) -> Dict[str, Optional[MultiResolutionModel]]:
+        """
+        Get models fitted on downsampled history for every series of a metric
+        
+        Coarse fits older than the latest complete bucket are refreshed from
+        one downsampled range query; a series keeps its previous coarse fit
+        if the refit fails or the cycle budget is spent. Failed refits back
+        off (see MultiResolutionStore), so the long range is not refetched
+        every cycle for a series that cannot be fitted.
+        
+        Args:
+            prom_client: PrometheusQueryClient instance
+            metric_name: Name of the metric
+            histories: Recent full-resolution history per series key
+            group_by: Labels identifying a series, None for the aggregated series
+            series: Label sets to restrict the downsampled query to
+            
+        Returns:
+            Model (or None if no coarse fit is available) per series key
+        """
+        store = self.multi_resolution
+        stale = store.stale_keys(metric_name, histories)
+        if stale and not self._out_of_time():
+            coarse = prom_client.get_downsampled_history(
+                metric_name, days=store.days, step=store.step, aggregation='avg',
+                group_by=group_by, series=series
+            ) or {}
+            backoffs = []
+            for key in stale:
+                fit = self._fit_coarse(coarse.get(key))
+                if fit is not None:
+                    store.put(metric_name, fit, key)
+                else:
+                    backoffs.append(store.failed(metric_name, key))
+            logger.info(
+                f"Refitted {len(stale) - len(backoffs)} of {len(stale)} downsampled "
+                f"({store.step}) models for {metric_name}"
+            )
+            if backoffs:
+                logger.warning(
+                    f"{len(backoffs)} downsampled fits failed for {metric_name}, "
+                    f"retrying within {max(backoffs):.0f}s"
+                )
+        
+        return {key: store.model(metric_name, ts, key) for key, ts in histories.items()}
+    
+    def _fit_coarse(self, time_series: Optional[TimeSeriesBuffer]) -> Optional[CoarseFit]:
+        """
+        Fit Holt-Winters on a downsampled history
+        
+        Unlike fit_holt_winters the season is never shortened: with less
+        than two full seasons of buckets there is no fit.
+        
+        Args:
+            time_series: Downsampled history or None
+            
+        Returns:
+            CoarseFit or None if the history is too short, constant or the fit fails
+        """
+        seasonal_periods = self.multi_resolution.seasonal_periods
+        if time_series is None or len(time_series) < 2 * seasonal_periods:
+            logger.warning(
+                f"Need {2 * seasonal_periods} downsampled points for a "
+                f"{seasonal_periods}-period season, have {len(time_series) if time_series else 0}"
+            )
+            return None
+        if np.std(time_series.values) == 0:
+            return None
+        try:
+            fitted_model = _fit_values(
+                time_series.values, seasonal_periods, self.fit_max_iterations, self._fit_wait()
+            )
+            return CoarseFit.from_fitted(fitted_model, time_series.timestamps)
+        except Exception as e:
+            logger.error(f"Error fitting downsampled Holt-Winters model: {e}")
+            return None
+    
     def calculate_prediction_and_deviation(
         self,
-        fitted_model: ExponentialSmoothing,
+        fitted_model: 'ExponentialSmoothing',
         actual_value: float,
         forecast_steps: int = 1
     ) -> Tuple[float, float, float]:
@@ -113,7 +765,7 @@ class AnomalyDetector:
         Calculate prediction and deviation from actual value
         
         Args:
-            fitted_model: Fitted Holt-Winters model
+            fitted_model: Fitted Holt-Winters model or HoltWintersState
             actual_value: Current actual value
             forecast_steps: Number of steps to forecast
             
@@ -126,8 +778,10 @@ class AnomalyDetector:
             predicted_value = forecast[0]
             
             # Calculate residuals from fitted values
-            residuals = fitted_model.resid
-            residual_std = np.std(residuals)
+            if isinstance(fitted_model, (HoltWintersState, MultiResolutionModel, FourierModel)):
+                residual_std = fitted_model.residual_std
+            else:
+                residual_std = np.std(fitted_model.resid)
             
             # Calculate deviation
             deviation = abs(actual_value - predicted_value)
@@ -150,6 +804,313 @@ class AnomalyDetector:
             logger.error(f"Error calculating prediction: {e}")
             return 0.0, 0.0, 0.0
     
+    def update_forecast_table(
+        self,
+        metric_name: str,
+        fitted_model,
+        time_series: TimeSeriesBuffer,
+        series_key: str = ''
+    ) -> Optional[ForecastTable]:
+        """
+        Precompute forecasts and intervals for the next steps of a series
+        
+        Called once per fit or state update; fast_check then scores new
+        samples with a lookup. Without a model the old table is dropped.
+        
+        Args:
+            metric_name: Name of the metric
+            fitted_model: HoltWintersState, statsmodels result or None
+            time_series: History the model has seen
+            series_key: Identifier of the series within the metric
+            
+        Returns:
+            ForecastTable or None if no model is available
+        """
+        table = None
+        if fitted_model:
+            try:
+                if isinstance(fitted_model, (HoltWintersState, MultiResolutionModel, FourierModel)):
+                    last_timestamp, step_seconds = fitted_model.last_timestamp, fitted_model.step_seconds
+                else:
+                    last_timestamp = time_series.last_timestamp
+                    step_seconds = float(np.median(np.diff(time_series.timestamps)))
+                table = ForecastTable.from_model(
+                    fitted_model, last_timestamp, step_seconds,
+                    horizon=self.forecast_horizon, labels=time_series.labels
+                )
+            except Exception as e:
+                logger.error(f"Error building forecast table for {metric_name}: {e}")
+        
+        with self._lock:
+            if table is None:
+                self.forecast_tables.pop((metric_name, series_key), None)
+            else:
+                self.forecast_tables[(metric_name, series_key)] = table
+        return table
+    
+    def fast_check(
+        self,
+        current_values: Dict[Tuple[str, str], float],
+        now: Optional[float] = None
+    ) -> List[Dict]:
+        """
+        Score current values against the precomputed forecast tables
+        
+        No history is fetched and no model is touched, so this can run
+        every few seconds between full detection cycles.
+        
+        Args:
+            current_values: Values keyed by (metric name, series key)
+            now: Time of the values, defaults to the current time
+            
+        Returns:
+            List of result dictionaries with method 'fast_path'; series
+            whose table is missing or expired are skipped
+        """
+        now = now if now is not None else datetime.now().timestamp()
+        with self._lock:
+            tables = dict(self.forecast_tables)
+        
+        results = []
+        for (metric_name, key), value in current_values.items():
+            table = tables.get((metric_name, key))
+            index = table.index(now) if table is not None else None
+            if index is None:
+                continue
+            predicted_value, deviation, deviation_std = table.score(value, index)
+            result = self._build_result(metric_name, predicted_value, value, deviation, deviation_std)
+            result['method'] = 'fast_path'
+            if key:
+                result['series'] = key
+                result['labels'] = dict(table.labels)
+            results.append(result)
+        
+        logger.debug(f"Fast check scored {len(results)} of {len(current_values)} series")
+        return results
+    
+    def backfill_points(
+        self,
+        metric_name: str,
+        time_series: TimeSeriesBuffer,
+        fitted_model,
+        series_key: str = ''
+    ) -> Optional[Dict]:
+        """
+        Score every point that arrived since the previous cycle
+        
+        Uses the one-step-ahead residuals recorded while the stored model
+        was advanced over the new points, or the in-sample residuals of a
+        statsmodels fit when no registry is used.
+        
+        Args:
+            metric_name: Name of the metric
+            time_series: History for the series
+            fitted_model: Model used this cycle
+            series_key: Identifier of the series within the metric
+            
+        Returns:
+            Backfill summary from score_points, or None if nothing new was scored
+        """
+        key = (metric_name, series_key)
+        with self._lock:
+            pending = self._new_point_residuals.pop(key, None)
+            last_scored = self._last_scored.get(key)
+            if len(time_series):
+                self._last_scored[key] = time_series.last_timestamp
+        
+        if pending is None and last_scored is not None and hasattr(fitted_model, 'resid'):
+            resid = np.asarray(fitted_model.resid)
+            start = int(np.searchsorted(time_series.timestamps, last_scored, side='right'))
+            if len(resid) == len(time_series) and start < len(resid):
+                pending = (
+                    time_series.timestamps[start:], time_series.values[start:],
+                    resid[start:], np.std(resid)
+                )
+        
+        if pending is None:
+            return None
+        return self.score_points(*pending)
+    
+    def score_points(
+        self,
+        timestamps: np.ndarray,
+        values: np.ndarray,
+        residuals: np.ndarray,
+        residual_std: float
+    ) -> Optional[Dict]:
+        """
+        Score many points at once and find contiguous anomalous intervals
+        
+        Args:
+            timestamps: Point timestamps, sorted
+            values: Observed values
+            residuals: Observed minus predicted value per point
+            residual_std: Standard deviation used to normalize the residuals
+            
+        Returns:
+            Dictionary with the number of points scored, the worst point and
+            the anomalous intervals, or None if nothing can be scored
+        """
+        if not len(residuals) or residual_std <= 0:
+            return None
+        
+        deviation_std = np.abs(residuals) / residual_std
+        anomalous = deviation_std > self.threshold
+        worst = int(np.argmax(deviation_std))
+        
+        # Run boundaries: +1 where an anomalous run starts, -1 one past its end
+        edges = np.diff(np.concatenate(([0], anomalous.astype(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        
+        return {
+            'points': int(len(residuals)),
+            'anomalous_points': int(anomalous.sum()),
+            'worst': {
+                'timestamp': datetime.fromtimestamp(timestamps[worst]).isoformat(),
+                'actual_value': float(values[worst]),
+                'expected_value': float(values[worst] - residuals[worst]),
+                'deviation_std': float(deviation_std[worst])
+            },
+            'intervals': [
+                {
+                    'start': datetime.fromtimestamp(timestamps[start]).isoformat(),
+                    'end': datetime.fromtimestamp(timestamps[end - 1]).isoformat(),
+                    'points': int(end - start),
+                    'max_deviation_std': float(deviation_std[start:end].max())
+                }
+                for start, end in zip(starts, ends)
+            ]
+        }
+    
+    def _apply_backfill(self, result: Dict, backfill: Optional[Dict]) -> Dict:
+        """
+        Attach a backfill summary and flag anomalies found between cycles
+        
+        Args:
+            result: Result for the current value
+            backfill: Summary from backfill_points or None
+            
+        Returns:
+            The result, flagged and escalated if the backfill was worse
+        """
+        if backfill is None:
+            return result
+        result['backfill'] = backfill
+        worst = backfill['worst']['deviation_std']
+        if backfill['intervals'] and worst > result['deviation_std']:
+            is_anomaly, severity, confidence = self.classify_anomaly(worst)
+            result['is_anomaly'] = bool(is_anomaly)
+            result['severity'] = severity
+            result['confidence'] = float(confidence)
+        return result
+    
+    def screen(
+        self,
+        histories: Dict[str, TimeSeriesBuffer],
+        latest: Dict[str, float]
+    ) -> Dict[str, Tuple[float, float, float]]:
+        """
+        Cheap robust z-score screen over many series at once
+        
+        The current value and the newest screen_recent_points - 1 history
+        points are compared with the median and MAD of the screen_window
+        points before them, for all series in one array operation.
+        
+        Args:
+            histories: History per series key
+            latest: Current value per series key
+            
+        Returns:
+            (median, deviation of the current value, highest robust z-score)
+            per series key that has a current value
+        """
+        keys = [key for key in histories if key in latest and len(histories[key])]
+        if not keys:
+            return {}
+        
+        older = self.screen_recent_points - 1
+        length = min(len(histories[key]) for key in keys)
+        window = max(1, min(self.screen_window, length - older))
+        block = np.stack([
+            as_buffer(histories[key]).values[-(window + older):] if length > older
+            else as_buffer(histories[key]).values[-window:]
+            for key in keys
+        ]).astype(np.float64)
+        current = np.array([latest[key] for key in keys], dtype=np.float64)
+        
+        reference = block[:, :window]
+        recent = np.column_stack([block[:, window:], current])
+        median = np.nanmedian(reference, axis=1)
+        # 1.4826 * MAD estimates the standard deviation for normal data
+        scale = 1.4826 * np.nanmedian(np.abs(reference - median[:, None]), axis=1)
+        scale = np.where(scale > 0, scale, np.nanstd(reference, axis=1))
+        
+        deviation = np.abs(recent - median[:, None])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z_scores = np.where(
+                scale[:, None] > 0,
+                deviation / scale[:, None],
+                np.where(deviation > 0, np.inf, 0.0)
+            )
+        max_z = np.nanmax(z_scores, axis=1)
+        
+        return {
+            key: (float(median[i]), float(deviation[i, -1]), float(max_z[i]))
+            for i, key in enumerate(keys)
+        }
+    
+    def _screen_result(
+        self,
+        metric_name: str,
+        current_value: float,
+        screened: Tuple[float, float, float]
+    ) -> Dict:
+        """
+        Result for a series that the screen found quiet
+        
+        The robust z-score is not on the Holt-Winters scale, so it is
+        reported but never classified: a series the screen lets through is
+        not anomalous, whatever ANOMALY_THRESHOLD is.
+        
+        Args:
+            metric_name: Name of the metric
+            current_value: Current metric value
+            screened: (median, deviation, highest z-score) from screen
+            
+        Returns:
+            Dictionary with a non-anomalous result, method 'screen'
+        """
+        median, deviation, max_z = screened
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'metric': metric_name,
+            'expected_value': float(median),
+            'actual_value': float(current_value),
+            'deviation': float(deviation),
+            'deviation_std': float(max_z),
+            'is_anomaly': False,
+            'severity': 'low',
+            'confidence': 0.0,
+            'threshold': self.threshold,
+            'method': 'screen'
+        }
+    
+    def _count_tiers(self, screened: int = 0, modelled: int = 0, fallback: int = 0):
+        """Count series by tier, modelled ones under the engine in use"""
+        counts = {'screened': screened, self.model_engine: modelled, 'fallback': fallback}
+        with self._lock:
+            self.tier_counts.update(counts)
+    
+    @property
+    def model_engine(self) -> str:
+        """Name of the engine that models suspicious series"""
+        if self.fourier is not None:
+            return 'fourier'
+        if self.multi_resolution is not None:
+            return 'multi_resolution'
+        return 'holt_winters'
+    
     def classify_anomaly(
         self,
         deviation_std: float,
@@ -188,11 +1149,59 @@ class AnomalyDetector:
         
         return is_anomaly, severity, confidence
     
+    def _history_tail(self, time_series: TimeSeriesBuffer) -> Optional[float]:
+        """
+        Newest history value, if recent enough to stand in for the current value
+        
+        Args:
+            time_series: History for the series
+            
+        Returns:
+            Latest value or None if disabled or too old
+        """
+        if self.current_value_max_age is None or not len(time_series):
+            return None
+        if datetime.now().timestamp() - time_series.last_timestamp > self.current_value_max_age:
+            return None
+        return float(time_series.values[-1])
+    
+    def _current_value(
+        self,
+        prom_client,
+        metric_name: str,
+        time_series: TimeSeriesBuffer,
+        current_values: Optional[Dict] = None
+    ) -> Optional[float]:
+        """
+        Resolve the current value without a round trip when possible
+        
+        Order: the cycle's batched lookup, the tail of the cached history,
+        then an instant query for this metric alone.
+        
+        Args:
+            prom_client: PrometheusQueryClient instance
+            metric_name: Name of the metric
+            time_series: History for the metric
+            current_values: Batched values keyed by (metric name, series key)
+            
+        Returns:
+            Current metric value or None if unavailable
+        """
+        if current_values is not None and (metric_name, '') in current_values:
+            return current_values[(metric_name, '')]
+        
+        tail = self._history_tail(time_series)
+        if tail is not None:
+            return tail
+        
+        return prom_client.get_current_value(metric_name, aggregation='avg')
+    
     def detect_anomaly(
         self,
         prom_client,
         metric_name: str,
-        days: int = 7
+        days: int = 7,
+        current_values: Optional[Dict] = None
     ) -> Optional[Dict]:
         """
         Complete anomaly detection pipeline for a metric
@@ -201,6 +1210,7 @@ class AnomalyDetector:
             prom_client: PrometheusQueryClient instance
             metric_name: Name of the metric to analyze
             days: Number of days of historical data
+            current_values: Optional batched current values for the cycle
             
         Returns:
             Dictionary with anomaly detection results or None if detection fails
@@ -212,48 +1222,221 @@ class AnomalyDetector:
         if not time_series:
             return None
         
-        # Step 2: Fit Holt-Winters model
-        fitted_model = self.fit_holt_winters(time_series)
-        if not fitted_model:
-            logger.warning(f"Could not fit model for {metric_name}, using fallback")
-            return self._fallback_detection(prom_client, metric_name, time_series)
-        
-        # Step 3: Get current value
-        current_value = prom_client.get_current_value(metric_name, aggregation='avg')
+        # Step 2: Get current value
+        current_value = self._current_value(prom_client, metric_name, time_series, current_values)
         if current_value is None:
             logger.warning(f"Could not get current value for {metric_name}")
             return None
         
-        # Step 4: Calculate prediction and deviation
-        predicted_value, deviation, deviation_std = self.calculate_prediction_and_deviation(
-            fitted_model, current_value
+        # Step 3: Cheap screen, quiet metrics skip Holt-Winters
+        if self.screen_threshold is not None:
+            screened = self.screen({'': time_series}, {'': current_value})['']
+            if screened[2] <= self.screen_threshold:
+                self._count_tiers(screened=1)
+                logger.info(f"{metric_name} passed screening (z={screened[2]:.2f}), skipping model")
+                return self._screen_result(metric_name, current_value, screened)
+        
+        # Step 4: Fit the model (or advance the stored one)
+        if self.fourier is not None:
+            fitted_model = self.fourier.fit_many({'': time_series})['']
+        elif self.multi_resolution is not None:
+            fitted_model = self.get_multi_resolution_models(
+                prom_client, metric_name, {'': time_series}
+            )['']
+        else:
+            fitted_model = self.get_model(metric_name, time_series)
+        table = self.update_forecast_table(metric_name, fitted_model, time_series)
+        if not fitted_model:
+            logger.warning(f"Could not fit model for {metric_name}, using fallback")
+            self._count_tiers(fallback=1)
+            return self._score_fallback(metric_name, time_series, current_value)
+        self._count_tiers(modelled=1)
+        
+        # Step 5: Calculate prediction and deviation
+        if table is not None:
+            predicted_value, deviation, deviation_std = table.score(current_value)
+        else:
+            predicted_value, deviation, deviation_std = self.calculate_prediction_and_deviation(
+                fitted_model, current_value
+            )
+        
+        # Step 6: Classify anomaly, including points since the last cycle
+        result = self._build_result(
+            metric_name, predicted_value, current_value, deviation, deviation_std
         )
+        if self.backfill:
+            result = self._apply_backfill(
+                result, self.backfill_points(metric_name, time_series, fitted_model)
+            )
         
-        # Step 5: Classify anomaly
-        is_anomaly, severity, confidence = self.classify_anomaly(deviation_std)
+        logger.info(
+            f"Anomaly detection completed for {metric_name}: is_anomaly={result['is_anomaly']}"
+        )
+        return result
+    
+    def detect_series_anomalies(
+        self,
+        prom_client,
+        metric_name: str,
+        group_by: List[str],
+        days: int = 7,
+        series: Optional[List[Dict[str, str]]] = None,
+        max_series: Optional[int] = None,
+        current_values: Optional[Dict] = None
+    ) -> List[Dict]:
+        """
+        Anomaly detection for every series of a metric split by labels
         
-        # Build result
-        result = {
-            'timestamp': datetime.now().isoformat(),
-            'metric': metric_name,
-            'expected_value': float(predicted_value),
-            'actual_value': float(current_value),
-            'deviation': float(deviation),
-            'deviation_std': float(deviation_std),
-            'is_anomaly': is_anomaly,
-            'severity': severity,
-            'confidence': float(confidence),
-            'threshold': self.threshold
+        Each label set is fetched, modelled and scored separately. With many
+        series the models are fitted by the batch engine.
+        
+        Args:
+            prom_client: PrometheusQueryClient instance
+            metric_name: Name of the metric to analyze
+            group_by: Labels identifying a series
+            days: Number of days of historical data
+            series: Label sets to analyze, e.g. the top series by traffic
+            max_series: Cardinality cap applied in the query when no selection is given
+            current_values: Optional batched current values for the cycle
+            
+        Returns:
+            List of result dictionaries with 'series' and 'labels' added
+        """
+        logger.info(f"Starting per-series anomaly detection for {metric_name} by {group_by}")
+        
+        # Step 1: Fetch historical data for every series
+        limit = None
+        if series is None and max_series:
+            # No selection (e.g. top-K failed on a cold start): cap in the query
+            # instead of fetching every series and cutting afterwards
+            # Series of other shards are dropped after the fetch
+            limit = max_series * (self.shard.count if self.shard is not None else 1)
+            logger.warning(
+                f"Degraded: no series selection for {metric_name}, "
+                f"fetching the top {limit} series by value"
+            )
+        if self.history_cache is not None:
+            histories = self.history_cache.get_series_history(
+                prom_client, metric_name, group_by, days=days, aggregation='avg',
+                series=series, limit=limit
+            )
+        else:
+            histories = prom_client.get_series_history(
+                metric_name, group_by, days=days, aggregation='avg', series=series, limit=limit
+            )
+        if not histories:
+            logger.warning(f"No historical data available for {metric_name}")
+            return []
+        
+        histories = {
+            key: ts for key, ts in histories.items() if len(ts) >= self.min_data_points
         }
+        if self.shard is not None:
+            # Only reached with foreign series when no selection was given
+            histories = {
+                key: ts for key, ts in histories.items() if self.shard.owns(metric_name, key)
+            }
+        if max_series and len(histories) > max_series:
+            # topk holds per step, so series that traded places can exceed it
+            logger.warning(
+                f"{metric_name} returned {len(histories)} series, keeping the first {max_series}"
+            )
+            histories = {key: histories[key] for key in sorted(histories)[:max_series]}
+        if not histories:
+            logger.warning(f"Insufficient data points for every series of {metric_name}")
+            return []
         
-        logger.info(f"Anomaly detection completed for {metric_name}: is_anomaly={is_anomaly}")
-        return result
+        # Step 2: Get current values from the batch, the history tails or one query
+        if current_values is not None:
+            latest = {key: v for (name, key), v in current_values.items() if name == metric_name}
+        else:
+            latest = {key: self._history_tail(ts) for key, ts in histories.items()}
+            latest = {key: v for key, v in latest.items() if v is not None}
+        if len(latest) < len(histories):
+            queried = prom_client.get_current_series_values(metric_name, group_by, aggregation='avg')
+            latest = {**(queried or {}), **latest}
+        if not latest:
+            logger.warning(f"Could not get current values for {metric_name}")
+            return []
+        
+        # Step 3: Cheap screen over every series, only suspicious ones are modelled
+        histories = {key: ts for key, ts in histories.items() if key in latest}
+        screened = {}
+        if self.screen_threshold is not None:
+            screened = {
+                key: value for key, value in self.screen(histories, latest).items()
+                if value[2] <= self.screen_threshold
+            }
+        
+        # Step 4: Fit or advance a model per suspicious series
+        suspicious = {key: ts for key, ts in histories.items() if key not in screened}
+        if self.fourier is not None:
+            models = self.fourier.fit_many(suspicious)
+        elif self.multi_resolution is not None:
+            models = self.get_multi_resolution_models(
+                prom_client, metric_name, suspicious, group_by=group_by,
+                series=[dict(ts.labels) for ts in suspicious.values()]
+            )
+        else:
+            models = self.get_models(metric_name, suspicious)
+        
+        # Step 5: Score each series
+        results = []
+        for key, time_series in histories.items():
+            current_value = latest[key]
+            
+            if key in screened:
+                result = self._screen_result(metric_name, current_value, screened[key])
+                result['series'] = key
+                result['labels'] = dict(time_series.labels)
+                results.append(result)
+                continue
+            
+            fitted_model = models.get(key)
+            table = self.update_forecast_table(metric_name, fitted_model, time_series, key)
+            if fitted_model is None:
+                result = self._score_fallback(metric_name, time_series, current_value)
+            else:
+                if table is not None:
+                    predicted_value, deviation, deviation_std = table.score(current_value)
+                else:
+                    predicted_value, deviation, deviation_std = (
+                        self.calculate_prediction_and_deviation(fitted_model, current_value)
+                    )
+                result = self._build_result(
+                    metric_name, predicted_value, current_value, deviation, deviation_std
+                )
+                if self.backfill:
+                    result = self._apply_backfill(
+                        result, self.backfill_points(metric_name, time_series, fitted_model, key)
+                    )
+            result['series'] = key
+            result['labels'] = dict(time_series.labels)
+            results.append(result)
+        
+        fallback = sum(1 for key in models if models[key] is None)
+        self._count_tiers(
+            screened=len(screened), modelled=len(models) - fallback, fallback=fallback
+        )
+        if self.screen_threshold is not None:
+            logger.info(
+                f"Screening for {metric_name}: {len(screened)} of {len(histories)} series quiet, "
+                f"{len(models)} sent to Holt-Winters"
+            )
+        
+        anomalies = sum(1 for r in results if r['is_anomaly'])
+        logger.info(
+            f"Per-series detection completed for {metric_name}: "
+            f"{len(results)} series scored, {anomalies} anomalous"
+        )
+        return results
     
     def _fallback_detection(
         self,
         prom_client,
         metric_name: str,
-        time_series: List[Tuple[float, float]]
+        time_series: TimeSeriesBuffer,
+        current_values: Optional[Dict] = None
     ) -> Optional[Dict]:
         """
         Fallback detection using simple statistical methods
@@ -262,39 +1445,82 @@ class AnomalyDetector:
             prom_client: PrometheusQueryClient instance
             metric_name: Name of the metric
             time_series: Historical time series data
+            current_values: Optional batched current values for the cycle
             
         Returns:
             Dictionary with anomaly detection results
         """
         logger.info(f"Using fallback detection for {metric_name}")
         
-        # Calculate mean and std from historical data
-        values = np.array([v for _, v in time_series])
-        mean_value = np.mean(values)
-        std_value = np.std(values)
-        
         # Get current value
-        current_value = prom_client.get_current_value(metric_name, aggregation='avg')
+        current_value = self._current_value(prom_client, metric_name, time_series, current_values)
         if current_value is None:
             return None
         
+        return self._score_fallback(metric_name, time_series, current_value)
+    
+    def _score_fallback(
+        self,
+        metric_name: str,
+        time_series: TimeSeriesBuffer,
+        current_value: float
+    ) -> Dict:
+        """
+        Score a value against the mean and std of its history
+        
+        Args:
+            metric_name: Name of the metric
+            time_series: Historical time series data
+            current_value: Current metric value
+            
+        Returns:
+            Dictionary with anomaly detection results
+        """
+        # Calculate mean and std from historical data
+        values = as_buffer(time_series).values
+        mean_value = np.mean(values)
+        std_value = np.std(values)
+        
         # Calculate deviation
         deviation = abs(current_value - mean_value)
         deviation_std = deviation / std_value if std_value > 0 else 0
         
-        # Classify
+        result = self._build_result(metric_name, mean_value, current_value, deviation, deviation_std)
+        result['method'] = 'fallback'
+        return result
+    
+    def _build_result(
+        self,
+        metric_name: str,
+        expected_value: float,
+        actual_value: float,
+        deviation: float,
+        deviation_std: float
+    ) -> Dict:
+        """
+        Classify a deviation and build the detection result
+        
+        Args:
+            metric_name: Name of the metric
+            expected_value: Predicted value
+            actual_value: Observed value
+            deviation: Absolute deviation
+            deviation_std: Deviation in standard deviations
+            
+        Returns:
+            Dictionary with anomaly detection results
+        """
         is_anomaly, severity, confidence = self.classify_anomaly(deviation_std)
         
         return {
             'timestamp': datetime.now().isoformat(),
             'metric': metric_name,
-            'expected_value': float(mean_value),
-            'actual_value': float(current_value),
+            'expected_value': float(expected_value),
+            'actual_value': float(actual_value),
             'deviation': float(deviation),
             'deviation_std': float(deviation_std),
-            'is_anomaly': is_anomaly,
+            'is_anomaly': bool(is_anomaly),
             'severity': severity,
             'confidence': float(confidence),
-            'threshold': self.threshold,
-            'method': 'fallback'
+            'threshold': self.threshold
         }
@@ -0,0 +1,247 @@
+import logging
+import numpy as np
+from typing import List, Optional
+from model_registry import HoltWintersState
+
+logger = logging.getLogger(__name__)
+
+
+class BatchHoltWintersResult:
+    """Fitted parameters and final state for a batch of series"""
+
+    def __init__(
+        self,
+        alpha: np.ndarray,
+        beta: np.ndarray,
+        gamma: np.ndarray,
+        level: np.ndarray,
+        trend: np.ndarray,
+        season: np.ndarray,
+        residual_std: np.ndarray,
+        n_points: int
+    ):
+        """
+        Initialize batch result
+
+        Args:
+            alpha: Level smoothing parameter per series, shape (N,)
+            beta: Trend smoothing parameter per series, shape (N,)
+            gamma: Seasonal smoothing parameter per series, shape (N,)
+            level: Level after the last point, shape (N,)
+            trend: Trend after the last point, shape (N,)
+            season: Seasonal components indexed by t % m, shape (N, m)
+            residual_std: Standard deviation of in-sample residuals, shape (N,)
+            n_points: Number of points each series was fitted on
+        """
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+        self.level = level
+        self.trend = trend
+        self.season = season
+        self.residual_std = residual_std
+        self.n_points = n_points
+
+    @property
+    def seasonal_periods(self) -> int:
+        return self.season.shape[1]
+
+    def forecast(self, steps: int = 1) -> np.ndarray:
+        """
+        Forecast the next points for every series
+
+        Args:
+            steps: Number of points to forecast
+
+        Returns:
+            Array of forecasts, shape (N, steps)
+        """
+        horizon = np.arange(1, steps + 1)
+        seasonal = self.season[:, (self.n_points + horizon - 1) % self.seasonal_periods]
+        return self.level[:, None] + horizon[None, :] * self.trend[:, None] + seasonal
+
+    def to_states(self, timestamps: np.ndarray) -> List[HoltWintersState]:
+        """
+        Convert the batch into per-series states for the model registry
+
+        Args:
+            timestamps: Timestamps shared by the fitted series
+
+        Returns:
+            List of HoltWintersState, one per series
+        """
+        step_seconds = float(np.median(np.diff(timestamps))) if len(timestamps) > 1 else 1.0
+        season = np.roll(self.season, -(self.n_points % self.seasonal_periods), axis=1)
+        return [
+            HoltWintersState(
+                alpha=self.alpha[i],
+                beta=self.beta[i],
+                gamma=self.gamma[i],
+                level=self.level[i],
+                trend=self.trend[i],
+                season=season[i],
+                residual_std=self.residual_std[i],
+                last_timestamp=timestamps[-1],
+                step_seconds=step_seconds
+            )
+            for i in range(len(self.alpha))
+        ]
+
+
+class BatchHoltWinters:
+    """Additive Holt-Winters fitted on many aligned series at once with NumPy"""
+
+    def __init__(
+        self,
+        seasonal_periods: int = 288,
+        grid_size: int = 5,
+        refine_rounds: int = 5,
+        max_state_size: int = 4_000_000
+    ):
+        """
+        Initialize batch engine
+
+        Parameters are estimated by minimising the in-sample SSE: a coarse
+        grid over (alpha, beta, gamma) followed by shrinking local grids
+        around each series' best point, all evaluated in one pass per round.
+
+        Args:
+            seasonal_periods: Number of periods in a seasonal cycle
+            grid_size: Points per parameter in the coarse grid
+            refine_rounds: Number of local refinement rounds
+            max_state_size: Upper bound on seasonal state elements per pass
+        """
+        self.seasonal_periods = seasonal_periods
+        self.grid_size = grid_size
+        self.refine_rounds = refine_rounds
+        self.max_state_size = max_state_size
+
+    @staticmethod
+    def _initial_state(values: np.ndarray, m: int):
+        """
+        Initial level, trend and season from all complete cycles
+
+        Averaging the detrended seasonal profile over every cycle keeps noise
+        in the first cycle from being frozen into the seasonal components.
+        """
+        cycles = values.shape[1] // m
+        means = values[:, :cycles * m].reshape(values.shape[0], cycles, m).mean(axis=2)
+        if cycles > 1:
+            trend = (means[:, -1] - means[:, 0]) / ((cycles - 1) * m)
+        else:
+            trend = np.zeros(values.shape[0])
+        profile = values[:, :cycles * m].reshape(values.shape[0], cycles, m) - means[:, :, None]
+        # Remove the within-cycle trend before averaging the profile
+        profile -= trend[:, None, None] * (np.arange(m) - (m - 1) / 2)[None, None, :]
+        season = profile.mean(axis=1)
+        level = means[:, 0] - trend * (m - 1) / 2 - trend
+        return level, trend, season
+
+    @staticmethod
+    def _run(values, params, level, trend, season):
+        """
+        Run the additive recursion for C parameter sets on each of N series
+
+        Args:
+            values: Observations, shape (N, T)
+            params: (alpha, beta, gamma) candidates, shape (N, C, 3)
+            level, trend: Initial state, shape (N,)
+            season: Initial seasonal components, shape (N, m)
+
+        Returns:
+            Tuple of (sse, residual_std, level, trend, season); season has
+            shape (m, N, C) and the rest (N, C)
+        """
+        alpha, beta, gamma = params[..., 0], params[..., 1], params[..., 2]
+        shape = alpha.shape
+        level = np.broadcast_to(level[:, None], shape).copy()
+        trend = np.broadcast_to(trend[:, None], shape).copy()
+        # Seasonal index first so each step touches one contiguous (N, C) slab
+        season = np.broadcast_to(season.T[:, :, None], (season.shape[1],) + shape).copy()
+        m = season.shape[0]
+        total = np.zeros(shape)
+        total_sq = np.zeros(shape)
+        for t in range(values.shape[1]):
+            s = season[t % m]
+            error = values[:, t, None] - (level + trend + s)
+            total += error
+            total_sq += error * error
+            new_level = level + trend + alpha * error
+            trend += beta * (new_level - level - trend)
+            s += gamma * error
+            level = new_level
+        n = values.shape[1]
+        variance = np.maximum(total_sq / n - (total / n) ** 2, 0.0)
+        return total_sq, np.sqrt(variance), level, trend, season
+
+    def _evaluate(self, values, init, candidates):
+        """
+        Evaluate candidate parameter sets, shape (N, C, 3), for every series
+
+        Series are processed in chunks so the seasonal state for all
+        candidates stays within max_state_size elements.
+        """
+        n_series, n_candidates, _ = candidates.shape
+        m = init[2].shape[1]
+        chunk = max(1, self.max_state_size // (n_candidates * m))
+        sse = np.empty((n_series, n_candidates))
+        for start in range(0, n_series, chunk):
+            rows = slice(start, start + chunk)
+            sse[rows] = self._run(
+                values[rows], candidates[rows], init[0][rows], init[1][rows], init[2][rows]
+            )[0]
+        return sse
+
+    def fit(self, values: np.ndarray) -> Optional[BatchHoltWintersResult]:
+        """
+        Fit every row of a 2D array as its own series
+
+        Args:
+            values: Aligned observations, shape (N, T), oldest first
+
+        Returns:
+            BatchHoltWintersResult or None if the series are too short
+        """
+        values = np.asarray(values, dtype=np.float64)
+        n_series, n_points = values.shape
+        m = min(self.seasonal_periods, n_points // 2)
+        if n_series == 0 or m < 2:
+            logger.warning(f"Cannot batch fit {n_series} series of {n_points} points")
+            return None
+
+        init = self._initial_state(values, m)
+
+        # Coarse grid shared by every series
+        axis = np.linspace(0.0, 1.0, self.grid_size)
+        grid = np.stack(np.meshgrid(axis, axis, axis, indexing='ij'), axis=-1).reshape(-1, 3)
+        candidates = np.broadcast_to(grid, (n_series,) + grid.shape)
+        sse = self._evaluate(values, init, candidates)
+        best = candidates[np.arange(n_series), np.argmin(sse, axis=1)]
+        best_sse = sse.min(axis=1)
+
+        # Shrinking local grids around each series' best point
+        width = 1.0 / (self.grid_size - 1)
+        offsets = np.stack(
+            np.meshgrid([-1, 0, 1], [-1, 0, 1], [-1, 0, 1], indexing='ij'), axis=-1
+        ).reshape(-1, 3)
+        for _ in range(self.refine_rounds):
+            width /= 2
+            candidates = np.clip(best[:, None, :] + offsets[None, :, :] * width, 0.0, 1.0)
+            sse = self._evaluate(values, init, candidates)
+            improved = sse.min(axis=1) < best_sse
+            choice = candidates[np.arange(n_series), np.argmin(sse, axis=1)]
+            best[improved] = choice[improved]
+            best_sse = np.minimum(best_sse, sse.min(axis=1))
+
+        _, residual_std, level, trend, season = self._run(values, best[:, None, :], *init)
+        logger.info(f"Batch fitted {n_series} series of {n_points} points (m={m})")
+        return BatchHoltWintersResult(
+            alpha=best[:, 0],
+            beta=best[:, 1],
+            gamma=best[:, 2],
+            level=level[:, 0],
+            trend=trend[:, 0],
+            season=season[:, :, 0].T,
+            residual_std=residual_std[:, 0],
+            n_points=n_points
+        )
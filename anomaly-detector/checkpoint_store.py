@@ -0,0 +1,322 @@
+import hashlib
+import json
+import logging
+import os
+import time
+import numpy as np
+from typing import Callable, Dict, Optional, Tuple
+from timeseries import TimeSeriesBuffer
+from model_registry import HoltWintersState
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+
+def _identity(*parts) -> str:
+    """Stable identity of a cache or registry key across checkpoints"""
+    return json.dumps(parts)
+
+
+def _file_name(generation: int, identity: str) -> str:
+    """File name for a cache or registry key within one checkpoint generation"""
+    return f"{hashlib.sha1(identity.encode()).hexdigest()[:20]}-{generation}.npy"
+
+
+def _digest(array: np.ndarray) -> str:
+    """Content digest used to detect entries unchanged since the last checkpoint"""
+    return hashlib.blake2b(np.ascontiguousarray(array, dtype=np.float64), digest_size=16).hexdigest()
+
+
+class CheckpointStore:
+    """On-disk copy of the history cache and model registry for warm restarts"""
+
+    def __init__(self, directory: str):
+        """
+        Initialize checkpoint store
+
+        Each history window is written as a memory-mapped .npy file with two
+        columns (timestamps, values) and each model's seasonal state as a
+        small .npy file. A JSON manifest, replaced atomically after all data
+        files are written, lists the keys, labels and model parameters.
+        Every save writes a new generation of data files next to the ones
+        the current manifest references, and only removes the old ones once
+        the new manifest is in place, so a crash mid-save leaves the last
+        complete checkpoint intact. Entries whose content matches the last
+        checkpoint are not rewritten; the new manifest keeps referencing
+        the earlier generation's file.
+
+        Args:
+            directory: Directory holding the manifest and data files
+        """
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, 'manifest.json')
+        os.makedirs(os.path.join(directory, 'series'), exist_ok=True)
+        os.makedirs(os.path.join(directory, 'models'), exist_ok=True)
+        self.generation = self._saved_generation() + 1
+        self._previous = self._index(self._saved_manifest())
+        self._rewritten = 0
+        logger.info(f"Initialized CheckpointStore in {directory}")
+
+    def _saved_manifest(self) -> Dict:
+        """Manifest of the checkpoint on disk, empty if there is none"""
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def _saved_generation(self) -> int:
+        """Generation of the checkpoint on disk, 0 if there is none"""
+        try:
+            return int(self._saved_manifest().get('generation', 0))
+        except (TypeError, ValueError):
+            return 0
+
+    @staticmethod
+    def _index(manifest: Dict) -> Dict[str, Tuple[str, str]]:
+        """Map each entry identity in a manifest to its (file, digest)"""
+        if manifest.get('version') != MANIFEST_VERSION:
+            return {}
+        index = {}
+        for entry in manifest.get('windows', []):
+            index[_identity(entry['key'])] = (entry['file'], entry.get('digest'))
+        for group in manifest.get('groups', []):
+            for entry in group['series']:
+                identity = _identity(group['metric'], group['group_by'], entry['key'])
+                index[identity] = (entry['file'], entry.get('digest'))
+        for entry in manifest.get('models', []):
+            index[_identity(entry['metric'], entry['series_key'])] = (entry['season'], entry.get('digest'))
+        return index
+
+    def _store_array(self, subdir: str, identity: str, array: np.ndarray) -> Tuple[str, str]:
+        """
+        Write an array unless the last checkpoint already holds the same content
+
+        Args:
+            subdir: 'series' or 'models'
+            identity: Key identity from _identity()
+            array: Array to store
+
+        Returns:
+            Tuple of (file relative to the checkpoint directory, content digest)
+        """
+        digest = _digest(array)
+        previous_file, previous_digest = self._previous.get(identity, (None, None))
+        if previous_digest == digest and os.path.exists(os.path.join(self.directory, previous_file)):
+            return previous_file, digest
+        self._rewritten += 1
+        return self._write_array(subdir, _file_name(self.generation, identity), array), digest
+
+    def _write_array(self, subdir: str, name: str, array: np.ndarray) -> str:
+        """Write an array through a memory map and atomically move it into place"""
+        path = os.path.join(self.directory, subdir, name)
+        tmp_path = path + '.tmp'
+        mapped = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float64, shape=array.shape)
+        mapped[...] = array
+        mapped.flush()
+        del mapped
+        os.replace(tmp_path, path)
+        return f'{subdir}/{name}'
+
+    def _write_buffer(self, buffer: TimeSeriesBuffer, *key) -> Dict:
+        columns = np.stack([buffer.timestamps, buffer.values.astype(np.float64)])
+        file, digest = self._store_array('series', _identity(*key), columns)
+        return {
+            'file': file,
+            'digest': digest,
+            'capacity': buffer.capacity,
+            'labels': buffer.labels
+        }
+
+    def _read_buffer(self, entry: Dict, value_dtype) -> Optional[TimeSeriesBuffer]:
+        try:
+            columns = np.load(os.path.join(self.directory, entry['file']), mmap_mode='r')
+            return TimeSeriesBuffer.from_arrays(
+                columns[0], columns[1],
+                capacity=entry['capacity'],
+                value_dtype=value_dtype,
+                labels=entry['labels']
+            )
+        except Exception as e:
+            logger.warning(f"Skipping checkpointed history {entry.get('key')}: {e}")
+            return None
+
+    def save(self, history_cache=None, model_registry=None) -> bool:
+        """
+        Write a checkpoint of the cache and registry
+
+        Args:
+            history_cache: Optional MetricHistoryCache to save
+            model_registry: Optional ModelRegistry to save
+
+        Returns:
+            True if the checkpoint was written, False otherwise
+        """
+        start = time.monotonic()
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'generation': self.generation,
+            'saved_at': time.time(),
+            'windows': [],
+            'groups': [],
+            'models': []
+        }
+        self._rewritten = 0
+
+        try:
+            if history_cache is not None:
+                manifest['step'] = history_cache.step
+                windows, groups = history_cache.export()
+                for key, buffer in windows.items():
+                    if len(buffer):
+                        manifest['windows'].append({'key': key, **self._write_buffer(buffer, key)})
+                for (aggregation, metric_name, group_by), buffers in groups.items():
+                    manifest['groups'].append({
+                        'aggregation': aggregation,
+                        'metric': metric_name,
+                        'group_by': list(group_by),
+                        'series': [
+                            {'key': key, **self._write_buffer(buffer, metric_name, group_by, key)}
+                            for key, buffer in buffers.items() if len(buffer)
+                        ]
+                    })
+
+            if model_registry is not None:
+                for (metric_name, key), state in model_registry.export().items():
+                    fields, season = state.to_checkpoint()
+                    file, digest = self._store_array('models', _identity(metric_name, key), season)
+                    manifest['models'].append({
+                        'metric': metric_name,
+                        'series_key': key,
+                        'fields': fields,
+                        'season': file,
+                        'digest': digest
+                    })
+
+            # The new data files must be durable before the manifest refers to them
+            if self._rewritten:
+                self._fsync_directory(os.path.join(self.directory, 'series'))
+                self._fsync_directory(os.path.join(self.directory, 'models'))
+
+            tmp_path = self.manifest_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(manifest, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.manifest_path)
+            self._fsync_directory(self.directory)
+        except Exception as e:
+            logger.error(f"Error writing checkpoint: {e}")
+            return False
+
+        self.generation += 1
+        self._previous = self._index(manifest)
+        self._remove_unreferenced(manifest)
+        logger.info(
+            f"Checkpointed {len(manifest['windows'])} windows, "
+            f"{sum(len(g['series']) for g in manifest['groups'])} series and "
+            f"{len(manifest['models'])} models ({self._rewritten} files rewritten) "
+            f"in {time.monotonic() - start:.2f}s"
+        )
+        return True
+
+    @staticmethod
+    def _fsync_directory(path: str):
+        """Make the renames into a directory durable"""
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _remove_unreferenced(self, manifest: Dict):
+        """Delete data files the manifest no longer references, from any generation"""
+        referenced = {entry['file'] for entry in manifest['windows']}
+        referenced |= {entry['file'] for group in manifest['groups'] for entry in group['series']}
+        referenced |= {entry['season'] for entry in manifest['models']}
+        for subdir in ('series', 'models'):
+            for name in os.listdir(os.path.join(self.directory, subdir)):
+                if f'{subdir}/{name}' not in referenced:
+                    try:
+                        os.remove(os.path.join(self.directory, subdir, name))
+                    except OSError as e:
+                        logger.warning(f"Could not remove stale checkpoint file {name}: {e}")
+
+    def load(
+        self,
+        history_cache=None,
+        model_registry=None,
+        owns: Optional[Callable[[str, str], bool]] = None
+    ) -> bool:
+        """
+        Restore the cache and registry from the last checkpoint
+
+        Windows are only restored when the cache uses the step they were
+        saved with. Missing or unreadable entries are skipped, so the next
+        cycle fetches them in full.
+
+        Args:
+            history_cache: Optional MetricHistoryCache to fill
+            model_registry: Optional ModelRegistry to fill
+            owns: Optional predicate on (metric, series key); windows and
+                models it rejects are not loaded
+
+        Returns:
+            True if a checkpoint was loaded, False otherwise
+        """
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            logger.info("No checkpoint found, starting cold")
+            return False
+        except Exception as e:
+            logger.error(f"Error reading checkpoint manifest: {e}")
+            return False
+
+        if manifest.get('version') != MANIFEST_VERSION:
+            logger.warning(f"Ignoring checkpoint with version {manifest.get('version')}")
+            return False
+
+        windows, groups, states = {}, {}, {}
+        if history_cache is not None and manifest.get('step') == history_cache.step:
+            for entry in manifest['windows']:
+                # Window keys are '<aggregation>(<metric>)'
+                metric_name = entry['key'].partition('(')[2][:-1]
+                if owns is not None and not owns(metric_name, ''):
+                    continue
+                buffer = self._read_buffer(entry, history_cache.value_dtype)
+                if buffer is not None:
+                    windows[entry['key']] = buffer
+            for group in manifest['groups']:
+                buffers = {}
+                for entry in group['series']:
+                    if owns is not None and not owns(group['metric'], entry['key']):
+                        continue
+                    buffer = self._read_buffer(entry, history_cache.value_dtype)
+                    if buffer is not None:
+                        buffers[entry['key']] = buffer
+                if buffers:
+                    groups[(group['aggregation'], group['metric'], tuple(group['group_by']))] = buffers
+            history_cache.load(windows, groups)
+
+        if model_registry is not None:
+            for entry in manifest['models']:
+                if owns is not None and not owns(entry['metric'], entry['series_key']):
+                    continue
+                try:
+                    season = np.load(os.path.join(self.directory, entry['season']))
+                    state = HoltWintersState.from_checkpoint(entry['fields'], season)
+                except Exception as e:
+                    logger.warning(f"Skipping checkpointed model for {entry['metric']}: {e}")
+                    continue
+                states[(entry['metric'], entry['series_key'])] = state
+            model_registry.load(states)
+
+        age = time.time() - manifest.get('saved_at', 0)
+        logger.info(
+            f"Restored {len(windows)} windows, {sum(len(g) for g in groups.values())} series "
+            f"and {len(states)} models from a checkpoint {age:.0f}s old"
+        )
+        return True
@@ -14,9 +14,129 @@ class Config:
     HISTORICAL_DAYS = int(os.getenv('HISTORICAL_DAYS', '7'))
     ANOMALY_THRESHOLD = float(os.getenv('ANOMALY_THRESHOLD', '2.5'))
     
+    # History cache configuration (keep the window in memory, fetch only new points)
+    HISTORY_CACHE_ENABLED = os.getenv('HISTORY_CACHE_ENABLED', 'true').lower() == 'true'
+    HISTORY_VALUE_DTYPE = os.getenv('HISTORY_VALUE_DTYPE', 'float64')
+    
+    # Model registry configuration (advance state between full refits). Refits run
+    # when a CUSUM change-point test on the residuals fires (0 = off), residuals
+    # drift, or the model reaches the maximum age
+    MODEL_REGISTRY_ENABLED = os.getenv('MODEL_REGISTRY_ENABLED', 'true').lower() == 'true'
+    MODEL_REFIT_INTERVAL_MINUTES = int(os.getenv('MODEL_REFIT_INTERVAL_MINUTES', '1440'))
+    MODEL_DRIFT_THRESHOLD = float(os.getenv('MODEL_DRIFT_THRESHOLD', '2.0'))
+    MODEL_CHANGE_POINT_THRESHOLD = float(os.getenv('MODEL_CHANGE_POINT_THRESHOLD', '5.0')) or None
+    
+    # Directory for history and model checkpoints (empty = disabled); use a
+    # persistent volume so restarts only fetch the gap since the last cycle
+    CHECKPOINT_DIR = os.getenv('CHECKPOINT_DIR', '')
+    
+    # Where current values come from: 'batch' (one instant query per cycle),
+    # 'history' (newest cached range point, no extra query) or 'query' (one per metric)
+    CURRENT_VALUE_SOURCE = os.getenv('CURRENT_VALUE_SOURCE', 'batch').lower()
+    
+    # Score every point since the last cycle, not only the current value
+    BACKFILL_SCORING = os.getenv('BACKFILL_SCORING', 'true').lower() == 'true'
+    
+    # Cascaded detection: a median/MAD screen runs over every series and only
+    # series whose robust z-score exceeds SCREEN_THRESHOLD get Holt-Winters (0 = off)
+    SCREEN_THRESHOLD = float(os.getenv('SCREEN_THRESHOLD', '0')) or None
+    SCREEN_WINDOW = int(os.getenv('SCREEN_WINDOW', '288'))
+    
+    # Fast path: score current values against precomputed forecast tables
+    # every FAST_CHECK_INTERVAL_SECONDS between full cycles (0 = disabled)
+    FAST_CHECK_INTERVAL_SECONDS = int(os.getenv('FAST_CHECK_INTERVAL_SECONDS', '0'))
+    FORECAST_HORIZON_STEPS = int(os.getenv('FORECAST_HORIZON_STEPS', '12'))
+    
+    # Time budgets: once a cycle has run CYCLE_TIME_BUDGET_SECONDS (0 = 80% of the
+    # check interval) due refits are skipped and series keep their last good model;
+    # a fit (in-process or on the pool) is abandoned after FIT_TIMEOUT_SECONDS (0 = no limit)
+    # and the optimiser stops after FIT_MAX_ITERATIONS (0 = statsmodels default)
+    CYCLE_TIME_BUDGET_SECONDS = (
+        float(os.getenv('CYCLE_TIME_BUDGET_SECONDS', '0')) or CHECK_INTERVAL_MINUTES * 60 * 0.8
+    )
+    FIT_TIMEOUT_SECONDS = float(os.getenv('FIT_TIMEOUT_SECONDS', '60')) or None
+    FIT_MAX_ITERATIONS = int(os.getenv('FIT_MAX_ITERATIONS', '50')) or None
+    
+    # Per-metric cadence as 'metric=interval[:priority]' entries (e.g.
+    # 'http_server_errors_total=30s:10'); other metrics run every
+    # CHECK_INTERVAL_MINUTES. Runs stay on a fixed timeline, each delayed by up
+    # to SCHEDULE_JITTER_SECONDS (capped at a tenth of the interval)
+    METRIC_SCHEDULE = os.getenv('METRIC_SCHEDULE', '')
+    SCHEDULE_JITTER_SECONDS = float(os.getenv('SCHEDULE_JITTER_SECONDS', '5'))
+    
+    # Sharding: SHARD_COUNT replicas split the series by consistent hashing on
+    # the series key (the metric name when SERIES_GROUP_BY is empty). This
+    # replica's index is SHARD_INDEX, or the ordinal of a StatefulSet pod name
+    SHARD_COUNT = int(os.getenv('SHARD_COUNT', '1'))
+    SHARD_INDEX = os.getenv('SHARD_INDEX', '')
+    HOSTNAME = os.getenv('HOSTNAME', '')
+    
+    # Model engine: 'holt_winters' or 'fourier' (trend plus Fourier terms for
+    # several seasons, e.g. daily and weekly, fitted by batched least squares)
+    MODEL_ENGINE = os.getenv('MODEL_ENGINE', 'holt_winters').lower()
+    FOURIER_PERIODS_HOURS = [float(p) for p in os.getenv('FOURIER_PERIODS_HOURS', '24,168').split(',') if p.strip()]
+    FOURIER_HARMONICS = [int(k) for k in os.getenv('FOURIER_HARMONICS', '6,3').split(',') if k.strip()]
+    
+    # Multi-resolution fitting: models are fitted on HISTORICAL_DAYS of history
+    # averaged server-side into MULTI_RESOLUTION_STEP buckets (empty = disabled),
+    # and only the last MULTI_RESOLUTION_FINE_DAYS are fetched at full resolution
+    MULTI_RESOLUTION_STEP = os.getenv('MULTI_RESOLUTION_STEP', '')
+    MULTI_RESOLUTION_SEASONAL_PERIODS = int(os.getenv('MULTI_RESOLUTION_SEASONAL_PERIODS', '24'))
+    MULTI_RESOLUTION_FINE_DAYS = int(os.getenv('MULTI_RESOLUTION_FINE_DAYS', '1'))
+    
+    # Series count from which models are fitted with the vectorized batch engine
+    BATCH_FIT_MIN_SERIES = int(os.getenv('BATCH_FIT_MIN_SERIES', '50'))
+    
+    # Concurrency configuration ('sequential' or 'concurrent')
+    DETECTION_MODE = os.getenv('DETECTION_MODE', 'sequential').lower()
+    IO_WORKERS = int(os.getenv('IO_WORKERS', '8'))
+    # Fit processes, or 'auto' for one per CPU allowed by the container limit
+    FIT_WORKERS = os.getenv('FIT_WORKERS', '2')
+    ALERT_WORKERS = int(os.getenv('ALERT_WORKERS', '4'))
+    
+    # HTTP connection pooling shared by Prometheus queries and alert webhooks
+    HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '10'))
+    PROMETHEUS_POOL_SIZE = int(os.getenv('PROMETHEUS_POOL_SIZE', '10'))
+    ALERT_POOL_SIZE = int(os.getenv('ALERT_POOL_SIZE', '4'))
+    HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '3.05'))
+    HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '30'))
+    HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '3'))
+    HTTP_BACKOFF_FACTOR = float(os.getenv('HTTP_BACKOFF_FACTOR', '0.5'))
+    
+    # Long range queries are split into chunks fetched concurrently
+    # (Prometheus rejects more than 11,000 points per series)
+    QUERY_CHUNK_POINTS = int(os.getenv('QUERY_CHUNK_POINTS', '2500'))
+    QUERY_CHUNK_WORKERS = int(os.getenv('QUERY_CHUNK_WORKERS', '4'))
+    # 'numpy' streams range responses straight into arrays, 'json' uses prometheus_api_client
+    QUERY_RESPONSE_DECODER = os.getenv('QUERY_RESPONSE_DECODER', 'numpy').lower()
+    
     # Alert configuration
     ALERT_WEBHOOK_URL = os.getenv('ALERT_WEBHOOK_URL', 'http://grafana:3000/api/alerts')
     
+    # Alerts are queued and sent by background threads (queue size 0 = send inline);
+    # up to ALERT_BATCH_SIZE alerts share one request (above 1 the receiver must
+    # accept a JSON array, e.g. Alertmanager /api/v2/alerts)
+    ALERT_QUEUE_SIZE = int(os.getenv('ALERT_QUEUE_SIZE', '1000'))
+    ALERT_SENDER_THREADS = int(os.getenv('ALERT_SENDER_THREADS', '2'))
+    ALERT_BATCH_SIZE = int(os.getenv('ALERT_BATCH_SIZE', '1'))
+    ALERT_LINGER_SECONDS = float(os.getenv('ALERT_LINGER_SECONDS', '0.5'))
+    
+    # With ALERT_OUTBOX_DIR set, alerts are appended to an outbox file there and
+    # retried with exponential backoff until delivered (replaces the in-memory queue)
+    ALERT_OUTBOX_DIR = os.getenv('ALERT_OUTBOX_DIR', '')
+    ALERT_DESTINATION_CONCURRENCY = int(os.getenv('ALERT_DESTINATION_CONCURRENCY', '2'))
+    ALERT_RETRY_MAX_BACKOFF_SECONDS = float(os.getenv('ALERT_RETRY_MAX_BACKOFF_SECONDS', '300'))
+    ALERT_MAX_AGE_HOURS = float(os.getenv('ALERT_MAX_AGE_HOURS', '24'))
+    
+    # A firing alert is sent once, then again only on escalation or every
+    # ALERT_REPEAT_INTERVAL_MINUTES; it resolves after ALERT_RESOLVE_AFTER_CYCLES
+    # normal results in a row. Alerts unseen for ALERT_STATE_TTL_HOURS are forgotten
+    ALERT_DEDUP_ENABLED = os.getenv('ALERT_DEDUP_ENABLED', 'true').lower() == 'true'
+    ALERT_REPEAT_INTERVAL_MINUTES = float(os.getenv('ALERT_REPEAT_INTERVAL_MINUTES', '60'))
+    ALERT_RESOLVE_AFTER_CYCLES = int(os.getenv('ALERT_RESOLVE_AFTER_CYCLES', '2'))
+    ALERT_STATE_TTL_HOURS = float(os.getenv('ALERT_STATE_TTL_HOURS', '24'))
+    ALERT_STATE_MAX_ENTRIES = int(os.getenv('ALERT_STATE_MAX_ENTRIES', '10000'))
+    
     # Metrics to monitor
     METRICS_TO_MONITOR = [
         'http_server_request_duration_seconds',
@@ -24,5 +144,10 @@ class Config:
         'http_server_errors_total'
     ]
     
+    # Per-series detection: labels to split each metric by (empty = single avg() series)
+    SERIES_GROUP_BY = [l.strip() for l in os.getenv('SERIES_GROUP_BY', '').split(',') if l.strip()]
+    MAX_SERIES_PER_METRIC = int(os.getenv('MAX_SERIES_PER_METRIC', '100'))
+    SERIES_TRAFFIC_METRIC = os.getenv('SERIES_TRAFFIC_METRIC', 'http_server_requests_total')
+    
     # Logging
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
@@ -0,0 +1,80 @@
+import logging
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Union
+
+logger = logging.getLogger(__name__)
+
+
+def available_cpus() -> int:
+    """
+    Number of CPUs this process may use, honouring a cgroup CPU limit
+
+    Returns:
+        CPU count rounded up from the container quota, or the affinity set size
+    """
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+    quota = period = None
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+    except (OSError, ValueError):
+        try:
+            # cgroup v1: quota is -1 when unlimited
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+                quota = f.read().strip()
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+                period = f.read().strip()
+        except OSError:
+            pass
+    if quota not in (None, 'max', '-1'):
+        cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    return max(1, cpus)
+
+
+class StageExecutors:
+    """Worker pools for the stages of a concurrent detection cycle"""
+
+    def __init__(
+        self,
+        io_workers: int = 8,
+        fit_workers: Union[int, str] = 2,
+        alert_workers: int = 4
+    ):
+        """
+        Initialize stage executors
+
+        Args:
+            io_workers: Threads for Prometheus queries (one metric per task)
+            fit_workers: Processes for model fitting, 0 fits in the I/O thread,
+                'auto' uses one per available CPU
+            alert_workers: Threads for webhook delivery
+        """
+        if fit_workers == 'auto':
+            fit_workers = available_cpus()
+        fit_workers = int(fit_workers)
+        self.io = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix='detect-io')
+        self.alerts = ThreadPoolExecutor(max_workers=alert_workers, thread_name_prefix='alert')
+
+        # Spawned workers do not inherit the parent's threads or locks
+        self.fit = None
+        if fit_workers > 0:
+            self.fit = ProcessPoolExecutor(
+                max_workers=fit_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+
+        logger.info(
+            f"Initialized StageExecutors with io_workers={io_workers}, "
+            f"fit_workers={fit_workers}, alert_workers={alert_workers}"
+        )
+
+    def shutdown(self):
+        """Stop all worker pools, waiting for running tasks"""
+        self.io.shutdown(wait=True)
+        self.alerts.shutdown(wait=True)
+        if self.fit is not None:
+            self.fit.shutdown(wait=True)
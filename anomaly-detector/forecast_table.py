@@ -0,0 +1,144 @@
+import logging
+import numpy as np
+from typing import Dict, Optional, Tuple
+from model_registry import HoltWintersState
+from multi_resolution import MultiResolutionModel
+from fourier_regression import FourierModel
+
+logger = logging.getLogger(__name__)
+
+
+class ForecastTable:
+    """Forecasts and prediction intervals for the next K steps of one series"""
+
+    def __init__(
+        self,
+        last_timestamp: float,
+        step_seconds: float,
+        forecasts: np.ndarray,
+        sigmas: np.ndarray,
+        labels: Optional[Dict[str, str]] = None
+    ):
+        """
+        Initialize forecast table
+
+        Args:
+            last_timestamp: Timestamp of the last point the model has seen
+            step_seconds: Spacing between points in seconds
+            forecasts: Point forecasts, forecasts[h] is for last_timestamp + (h + 1) * step
+            sigmas: Forecast standard deviation for each horizon
+            labels: Labels identifying the series
+        """
+        self.last_timestamp = float(last_timestamp)
+        self.step_seconds = float(step_seconds)
+        self.forecasts = np.asarray(forecasts, dtype=np.float64)
+        self.sigmas = np.asarray(sigmas, dtype=np.float64)
+        self.labels = dict(labels or {})
+
+    @classmethod
+    def from_model(
+        cls,
+        fitted_model,
+        last_timestamp: float,
+        step_seconds: float,
+        horizon: int = 12,
+        labels: Optional[Dict[str, str]] = None
+    ) -> 'ForecastTable':
+        """
+        Build the table from a fitted additive Holt-Winters model
+
+        The h-step standard deviation follows the ETS(A,A,A) formula
+        sigma * sqrt(1 + sum_{j<h} c_j^2) with c_j = alpha * (1 + j * beta)
+        + gamma * [j % m == 0], so intervals widen with the horizon. A
+        MultiResolutionModel horizon stays within a bucket or two of its
+        coarse model, and a FourierModel's seasonal terms do not drift, so
+        their residual std is used throughout.
+
+        Args:
+            fitted_model: HoltWintersState, MultiResolutionModel, FourierModel
+                or statsmodels HoltWintersResults
+            last_timestamp: Timestamp of the last point the model has seen
+            step_seconds: Spacing between points in seconds
+            horizon: Number of steps to precompute
+            labels: Labels identifying the series
+
+        Returns:
+            ForecastTable for the next horizon steps
+        """
+        if isinstance(fitted_model, (MultiResolutionModel, FourierModel)):
+            forecasts = fitted_model.forecast(steps=horizon)
+            sigmas = np.full(horizon, fitted_model.residual_std)
+            return cls(last_timestamp, step_seconds, forecasts, sigmas, labels=labels)
+        if isinstance(fitted_model, HoltWintersState):
+            alpha, beta, gamma = fitted_model.alpha, fitted_model.beta, fitted_model.gamma
+            seasonal_periods = fitted_model.seasonal_periods
+            residual_std = fitted_model.residual_std
+        else:
+            params = fitted_model.params
+            alpha = params['smoothing_level']
+            beta = params['smoothing_trend']
+            gamma = params['smoothing_seasonal']
+            seasonal_periods = fitted_model.model.seasonal_periods
+            residual_std = np.std(fitted_model.resid)
+
+        forecasts = np.asarray(fitted_model.forecast(steps=horizon), dtype=np.float64)
+        j = np.arange(1, horizon)
+        c = alpha * (1 + j * beta) + gamma * (j % seasonal_periods == 0)
+        sigmas = residual_std * np.sqrt(1 + np.concatenate([[0.0], np.cumsum(c ** 2)]))
+        return cls(last_timestamp, step_seconds, forecasts, sigmas, labels=labels)
+
+    @property
+    def horizon(self) -> int:
+        return len(self.forecasts)
+
+    @property
+    def expires_at(self) -> float:
+        """Timestamp after which the table has no forecast left"""
+        return self.last_timestamp + (self.horizon + 0.5) * self.step_seconds
+
+    def index(self, timestamp: float) -> Optional[int]:
+        """
+        Row of the table for a point in time
+
+        Args:
+            timestamp: Time of the sample in seconds
+
+        Returns:
+            Index of the nearest forecast step (at least the first), or None
+            once the table has expired
+        """
+        step = int(round((timestamp - self.last_timestamp) / self.step_seconds)) - 1
+        if step >= self.horizon:
+            return None
+        return max(step, 0)
+
+    def interval(self, z: float, index: int = 0) -> Tuple[float, float]:
+        """
+        Prediction interval for one row
+
+        Args:
+            z: Width in standard deviations
+            index: Row of the table
+
+        Returns:
+            Tuple of (lower, upper) bounds
+        """
+        forecast, sigma = self.forecasts[index], self.sigmas[index]
+        return forecast - z * sigma, forecast + z * sigma
+
+    def score(self, value: float, index: int = 0) -> Tuple[float, float, float]:
+        """
+        Compare a value with one row of the table
+
+        Args:
+            value: Observed value
+            index: Row of the table
+
+        Returns:
+            Tuple of (predicted_value, deviation, deviation_std)
+        """
+        predicted_value = self.forecasts[index]
+        sigma = self.sigmas[index]
+        deviation = abs(value - predicted_value)
+        deviation_std = deviation / sigma if sigma > 0 else 0.0
+        return predicted_value, deviation, deviation_std
@@ -0,0 +1,186 @@
+import logging
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+from timeseries import TimeSeriesBuffer, as_buffer
+
+logger = logging.getLogger(__name__)
+
+# (period in seconds, number of harmonics)
+Season = Tuple[float, int]
+
+
+def design_matrix(
+    timestamps: np.ndarray,
+    seasons: Sequence[Season],
+    origin: float,
+    scale: float
+) -> np.ndarray:
+    """
+    Regressors for a linear trend plus Fourier terms of every season
+
+    Phases are taken from the absolute timestamp, so the same column means
+    the same time of day or week in every window.
+
+    Args:
+        timestamps: Point timestamps in seconds
+        seasons: (period, harmonics) pairs
+        origin: Timestamp where the trend term is zero
+        scale: Seconds per trend unit, keeps the trend column near [-1, 1]
+
+    Returns:
+        Array of shape (len(timestamps), 2 + 2 * total harmonics)
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    columns = [np.ones(len(timestamps)), (timestamps - origin) / scale]
+    for period, harmonics in seasons:
+        # Reduce before scaling so epoch-sized timestamps keep their precision
+        phase = 2 * np.pi * np.mod(timestamps, period) / period
+        for k in range(1, harmonics + 1):
+            columns.append(np.sin(k * phase))
+            columns.append(np.cos(k * phase))
+    return np.column_stack(columns)
+
+
+class FourierModel:
+    """Linear trend plus multi-seasonal Fourier terms fitted to one series"""
+
+    def __init__(
+        self,
+        coef: np.ndarray,
+        seasons: Sequence[Season],
+        origin: float,
+        scale: float,
+        resid: np.ndarray,
+        last_timestamp: float,
+        step_seconds: float
+    ):
+        """
+        Initialize model
+
+        Args:
+            coef: Regression coefficients matching design_matrix columns
+            seasons: (period, harmonics) pairs the model was fitted with
+            origin: Trend origin used at fit time
+            scale: Trend scale used at fit time
+            resid: In-sample residuals, one per fitted point
+            last_timestamp: Timestamp of the last fitted point
+            step_seconds: Spacing between points in seconds
+        """
+        self.coef = np.asarray(coef, dtype=np.float64)
+        self.seasons = list(seasons)
+        self.origin = origin
+        self.scale = scale
+        self.resid = np.asarray(resid, dtype=np.float64)
+        self.residual_std = float(np.std(self.resid))
+        self.last_timestamp = float(last_timestamp)
+        self.step_seconds = float(step_seconds)
+
+    def predict(self, timestamps: np.ndarray) -> np.ndarray:
+        """
+        Model value at arbitrary timestamps
+
+        Args:
+            timestamps: Timestamps in seconds
+
+        Returns:
+            Predicted values
+        """
+        return design_matrix(timestamps, self.seasons, self.origin, self.scale) @ self.coef
+
+    def forecast(self, steps: int = 1) -> np.ndarray:
+        """
+        Forecast the next points after the fitted window
+
+        Args:
+            steps: Number of points to forecast
+
+        Returns:
+            Array of forecasts
+        """
+        return self.predict(self.last_timestamp + self.step_seconds * np.arange(1, steps + 1))
+
+
+class FourierRegression:
+    """Several seasonalities at once by least squares on Fourier terms, batched across series"""
+
+    def __init__(self, seasons: Sequence[Season] = ((86400, 6), (604800, 3))):
+        """
+        Initialize regression engine
+
+        Each season contributes sin/cos pairs for its first harmonics, so a
+        daily and a weekly cycle cost 2 * (6 + 3) columns instead of a
+        2016-point Holt-Winters season. Series sharing a timestamp grid are
+        solved together in one least squares call.
+
+        Args:
+            seasons: (period in seconds, harmonics) pairs
+        """
+        self.seasons = [(float(period), int(harmonics)) for period, harmonics in seasons]
+
+    def _seasons_for(self, span: float) -> List[Season]:
+        """Seasons with at least one full cycle inside the window"""
+        seasons = [(period, harmonics) for period, harmonics in self.seasons if period <= span]
+        if len(seasons) < len(self.seasons):
+            dropped = [f'{period:.0f}s' for period, _ in self.seasons if period > span]
+            logger.warning(
+                f"History spans {span:.0f}s, leaving out seasons longer than that: {', '.join(dropped)}"
+            )
+        return seasons
+
+    def fit(self, timestamps: np.ndarray, values: np.ndarray) -> List[FourierModel]:
+        """
+        Fit every row of a 2D array sampled on the same timestamps
+
+        Args:
+            timestamps: Shared timestamps, shape (T,)
+            values: Observations, shape (N, T)
+
+        Returns:
+            List of FourierModel, one per row
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+        span = float(timestamps[-1] - timestamps[0]) if len(timestamps) > 1 else 0.0
+        step_seconds = float(np.median(np.diff(timestamps))) if len(timestamps) > 1 else 1.0
+        seasons = self._seasons_for(span)
+        origin, scale = float(timestamps[-1]), max(span, 1.0)
+
+        design = design_matrix(timestamps, seasons, origin, scale)
+        # One solve for all series: (T, p) against (T, N)
+        coef = np.linalg.lstsq(design, values.T, rcond=None)[0]
+        resid = values - (design @ coef).T
+        return [
+            FourierModel(coef[:, i], seasons, origin, scale, resid[i], timestamps[-1], step_seconds)
+            for i in range(values.shape[0])
+        ]
+
+    def fit_many(self, series: Dict[str, TimeSeriesBuffer]) -> Dict[str, Optional[FourierModel]]:
+        """
+        Fit many series, batching those with identical timestamps
+
+        Args:
+            series: Histories keyed by series identifier
+
+        Returns:
+            FourierModel (or None if the series cannot be fitted) per series
+        """
+        series = {key: as_buffer(ts) for key, ts in series.items()}
+        models: Dict[str, Optional[FourierModel]] = {key: None for key in series}
+
+        # Series from one range query usually share a grid; gaps split them off
+        groups: Dict[bytes, List[str]] = {}
+        for key, time_series in series.items():
+            if len(time_series) < 3 or np.std(time_series.values) == 0:
+                continue
+            groups.setdefault(time_series.timestamps.tobytes(), []).append(key)
+
+        for keys in groups.values():
+            timestamps = series[keys[0]].timestamps
+            values = np.stack([series[key].values for key in keys])
+            try:
+                models.update(zip(keys, self.fit(timestamps, values)))
+            except Exception as e:
+                logger.error(f"Error fitting Fourier regression for {len(keys)} series: {e}")
+
+        logger.info(f"Fourier regression fitted {len(series)} series in {len(groups)} batches")
+        return models
@@ -0,0 +1,253 @@
+import logging
+import threading
+import numpy as np
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from timeseries import TimeSeriesBuffer, as_buffer, parse_step, series_key
+
+logger = logging.getLogger(__name__)
+
+class MetricHistoryCache:
+    """Rolling in-memory history window per metric, refreshed incrementally"""
+
+    def __init__(self, step: str = '5m', value_dtype=np.float64):
+        """
+        Initialize history cache
+
+        Args:
+            step: Query resolution step used for both full and delta fetches
+            value_dtype: NumPy dtype used to store values (float64 or float32)
+        """
+        self.step = step
+        self.step_seconds = parse_step(step)
+        self.value_dtype = np.dtype(value_dtype)
+        self._series: Dict[str, TimeSeriesBuffer] = {}
+        self._groups: Dict[Tuple, Dict[str, TimeSeriesBuffer]] = {}
+        self._lock = threading.Lock()
+        logger.info(f"Initialized MetricHistoryCache with step={step}")
+
+    def get_history(
+        self,
+        prom_client,
+        metric_name: str,
+        days: int = 7,
+        aggregation: str = 'avg'
+    ) -> Optional[TimeSeriesBuffer]:
+        """
+        Get the history window for a metric, fetching only the missing tail
+
+        The first call for a metric pulls the full window. Later calls ask
+        Prometheus only for points after the newest cached timestamp and drop
+        points that have fallen out of the window.
+
+        Args:
+            prom_client: PrometheusQueryClient instance
+            metric_name: Name of the metric to fetch
+            days: Length of the history window in days
+            aggregation: Aggregation function (avg, max, min, sum)
+
+        Returns:
+            Cached TimeSeriesBuffer (shared, treat as read-only) or None if no data
+        """
+        key = f'{aggregation}({metric_name})'
+        end_time = datetime.now()
+        cutoff = (end_time - timedelta(days=days)).timestamp()
+        capacity = days * 86400 // self.step_seconds + 1
+
+        with self._lock:
+            buffer = self._series.get(key)
+
+        if buffer and buffer.capacity >= capacity and buffer.last_timestamp >= cutoff:
+            last_timestamp = buffer.last_timestamp
+            delta_start = datetime.fromtimestamp(last_timestamp + self.step_seconds)
+            if delta_start <= end_time:
+                delta = prom_client.get_metric_range(
+                    metric_name=metric_name,
+                    start_time=delta_start,
+                    end_time=end_time,
+                    aggregation=aggregation,
+                    step=self.step
+                )
+                if delta:
+                    delta = as_buffer(delta)
+                    new = delta.timestamps > last_timestamp
+                    buffer.extend(delta.timestamps[new], delta.values[new])
+                    logger.debug(f"Appended {int(new.sum())} new points for {metric_name}")
+                else:
+                    logger.warning(f"No new data for {metric_name}, serving cached window")
+        else:
+            time_series = prom_client.get_metric_history(
+                metric_name=metric_name,
+                days=days,
+                aggregation=aggregation
+            )
+            if not time_series:
+                return None
+            time_series = as_buffer(time_series)
+            buffer = TimeSeriesBuffer.from_arrays(
+                time_series.timestamps,
+                time_series.values,
+                capacity=capacity,
+                value_dtype=self.value_dtype
+            )
+            logger.info(f"Cached full history window for {metric_name}: {len(buffer)} points")
+            with self._lock:
+                self._series[key] = buffer
+
+        # Trim points that have fallen out of the window
+        buffer.drop_before(cutoff)
+        return buffer
+
+    def get_series_history(
+        self,
+        prom_client,
+        metric_name: str,
+        group_by: List[str],
+        days: int = 7,
+        aggregation: str = 'avg',
+        series: Optional[List[Dict[str, str]]] = None,
+        limit: Optional[int] = None
+    ) -> Optional[Dict[str, TimeSeriesBuffer]]:
+        """
+        Get the history window for every series of a metric split by labels
+
+        Cached series are extended with one delta query. Series that are
+        selected but not cached yet get one full-window query restricted to
+        them, and series that are no longer selected are evicted.
+
+        Args:
+            prom_client: PrometheusQueryClient instance
+            metric_name: Name of the metric to fetch
+            group_by: Labels identifying a series
+            days: Length of the history window in days
+            aggregation: Aggregation function (avg, max, min, sum)
+            series: Label sets to keep, or None to keep every returned series
+            limit: Optional topk cap on the series fetched without a selection
+
+        Returns:
+            Cached TimeSeriesBuffer per series key or None if no data
+        """
+        group_key = (aggregation, metric_name, tuple(group_by))
+        end_time = datetime.now()
+        cutoff = (end_time - timedelta(days=days)).timestamp()
+        capacity = days * 86400 // self.step_seconds + 1
+        wanted = {series_key(labels): labels for labels in series} if series is not None else None
+
+        with self._lock:
+            cached = self._groups.get(group_key, {})
+
+        buffers = {
+            key: buffer for key, buffer in cached.items()
+            if buffer and buffer.capacity >= capacity and buffer.last_timestamp >= cutoff
+            and (wanted is None or key in wanted)
+        }
+
+        if buffers:
+            last_timestamp = min(buffer.last_timestamp for buffer in buffers.values())
+            delta_start = datetime.fromtimestamp(last_timestamp + self.step_seconds)
+            if delta_start <= end_time:
+                delta = prom_client.get_series_range(
+                    metric_name=metric_name,
+                    start_time=delta_start,
+                    end_time=end_time,
+                    group_by=group_by,
+                    aggregation=aggregation,
+                    step=self.step,
+                    series=[wanted[key] for key in buffers] if wanted is not None else None,
+                    limit=limit if wanted is None else None
+                )
+                for key, points in (delta or {}).items():
+                    buffer = buffers.get(key)
+                    if buffer is None:
+                        if wanted is not None:
+                            continue
+                        # New series in unrestricted mode start from their delta
+                        buffer = buffers[key] = TimeSeriesBuffer(
+                            capacity, value_dtype=self.value_dtype, labels=points.labels
+                        )
+                    new = points.timestamps > (buffer.last_timestamp or float('-inf'))
+                    buffer.extend(points.timestamps[new], points.values[new])
+
+        missing = None
+        if wanted is not None:
+            missing = [labels for key, labels in wanted.items() if key not in buffers]
+        if not buffers or missing:
+            full = prom_client.get_series_history(
+                metric_name=metric_name,
+                group_by=group_by,
+                days=days,
+                aggregation=aggregation,
+                series=missing,
+                limit=limit if wanted is None else None
+            )
+            for key, points in (full or {}).items():
+                if wanted is not None and key not in wanted:
+                    continue
+                buffers[key] = TimeSeriesBuffer.from_arrays(
+                    points.timestamps,
+                    points.values,
+                    capacity=capacity,
+                    value_dtype=self.value_dtype,
+                    labels=points.labels
+                )
+            if full:
+                logger.info(f"Cached full history for {len(full)} series of {metric_name}")
+
+        if not buffers:
+            return None
+
+        # Trim points that have fallen out of the window
+        for buffer in buffers.values():
+            buffer.drop_before(cutoff)
+
+        with self._lock:
+            self._groups[group_key] = buffers
+
+        return buffers
+
+    def export(self) -> Tuple[Dict[str, TimeSeriesBuffer], Dict[Tuple, Dict[str, TimeSeriesBuffer]]]:
+        """
+        Snapshot of the cached windows
+
+        Returns:
+            Tuple of (buffer per '<aggregation>(<metric>)' key, series buffers
+            per (aggregation, metric, group_by) key)
+        """
+        with self._lock:
+            return dict(self._series), {key: dict(group) for key, group in self._groups.items()}
+
+    def load(
+        self,
+        series: Dict[str, TimeSeriesBuffer],
+        groups: Dict[Tuple, Dict[str, TimeSeriesBuffer]]
+    ):
+        """
+        Add windows, e.g. restored from a checkpoint
+
+        The next get_history call for a restored window only fetches the
+        points after its newest timestamp.
+
+        Args:
+            series: Buffer per '<aggregation>(<metric>)' key
+            groups: Series buffers per (aggregation, metric, group_by) key
+        """
+        with self._lock:
+            self._series.update(series)
+            self._groups.update(groups)
+
+    def invalidate(self, metric_name: Optional[str] = None):
+        """
+        Drop cached history so the next call refetches the full window
+
+        Args:
+            metric_name: Metric to drop, or None to clear everything
+        """
+        with self._lock:
+            if metric_name is None:
+                self._series.clear()
+                self._groups.clear()
+                return
+            for key in [k for k in self._series if k.endswith(f'({metric_name})')]:
+                del self._series[key]
+            for key in [k for k in self._groups if k[1] == metric_name]:
+                del self._groups[key]
@@ -0,0 +1,62 @@
+import logging
+from typing import Dict, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+
+class PooledSession(requests.Session):
+    """requests Session with keep-alive connection pools, retries and default timeouts"""
+
+    def __init__(
+        self,
+        pool_maxsize: int = 10,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 30.0,
+        pool_sizes: Optional[Dict[str, int]] = None
+    ):
+        """
+        Initialize pooled session
+
+        Args:
+            pool_maxsize: Connections kept alive per host by default
+            max_retries: Retries for connection errors and 429/5xx on idempotent requests
+            backoff_factor: Exponential backoff factor between retries in seconds
+            connect_timeout: Default connect timeout in seconds
+            read_timeout: Default read timeout in seconds
+            pool_sizes: Pool size per URL prefix, e.g. {'http://prometheus:9090': 20}
+        """
+        super().__init__()
+        self.timeout: Tuple[float, float] = (connect_timeout, read_timeout)
+        self.retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            raise_on_status=False
+        )
+
+        self.mount('http://', self._adapter(pool_maxsize))
+        self.mount('https://', self._adapter(pool_maxsize))
+        for prefix, size in (pool_sizes or {}).items():
+            self.mount(prefix, self._adapter(size))
+
+        logger.info(
+            f"Initialized PooledSession with pool_maxsize={pool_maxsize}, "
+            f"retries={max_retries}, timeout={self.timeout}"
+        )
+
+    def _adapter(self, pool_maxsize: int) -> HTTPAdapter:
+        return HTTPAdapter(
+            pool_connections=pool_maxsize,
+            pool_maxsize=pool_maxsize,
+            max_retries=self.retry
+        )
+
+    def request(self, method, url, **kwargs):
+        """Send a request, applying the default timeout when none is given"""
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
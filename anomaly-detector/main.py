@@ -1,6 +1,9 @@
 import logging
+import os
+import signal
 import sys
 import time
+from concurrent.futures import as_completed
 from datetime import datetime
 from config import Config
 
@@ -15,14 +18,166 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
-def run_detection_cycle(prom_client, detector, alert_manager):
+def analyze_metric(prom_client, detector, metric, series=None, current_values=None):
     """
-    Run a single detection cycle for all monitored metrics
+    Run anomaly detection for a single metric
+    
+    Args:
+        prom_client: PrometheusQueryClient instance
+        detector: AnomalyDetector instance
+        metric: Name of the metric to analyze
+        series: Label sets to analyze separately when SERIES_GROUP_BY is set
+        current_values: Current values fetched for the whole cycle, if any
+        
+    Returns:
+        List of detection results, empty if the metric could not be analyzed
+    """
+    logger.info(f"Analyzing metric: {metric}")
+    
+    # In multi-resolution mode the full-resolution window only feeds residuals
+    days = Config.MULTI_RESOLUTION_FINE_DAYS if Config.MULTI_RESOLUTION_STEP else Config.HISTORICAL_DAYS
+    
+    if Config.SERIES_GROUP_BY:
+        results = detector.detect_series_anomalies(
+            prom_client=prom_client,
+            metric_name=metric,
+            group_by=Config.SERIES_GROUP_BY,
+            days=days,
+            series=series,
+            max_series=Config.MAX_SERIES_PER_METRIC,
+            current_values=current_values
+        )
+    else:
+        result = detector.detect_anomaly(
+            prom_client=prom_client,
+            metric_name=metric,
+            days=days,
+            current_values=current_values
+        )
+        results = [result] if result is not None else []
+    
+    anomalous = [r for r in results if r.get('is_anomaly', False)]
+    if not results:
+        logger.warning(f"Could not analyze {metric}, skipping")
+    elif anomalous:
+        logger.warning(f"Anomaly detected in {metric} ({len(anomalous)} of {len(results)} series)")
+    else:
+        logger.info(f"No anomaly detected in {metric}")
+    
+    return results
+
+def select_series(prom_client, shard=None):
+    """
+    Select the label sets to analyze this cycle
+    
+    Args:
+        prom_client: PrometheusQueryClient instance
+        shard: Optional Shard restricting the selection to this replica
+        
+    Returns:
+        Top label sets by traffic, or None to analyze every returned series
+    """
+    if not Config.SERIES_GROUP_BY:
+        return None
+    
+    # Each replica keeps its own top-K, so rank enough series for all shards
+    limit = Config.MAX_SERIES_PER_METRIC * (shard.count if shard is not None else 1)
+    series = prom_client.get_top_series(
+        group_by=Config.SERIES_GROUP_BY,
+        limit=limit,
+        traffic_metric=Config.SERIES_TRAFFIC_METRIC
+    )
+    if shard is not None and series is not None:
+        total = len(series)
+        series = shard.filter_series(series)[:Config.MAX_SERIES_PER_METRIC]
+        logger.info(f"Shard {shard.index} of {shard.count} owns {len(series)} of the top {total} series")
+    return series
+
+def fetch_current_values(prom_client, metrics=None):
+    """
+    Fetch the current value of every monitored metric in one instant query
+    
+    Args:
+        prom_client: PrometheusQueryClient instance
+        metrics: Metrics to fetch, defaults to all monitored metrics
+        
+    Returns:
+        Values keyed by (metric, series key), or None when not batching
+    """
+    if Config.CURRENT_VALUE_SOURCE != 'batch':
+        return None
+    
+    return prom_client.get_current_values(
+        metrics or Config.METRICS_TO_MONITOR,
+        aggregation='avg',
+        group_by=Config.SERIES_GROUP_BY
+    )
+
+def run_fast_check(prom_client, detector, alert_manager):
+    """
+    Score current values against the forecast tables of the last cycle
+    
+    Args:
+        prom_client: PrometheusQueryClient instance
+        detector: AnomalyDetector instance
+        alert_manager: AlertManager instance
+        
+    Returns:
+        Number of anomalies found
+    """
+    current_values = prom_client.get_current_values(
+        Config.METRICS_TO_MONITOR,
+        aggregation='avg',
+        group_by=Config.SERIES_GROUP_BY
+    )
+    if not current_values:
+        return 0
+    
+    anomalies = [r for r in detector.fast_check(current_values) if r['is_anomaly']]
+    for result in anomalies:
+        alert_manager.generate_and_send_alert(result)
+    
+    if anomalies:
+        logger.warning(f"Fast check found {len(anomalies)} anomalies")
+    return len(anomalies)
+
+def wait_for_next_cycle(prom_client, detector, alert_manager, interval_seconds):
+    """
+    Sleep until the next detection cycle, running fast checks in between
+    
+    Args:
+        prom_client: PrometheusQueryClient instance
+        detector: AnomalyDetector instance
+        alert_manager: AlertManager instance
+        interval_seconds: Time until the next full cycle
+    """
+    if Config.FAST_CHECK_INTERVAL_SECONDS <= 0:
+        time.sleep(interval_seconds)
+        return
+    
+    deadline = time.monotonic() + interval_seconds
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        time.sleep(min(Config.FAST_CHECK_INTERVAL_SECONDS, remaining))
+        if deadline - time.monotonic() > 0:
+            try:
+                run_fast_check(prom_client, detector, alert_manager)
+            except Exception as e:
+                logger.error(f"Error in fast check: {e}", exc_info=True)
+
+def run_detection_cycle(prom_client, detector, alert_manager, executors=None, metrics=None, budget_seconds=None):
+    """
+    Run a single detection cycle for the given metrics
     
     Args:
         prom_client: PrometheusQueryClient instance
         detector: AnomalyDetector instance
         alert_manager: AlertManager instance
+        executors: Optional StageExecutors to analyze metrics concurrently
+        metrics: Metrics due this cycle in priority order, defaults to all monitored metrics
+        budget_seconds: Cycle time budget, defaults to CYCLE_TIME_BUDGET_SECONDS
     """
     logger.info("=" * 60)
     logger.info(f"Starting detection cycle at {datetime.now().isoformat()}")
@@ -30,46 +185,89 @@ def run_detection_cycle(prom_client, detector, alert_manager):
     
     anomalies_detected = 0
     alerts_sent = 0
+    metrics = metrics or Config.METRICS_TO_MONITOR
+    detector.start_cycle(budget_seconds or Config.CYCLE_TIME_BUDGET_SECONDS)
+    series = select_series(prom_client, detector.shard)
+    if series == []:
+        # An empty selection would match every series, not none
+        logger.info("No selected series belong to this replica")
+        metrics = []
+    current_values = fetch_current_values(prom_client, metrics)
     
-    for metric in Config.METRICS_TO_MONITOR:
-        try:
-            logger.info(f"Analyzing metric: {metric}")
-            
-            # Detect anomalies
-            result = detector.detect_anomaly(
-                prom_client=prom_client,
-                metric_name=metric,
-                days=Config.HISTORICAL_DAYS
-            )
-            
-            if result is None:
-                logger.warning(f"Could not analyze {metric}, skipping")
+    if executors is None:
+        for metric in metrics:
+            try:
+                results = analyze_metric(prom_client, detector, metric, series, current_values)
+                
+                # Generate and send alerts, and resolve those that recovered
+                for result in results:
+                    if result.get('is_anomaly', False):
+                        anomalies_detected += 1
+                        if alert_manager.generate_and_send_alert(result):
+                            alerts_sent += 1
+                    elif alert_manager.resolve_alert(result):
+                        alerts_sent += 1
+                    
+            except Exception as e:
+                logger.error(f"Error analyzing {metric}: {e}", exc_info=True)
+                continue
+    else:
+        futures = {
+            executors.io.submit(
+                analyze_metric, prom_client, detector, metric, series, current_values
+            ): metric
+            for metric in metrics
+        }
+        
+        # Hand alerts to their own pool as soon as each metric finishes
+        alert_futures = []
+        for future in as_completed(futures):
+            metric = futures[future]
+            try:
+                results = future.result()
+            except Exception as e:
+                logger.error(f"Error analyzing {metric}: {e}", exc_info=True)
                 continue
             
-            # Check if anomaly was detected
-            if result.get('is_anomaly', False):
-                anomalies_detected += 1
-                logger.warning(f"Anomaly detected in {metric}")
-                
-                # Generate and send alert
-                success = alert_manager.generate_and_send_alert(result)
-                if success:
+            for result in results:
+                if result.get('is_anomaly', False):
+                    anomalies_detected += 1
+                    alert_futures.append(
+                        executors.alerts.submit(alert_manager.generate_and_send_alert, result)
+                    )
+                else:
+                    alert_futures.append(executors.alerts.submit(alert_manager.resolve_alert, result))
+        
+        for future in alert_futures:
+            try:
+                if future.result():
                     alerts_sent += 1
-            else:
-                logger.info(f"No anomaly detected in {metric}")
-                
-        except Exception as e:
-            logger.error(f"Error analyzing {metric}: {e}", exc_info=True)
-            continue
+            except Exception as e:
+                logger.error(f"Error sending alert: {e}", exc_info=True)
     
     logger.info("=" * 60)
     logger.info(
         f"Detection cycle completed: "
         f"{anomalies_detected} anomalies detected, "
-        f"{alerts_sent} alerts sent"
+        f"{alerts_sent} alerts dispatched"
     )
+    if Config.SCREEN_THRESHOLD is not None:
+        counts = detector.tier_counts
+        modelled = ', '.join(
+            f"{counts[engine]} {engine}" for engine in ('holt_winters', 'multi_resolution', 'fourier')
+            if counts[engine]
+        )
+        logger.info(
+            f"Detection tiers since start: {counts['screened']} screened out, "
+            f"{modelled or '0 modelled'}, {counts['fallback']} fallback"
+        )
+    detector.finish_cycle()
     logger.info("=" * 60)
 
+def _raise_keyboard_interrupt(signum, frame):
+    """Signal handler turning SIGTERM into the KeyboardInterrupt shutdown path"""
+    raise KeyboardInterrupt
+
 def main():
     """Main entry point for the anomaly detector service"""
     logger.info("=" * 60)
@@ -79,13 +277,46 @@ def main():
     logger.info(f"Check interval: {Config.CHECK_INTERVAL_MINUTES} minutes")
     logger.info(f"Historical data window: {Config.HISTORICAL_DAYS} days")
     logger.info(f"Anomaly threshold: {Config.ANOMALY_THRESHOLD} standard deviations")
+    logger.info(f"History cache: {'enabled' if Config.HISTORY_CACHE_ENABLED else 'disabled'}")
+    logger.info(f"Detection mode: {Config.DETECTION_MODE}")
+    logger.info(f"Model engine: {Config.MODEL_ENGINE}")
     logger.info(f"Metrics to monitor: {', '.join(Config.METRICS_TO_MONITOR)}")
+    if Config.SERIES_GROUP_BY:
+        logger.info(
+            f"Per-series detection by {', '.join(Config.SERIES_GROUP_BY)} "
+            f"(top {Config.MAX_SERIES_PER_METRIC} by {Config.SERIES_TRAFFIC_METRIC})"
+        )
     logger.info("=" * 60)
     
     # Import here to avoid circular dependencies
     from prometheus_client import PrometheusQueryClient
     from anomaly_detector import AnomalyDetector
     from alert_manager import AlertManager
+    from history_cache import MetricHistoryCache
+    from executors import StageExecutors
+    from model_registry import ModelRegistry
+    from http_session import PooledSession
+    from checkpoint_store import CheckpointStore
+    from multi_resolution import MultiResolutionStore
+    from fourier_regression import FourierRegression
+    from alert_dispatcher import AlertDispatcher
+    from alert_state import AlertStateStore
+    from alert_outbox import AlertOutbox
+    from scheduler import Scheduler, parse_schedule
+    from sharding import Shard
+    
+    # Shared keep-alive connection pools for Prometheus and webhooks
+    session = PooledSession(
+        pool_maxsize=Config.HTTP_POOL_MAXSIZE,
+        max_retries=Config.HTTP_MAX_RETRIES,
+        backoff_factor=Config.HTTP_BACKOFF_FACTOR,
+        connect_timeout=Config.HTTP_CONNECT_TIMEOUT,
+        read_timeout=Config.HTTP_READ_TIMEOUT,
+        pool_sizes={
+            Config.PROMETHEUS_URL: Config.PROMETHEUS_POOL_SIZE,
+            Config.ALERT_WEBHOOK_URL: Config.ALERT_POOL_SIZE
+        }
+    )
     
     # Initialize components with retry logic
     max_retries = 5
@@ -96,7 +327,13 @@ def main():
             logger.info(f"Initialization attempt {attempt}/{max_retries}")
             
             # Initialize Prometheus client
-            prom_client = PrometheusQueryClient(Config.PROMETHEUS_URL)
+            prom_client = PrometheusQueryClient(
+                Config.PROMETHEUS_URL,
+                session=session,
+                chunk_points=Config.QUERY_CHUNK_POINTS,
+                chunk_workers=Config.QUERY_CHUNK_WORKERS,
+                decoder=Config.QUERY_RESPONSE_DECODER
+            )
             
             # Perform health check
             if not prom_client.health_check():
@@ -115,29 +352,159 @@ def main():
                 logger.error("Max retries reached. Exiting.")
                 sys.exit(1)
     
+    # Initialize worker pools for concurrent mode
+    executors = None
+    if Config.DETECTION_MODE == 'concurrent':
+        executors = StageExecutors(
+            io_workers=Config.IO_WORKERS,
+            fit_workers=Config.FIT_WORKERS,
+            alert_workers=Config.ALERT_WORKERS
+        )
+    
+    # Split the series across replicas when running more than one
+    shard = None
+    if Config.SHARD_COUNT > 1:
+        shard = Shard.from_env(Config.SHARD_INDEX, Config.SHARD_COUNT, Config.HOSTNAME)
+    
     # Initialize anomaly detector
     detector = AnomalyDetector(
         threshold=Config.ANOMALY_THRESHOLD,
-        min_data_points=100
+        min_data_points=100,
+        history_cache=(
+            MetricHistoryCache(value_dtype=Config.HISTORY_VALUE_DTYPE)
+            if Config.HISTORY_CACHE_ENABLED else None
+        ),
+        fit_executor=executors.fit if executors else None,
+        model_registry=(
+            ModelRegistry(
+                refit_interval_seconds=Config.MODEL_REFIT_INTERVAL_MINUTES * 60,
+                drift_threshold=Config.MODEL_DRIFT_THRESHOLD,
+                change_point_threshold=Config.MODEL_CHANGE_POINT_THRESHOLD
+            )
+            if Config.MODEL_REGISTRY_ENABLED else None
+        ),
+        batch_min_series=Config.BATCH_FIT_MIN_SERIES,
+        # Range points lag real time by up to one 5m step
+        current_value_max_age=600 if Config.CURRENT_VALUE_SOURCE == 'history' else None,
+        forecast_horizon=Config.FORECAST_HORIZON_STEPS,
+        backfill=Config.BACKFILL_SCORING,
+        screen_threshold=Config.SCREEN_THRESHOLD,
+        screen_window=Config.SCREEN_WINDOW,
+        # Screen the 5m points that arrived since the previous cycle
+        screen_recent_points=max(1, Config.CHECK_INTERVAL_MINUTES // 5),
+        fit_max_iterations=Config.FIT_MAX_ITERATIONS,
+        fit_timeout=Config.FIT_TIMEOUT_SECONDS,
+        multi_resolution=(
+            MultiResolutionStore(
+                step=Config.MULTI_RESOLUTION_STEP,
+                seasonal_periods=Config.MULTI_RESOLUTION_SEASONAL_PERIODS,
+                days=Config.HISTORICAL_DAYS
+            )
+            if Config.MULTI_RESOLUTION_STEP else None
+        ),
+        fourier=(
+            FourierRegression(seasons=[
+                (hours * 3600, harmonics)
+                for hours, harmonics in zip(Config.FOURIER_PERIODS_HOURS, Config.FOURIER_HARMONICS)
+            ])
+            if Config.MODEL_ENGINE == 'fourier' else None
+        ),
+        shard=shard
     )
     
-    # Initialize alert manager
-    alert_manager = AlertManager(webhook_url=Config.ALERT_WEBHOOK_URL)
+    # Warm start from the last checkpoint so only the gap since then is fetched
+    checkpoint_store = None
+    if Config.CHECKPOINT_DIR:
+        checkpoint_dir = Config.CHECKPOINT_DIR
+        if shard is not None:
+            checkpoint_dir = os.path.join(checkpoint_dir, f'shard-{shard.index}')
+        checkpoint_store = CheckpointStore(checkpoint_dir)
+        checkpoint_store.load(
+            detector.history_cache, detector.model_registry,
+            owns=shard.owns if shard is not None else None
+        )
+    
+    # Initialize alert manager, queued so webhook latency never stalls detection
+    alert_state = None
+    if Config.ALERT_DEDUP_ENABLED:
+        alert_state = AlertStateStore(
+            repeat_interval_seconds=Config.ALERT_REPEAT_INTERVAL_MINUTES * 60,
+            resolve_after=Config.ALERT_RESOLVE_AFTER_CYCLES,
+            ttl_seconds=Config.ALERT_STATE_TTL_HOURS * 3600,
+            max_entries=Config.ALERT_STATE_MAX_ENTRIES
+        )
+    alert_manager = AlertManager(
+        webhook_url=Config.ALERT_WEBHOOK_URL,
+        session=session,
+        state_store=alert_state
+    )
+    dispatcher = None
+    if Config.ALERT_OUTBOX_DIR:
+        # Written to disk first, so receiver outages and restarts lose nothing
+        dispatcher = AlertOutbox(
+            alert_manager,
+            Config.ALERT_OUTBOX_DIR,
+            workers=Config.ALERT_SENDER_THREADS,
+            per_destination=Config.ALERT_DESTINATION_CONCURRENCY,
+            max_backoff_seconds=Config.ALERT_RETRY_MAX_BACKOFF_SECONDS,
+            max_age_seconds=Config.ALERT_MAX_AGE_HOURS * 3600
+        )
+        alert_manager = dispatcher
+    elif Config.ALERT_QUEUE_SIZE > 0:
+        dispatcher = AlertDispatcher(
+            alert_manager,
+            max_queue=Config.ALERT_QUEUE_SIZE,
+            workers=Config.ALERT_SENDER_THREADS,
+            batch_size=Config.ALERT_BATCH_SIZE,
+            linger_seconds=Config.ALERT_LINGER_SECONDS
+        )
+        alert_manager = dispatcher
     
     logger.info("All components initialized successfully")
     logger.info("Starting detection loop...")
     
-    # Main detection loop
+    # Plan each metric on its own fixed timeline so cycle time never shifts later runs
     check_interval_seconds = Config.CHECK_INTERVAL_MINUTES * 60
+    scheduler = Scheduler(jitter_seconds=Config.SCHEDULE_JITTER_SECONDS)
+    schedule = parse_schedule(Config.METRIC_SCHEDULE)
+    scheduled_metrics = Config.METRICS_TO_MONITOR
+    if shard is not None and not Config.SERIES_GROUP_BY:
+        # Aggregated metrics are one series each, so whole metrics are sharded
+        scheduled_metrics = shard.filter_metrics(scheduled_metrics)
+        logger.info(f"Shard {shard.index} of {shard.count} owns metrics: {', '.join(scheduled_metrics) or 'none'}")
+    for metric in scheduled_metrics:
+        interval, priority = schedule.get(metric, (check_interval_seconds, 0))
+        scheduler.add(metric, interval, priority)
+    
+    # Kubernetes stops pods with SIGTERM; shut down the same way as on Ctrl+C
+    signal.signal(signal.SIGTERM, _raise_keyboard_interrupt)
     
+    # Main detection loop
     while True:
         try:
-            # Run detection cycle
-            run_detection_cycle(prom_client, detector, alert_manager)
+            # Run detection cycle for the metrics that are due, highest priority first
+            jobs = scheduler.due()
+            if jobs:
+                run_detection_cycle(
+                    prom_client, detector, alert_manager, executors,
+                    metrics=[job.name for job in jobs],
+                    budget_seconds=min(
+                        Config.CYCLE_TIME_BUDGET_SECONDS,
+                        0.8 * min(job.interval_seconds for job in jobs)
+                    )
+                )
+                scheduler.log_stats()
+                if dispatcher is not None:
+                    dispatcher.log_stats()
+                if alert_state is not None:
+                    alert_state.log_stats()
+                if checkpoint_store is not None:
+                    checkpoint_store.save(detector.history_cache, detector.model_registry)
             
-            # Wait for next cycle
-            logger.info(f"Waiting {Config.CHECK_INTERVAL_MINUTES} minutes until next check...")
-            time.sleep(check_interval_seconds)
+            # Wait for the next planned run
+            wait_seconds = scheduler.seconds_until_next() if scheduler.jobs else check_interval_seconds
+            logger.info(f"Waiting {wait_seconds:.0f} seconds until next check...")
+            wait_for_next_cycle(prom_client, detector, alert_manager, wait_seconds)
             
         except KeyboardInterrupt:
             logger.info("Received shutdown signal, exiting gracefully...")
@@ -151,10 +518,18 @@ def main():
             try:
                 if not prom_client.health_check():
                     logger.error("Lost connection to Prometheus, attempting to reconnect...")
-                    prom_client = PrometheusQueryClient(Config.PROMETHEUS_URL)
+                    prom_client.reset_connections()
             except Exception as reconnect_error:
                 logger.error(f"Reconnection failed: {reconnect_error}")
     
+    # Keep what was fetched and fitted since the last cycle for the next start
+    if checkpoint_store is not None:
+        checkpoint_store.save(detector.history_cache, detector.model_registry)
+    if executors is not None:
+        executors.shutdown()
+    if dispatcher is not None:
+        dispatcher.close()
+    
     logger.info("Anomaly Detector Service stopped")
 
 if __name__ == "__main__":
@@ -0,0 +1,211 @@
+import json
+import logging
+import re
+import warnings
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_RESULT_TYPE = re.compile(rb'"resultType"\s*:\s*"(\w+)"')
+_RESULT_START = re.compile(rb'"result"\s*:\s*\[')
+_NEXT_SERIES = re.compile(rb'\s*,?\s*([{\]])')
+_KEY = re.compile(rb'\s*,?\s*"(\w+)"\s*:\s*')
+_EMPTY_ARRAY = re.compile(rb'\[\s*\]')
+_VALUES_END = re.compile(rb'\]\s*\]')
+_SERIES_END = re.compile(rb'\s*\}')
+_SCALAR = re.compile(rb'[^,}\]\s]+(?=[,}\]\s])')
+_STRUCTURE = re.compile(rb'["\\{}\[\]]')
+
+# Characters removed to turn '[1700000000,"1.5"],[...' into '1700000000,1.5,...'
+_PAIR_SYNTAX = b'[]" \t\r\n'
+
+
+def decode_points(text: bytes) -> Optional[np.ndarray]:
+    """
+    Decode the inside of a matrix 'values' array into a float array
+
+    Args:
+        text: Bytes such as b'[1700000000,"1.5"],[1700000060,"2"]'
+
+    Returns:
+        Array of shape (n, 2) with timestamps and values, None if a point is invalid
+    """
+    count = text.count(b'[')
+    if not count:
+        return np.empty((0, 2))
+    flat = text.translate(None, _PAIR_SYNTAX).decode('ascii')
+    try:
+        with warnings.catch_warnings():
+            # Unparseable input is only a DeprecationWarning in NumPy
+            warnings.simplefilter('error', DeprecationWarning)
+            points = np.fromstring(flat, dtype=np.float64, sep=',')
+    except (ValueError, DeprecationWarning):
+        return None
+    if len(points) != 2 * count:
+        return None
+    return points.reshape(count, 2)
+
+
+def value_end(buffer: bytes, pos: int) -> Optional[int]:
+    """
+    Find the end of the JSON value starting at pos
+
+    Args:
+        buffer: Bytes holding the value
+        pos: Offset of the value's first character
+
+    Returns:
+        Offset just past the value, None if it is not complete yet
+    """
+    if pos >= len(buffer):
+        return None
+    if buffer[pos] not in b'{["':
+        match = _SCALAR.match(buffer, pos)
+        return match.end() if match else None
+    depth = 0
+    in_string = False
+    escaped = False
+    for match in _STRUCTURE.finditer(buffer, pos):
+        char = match.group()
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == b'\\':
+                # Only matters when it escapes a quote or another backslash
+                escaped = match.end() == len(buffer) or _STRUCTURE.match(buffer, match.end()) is not None
+            elif char == b'"':
+                in_string = False
+                if depth == 0:
+                    return match.end()
+        elif char == b'"':
+            in_string = True
+        elif char in (b'{', b'['):
+            depth += 1
+        elif char in (b'}', b']'):
+            depth -= 1
+            if depth == 0:
+                return match.end()
+    return None
+
+
+class MatrixDecoder:
+    """Incremental decoder for Prometheus query_range responses"""
+
+    def __init__(self):
+        """
+        Initialize decoder
+
+        Response bytes are fed as they arrive; each series is decoded into a
+        NumPy array as soon as it is complete and its text is discarded, so
+        no per-point Python objects are created and at most one series is
+        held as text. Keys other than 'metric' and 'values' (such as the
+        'histograms' of native-histogram series) are skipped.
+        """
+        self._buffer = bytearray()
+        self._in_result = False
+        self._done = False
+        self.series: List[Dict] = []
+        self.invalid = 0
+
+    def feed(self, chunk: bytes):
+        """
+        Consume the next part of the response body
+
+        Args:
+            chunk: Raw response bytes
+        """
+        if self._done:
+            return
+        self._buffer += chunk
+        if not self._in_result and not self._start():
+            return
+        self._parse()
+
+    def close(self) -> List[Dict]:
+        """
+        Finish decoding
+
+        Returns:
+            List of {'metric': labels, 'values': (n, 2) array} per series
+
+        Raises:
+            ValueError: If the response is not a complete matrix result
+        """
+        if not self._done:
+            raise ValueError("Truncated or malformed matrix response")
+        if self.invalid:
+            logger.warning(f"Skipped {self.invalid} series with invalid values")
+        return self.series
+
+    def _start(self) -> bool:
+        """Skip the response header up to the start of the result array"""
+        match = _RESULT_START.search(self._buffer)
+        if match is None:
+            return False
+        result_type = _RESULT_TYPE.search(self._buffer, 0, match.start())
+        if result_type is not None and result_type.group(1) != b'matrix':
+            raise ValueError(f"Expected matrix result, got {result_type.group(1).decode()}")
+        del self._buffer[:match.end()]
+        self._in_result = True
+        return True
+
+    def _parse(self):
+        """Decode every complete series at the front of the buffer"""
+        buffer = self._buffer
+        pos = 0
+        while True:
+            start = _NEXT_SERIES.match(buffer, pos)
+            if start is None:
+                break
+            if start.group(1) == b']':
+                self._done = True
+                pos = start.end()
+                break
+
+            series = self._parse_series(buffer, start.end())
+            if series is None:
+                break
+            pos, metric, points = series
+            if points is None:
+                self.invalid += 1
+            else:
+                self.series.append({'metric': metric, 'values': points})
+        del buffer[:pos]
+
+    def _parse_series(self, buffer: bytearray, pos: int) -> Optional[Tuple]:
+        """
+        Decode one series object whose opening brace ends at pos
+
+        Returns:
+            Tuple of (offset past the closing brace, labels, points), None if
+            the object is not complete yet; points is None if a value is invalid
+        """
+        metric: Dict = {}
+        points = np.empty((0, 2))
+        while True:
+            series_end = _SERIES_END.match(buffer, pos)
+            if series_end is not None:
+                return series_end.end(), metric, points
+            key = _KEY.match(buffer, pos)
+            if key is None:
+                return None
+            pos = key.end()
+            if key.group(1) == b'values' and buffer.startswith(b'[', pos):
+                # Fast path: the points are never turned into Python objects
+                empty = _EMPTY_ARRAY.match(buffer, pos)
+                if empty is not None:
+                    pos = empty.end()
+                    continue
+                match = _VALUES_END.search(buffer, pos)
+                if match is None:
+                    return None
+                points = decode_points(bytes(buffer[pos + 1:match.start() + 1]))
+                pos = match.end()
+                continue
+            end = value_end(buffer, pos)
+            if end is None:
+                return None
+            if key.group(1) == b'metric':
+                metric = json.loads(bytes(buffer[pos:end]))
+            pos = end
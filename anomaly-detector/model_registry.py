@@ -0,0 +1,388 @@
+import logging
+import threading
+import time
+from collections import Counter
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# CUSUM allowance in residual standard deviations: shifts above it accumulate
+CHANGE_POINT_SLACK = 0.5
+# Standardized residuals are clipped here so one spike cannot fire the detector
+CHANGE_POINT_CLIP = 3.0
+
+
+class HoltWintersState:
+    """Fitted additive Holt-Winters parameters plus the latest level, trend and seasonal state"""
+
+    def __init__(
+        self,
+        alpha: float,
+        beta: float,
+        gamma: float,
+        level: float,
+        trend: float,
+        season: np.ndarray,
+        residual_std: float,
+        last_timestamp: float,
+        step_seconds: float,
+        fitted_at: Optional[float] = None
+    ):
+        """
+        Initialize model state
+
+        Args:
+            alpha: Level smoothing parameter
+            beta: Trend smoothing parameter
+            gamma: Seasonal smoothing parameter
+            level: Level after the last observed point
+            trend: Trend after the last observed point
+            season: Seasonal components, season[0] applies to the next point
+            residual_std: Standard deviation of in-sample residuals at fit time
+            last_timestamp: Timestamp of the last observed point
+            step_seconds: Spacing between points in seconds
+            fitted_at: Wall-clock time of the full fit, defaults to now
+        """
+        self.alpha = float(alpha)
+        self.beta = float(beta)
+        self.gamma = float(gamma)
+        self.level = float(level)
+        self.trend = float(trend)
+        self.season = np.array(season, dtype=np.float64)
+        self.residual_std = float(residual_std)
+        self.last_timestamp = float(last_timestamp)
+        self.step_seconds = float(step_seconds)
+        self.fitted_at = fitted_at if fitted_at is not None else time.time()
+        self.updates = 0
+        # EWMA of squared standardized one-step residuals, 1.0 while the fit holds
+        self.drift_score = 1.0
+        # Two-sided CUSUM of standardized residuals, grows after a level shift
+        self.cusum_high = 0.0
+        self.cusum_low = 0.0
+        self._pos = 0
+
+    @classmethod
+    def from_fitted(cls, fitted_model, timestamps: np.ndarray) -> 'HoltWintersState':
+        """
+        Extract state from a fitted statsmodels HoltWintersResults
+
+        Args:
+            fitted_model: Result of ExponentialSmoothing(...).fit()
+            timestamps: Timestamps of the points the model was fitted on
+
+        Returns:
+            HoltWintersState positioned after the last fitted point
+        """
+        return cls.from_compact(cls.compact(fitted_model), timestamps)
+
+    @staticmethod
+    def compact(fitted_model) -> Tuple:
+        """
+        Reduce a fitted statsmodels model to the numbers a state needs
+
+        Cheap to pickle, so worker processes return this instead of the
+        full results object.
+
+        Args:
+            fitted_model: Result of ExponentialSmoothing(...).fit()
+
+        Returns:
+            Tuple of (alpha, beta, gamma, level, trend, season, residual_std)
+        """
+        params = fitted_model.params
+        seasonal_periods = fitted_model.model.seasonal_periods
+        return (
+            float(params['smoothing_level']),
+            float(params['smoothing_trend']),
+            float(params['smoothing_seasonal']),
+            float(fitted_model.level[-1]),
+            float(fitted_model.trend[-1]),
+            np.array(fitted_model.season[-seasonal_periods:], dtype=np.float64),
+            float(np.std(fitted_model.resid))
+        )
+
+    @classmethod
+    def from_compact(cls, compact: Tuple, timestamps: np.ndarray) -> 'HoltWintersState':
+        """
+        Build a state from the output of compact
+
+        Args:
+            compact: Tuple from HoltWintersState.compact
+            timestamps: Timestamps of the points the model was fitted on
+
+        Returns:
+            HoltWintersState positioned after the last fitted point
+        """
+        alpha, beta, gamma, level, trend, season, residual_std = compact
+        step_seconds = float(np.median(np.diff(timestamps))) if len(timestamps) > 1 else 1.0
+        return cls(
+            alpha=alpha,
+            beta=beta,
+            gamma=gamma,
+            level=level,
+            trend=trend,
+            season=season,
+            residual_std=residual_std,
+            last_timestamp=timestamps[-1],
+            step_seconds=step_seconds
+        )
+
+    def to_checkpoint(self) -> Tuple[Dict[str, float], np.ndarray]:
+        """
+        Split the state into scalar fields and the seasonal array
+
+        Returns:
+            Tuple of (JSON-serialisable fields, season with the next point first)
+        """
+        fields = {
+            'alpha': self.alpha,
+            'beta': self.beta,
+            'gamma': self.gamma,
+            'level': self.level,
+            'trend': self.trend,
+            'residual_std': self.residual_std,
+            'last_timestamp': self.last_timestamp,
+            'step_seconds': self.step_seconds,
+            'fitted_at': self.fitted_at,
+            'updates': self.updates,
+            'drift_score': self.drift_score,
+            'cusum_high': self.cusum_high,
+            'cusum_low': self.cusum_low
+        }
+        return fields, np.roll(self.season, -self._pos)
+
+    @classmethod
+    def from_checkpoint(cls, fields: Dict[str, float], season: np.ndarray) -> 'HoltWintersState':
+        """
+        Rebuild a state saved with to_checkpoint
+
+        Args:
+            fields: Scalar fields
+            season: Seasonal components with the next point first
+
+        Returns:
+            HoltWintersState continuing where the saved one stopped
+        """
+        state = cls(
+            alpha=fields['alpha'],
+            beta=fields['beta'],
+            gamma=fields['gamma'],
+            level=fields['level'],
+            trend=fields['trend'],
+            season=season,
+            residual_std=fields['residual_std'],
+            last_timestamp=fields['last_timestamp'],
+            step_seconds=fields['step_seconds'],
+            fitted_at=fields['fitted_at']
+        )
+        state.updates = int(fields.get('updates', 0))
+        state.drift_score = float(fields.get('drift_score', 1.0))
+        state.cusum_high = float(fields.get('cusum_high', 0.0))
+        state.cusum_low = float(fields.get('cusum_low', 0.0))
+        return state
+
+    @property
+    def seasonal_periods(self) -> int:
+        return len(self.season)
+
+    @property
+    def change_score(self) -> float:
+        """Larger of the upward and downward CUSUM statistics"""
+        return max(self.cusum_high, self.cusum_low)
+
+    def forecast(self, steps: int = 1) -> np.ndarray:
+        """
+        Forecast the next points from the current state
+
+        Args:
+            steps: Number of points to forecast
+
+        Returns:
+            Array of forecasts
+        """
+        horizon = np.arange(1, steps + 1)
+        seasonal = self.season[(self._pos + horizon - 1) % self.seasonal_periods]
+        return self.level + horizon * self.trend + seasonal
+
+    def update(self, value: float) -> float:
+        """
+        Advance the state by one observed point
+
+        Args:
+            value: Observed value
+
+        Returns:
+            One-step-ahead residual of the point before the update
+        """
+        prev_level, prev_trend = self.level, self.trend
+        prev_season = self.season[self._pos]
+        residual = value - (prev_level + prev_trend + prev_season)
+
+        self.level = self.alpha * (value - prev_season) + (1 - self.alpha) * (prev_level + prev_trend)
+        self.trend = self.beta * (self.level - prev_level) + (1 - self.beta) * prev_trend
+        self.season[self._pos] = (
+            self.gamma * (value - prev_level - prev_trend) + (1 - self.gamma) * prev_season
+        )
+        self._pos = (self._pos + 1) % self.seasonal_periods
+
+        if self.residual_std > 0:
+            z = residual / self.residual_std
+            self.drift_score = 0.9 * self.drift_score + 0.1 * z * z
+            z = min(max(z, -CHANGE_POINT_CLIP), CHANGE_POINT_CLIP)
+            self.cusum_high = max(0.0, self.cusum_high + z - CHANGE_POINT_SLACK)
+            self.cusum_low = max(0.0, self.cusum_low - z - CHANGE_POINT_SLACK)
+        self.updates += 1
+        return residual
+
+    def skip(self, steps: int):
+        """
+        Advance the state over missing points using the forecast
+
+        Args:
+            steps: Number of missing points
+        """
+        for _ in range(steps):
+            self.level += self.trend
+            self._pos = (self._pos + 1) % self.seasonal_periods
+
+    def update_many(self, timestamps: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """
+        Advance the state over every point newer than the last one seen
+
+        Args:
+            timestamps: Point timestamps, sorted
+            values: Point values
+
+        Returns:
+            One-step-ahead residuals of the new points
+        """
+        start = int(np.searchsorted(timestamps, self.last_timestamp, side='right'))
+        residuals = np.empty(len(timestamps) - start)
+        for i in range(start, len(timestamps)):
+            gap = int(round((timestamps[i] - self.last_timestamp) / self.step_seconds)) - 1
+            if gap > 0:
+                self.skip(gap)
+            residuals[i - start] = self.update(values[i])
+            self.last_timestamp = float(timestamps[i])
+        return residuals
+
+
+class ModelRegistry:
+    """Holt-Winters states keyed by metric and series, with refit scheduling"""
+
+    def __init__(
+        self,
+        refit_interval_seconds: float = 3600,
+        drift_threshold: float = 2.0,
+        change_point_threshold: Optional[float] = None
+    ):
+        """
+        Initialize model registry
+
+        Args:
+            refit_interval_seconds: Maximum model age before a full refit
+            drift_threshold: RMS standardized residual that forces a refit
+            change_point_threshold: CUSUM level (in residual standard
+                deviations) that forces a refit, None to disable
+        """
+        self.refit_interval_seconds = refit_interval_seconds
+        self.drift_threshold = drift_threshold
+        self.change_point_threshold = change_point_threshold
+        # Full refits performed, by reason
+        self.refit_counts: Counter = Counter()
+        self._states: Dict[Tuple[str, str], HoltWintersState] = {}
+        self._lock = threading.Lock()
+        logger.info(
+            f"Initialized ModelRegistry with refit_interval={refit_interval_seconds}s, "
+            f"drift_threshold={drift_threshold}, change_point_threshold={change_point_threshold}"
+        )
+
+    def get(self, metric_name: str, series_key: str = '') -> Optional[HoltWintersState]:
+        """
+        Get the stored state for a series
+
+        Args:
+            metric_name: Name of the metric
+            series_key: Identifier of the series within the metric
+
+        Returns:
+            HoltWintersState or None if no model is stored
+        """
+        with self._lock:
+            return self._states.get((metric_name, series_key))
+
+    def put(
+        self,
+        metric_name: str,
+        state: HoltWintersState,
+        series_key: str = '',
+        reason: Optional[str] = None
+    ):
+        """
+        Store the state for a series
+
+        Args:
+            metric_name: Name of the metric
+            state: Fitted model state
+            series_key: Identifier of the series within the metric
+            reason: Why the state was refitted, counted in refit_counts
+        """
+        with self._lock:
+            self._states[(metric_name, series_key)] = state
+            if reason is not None:
+                self.refit_counts[reason] += 1
+
+    def invalidate(self, metric_name: str, series_key: str = ''):
+        """
+        Drop the stored state so the next cycle refits
+
+        Args:
+            metric_name: Name of the metric
+            series_key: Identifier of the series within the metric
+        """
+        with self._lock:
+            self._states.pop((metric_name, series_key), None)
+
+    def export(self) -> Dict[Tuple[str, str], HoltWintersState]:
+        """
+        Snapshot of every stored state
+
+        Returns:
+            State keyed by (metric name, series key)
+        """
+        with self._lock:
+            return dict(self._states)
+
+    def load(self, states: Dict[Tuple[str, str], HoltWintersState]):
+        """
+        Add states, e.g. restored from a checkpoint
+
+        Args:
+            states: State keyed by (metric name, series key)
+        """
+        with self._lock:
+            self._states.update(states)
+
+    def refit_reason(self, state: Optional[HoltWintersState], now: Optional[float] = None) -> Optional[str]:
+        """
+        Decide whether a state needs a full re-optimisation
+
+        Args:
+            state: Stored state or None
+            now: Current wall-clock time, defaults to time.time()
+
+        Returns:
+            'missing', 'age', 'change_point' or 'drift' if a refit is due,
+            None otherwise
+        """
+        if state is None:
+            return 'missing'
+        now = now if now is not None else time.time()
+        if now - state.fitted_at >= self.refit_interval_seconds:
+            return 'age'
+        if self.change_point_threshold is not None and state.change_score > self.change_point_threshold:
+            return 'change_point'
+        if np.sqrt(state.drift_score) > self.drift_threshold:
+            return 'drift'
+        return None
@@ -0,0 +1,239 @@
+import logging
+import threading
+import time
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Tuple
+from model_registry import HoltWintersState
+from timeseries import TimeSeriesBuffer, parse_step
+
+logger = logging.getLogger(__name__)
+
+
+class CoarseFit:
+    """Holt-Winters model fitted on downsampled history, with its in-sample predictions"""
+
+    def __init__(self, state: HoltWintersState, timestamps: np.ndarray, fitted: np.ndarray):
+        """
+        Initialize coarse fit
+
+        Args:
+            state: Model state after the last bucket
+            timestamps: Bucket end times the model was fitted on
+            fitted: One-step-ahead prediction for each bucket
+        """
+        self.state = state
+        self.timestamps = np.asarray(timestamps, dtype=np.float64)
+        self.fitted = np.asarray(fitted, dtype=np.float64)
+
+    @classmethod
+    def from_fitted(cls, fitted_model, timestamps: np.ndarray) -> 'CoarseFit':
+        """
+        Build from a statsmodels HoltWintersResults
+
+        Args:
+            fitted_model: Result of ExponentialSmoothing(...).fit()
+            timestamps: Bucket end times of the fitted points
+
+        Returns:
+            CoarseFit positioned after the last bucket
+        """
+        return cls(
+            HoltWintersState.from_fitted(fitted_model, timestamps),
+            timestamps,
+            fitted_model.fittedvalues
+        )
+
+    @property
+    def step_seconds(self) -> float:
+        return self.state.step_seconds
+
+    @property
+    def last_timestamp(self) -> float:
+        return self.state.last_timestamp
+
+    def predict(self, timestamps: np.ndarray) -> np.ndarray:
+        """
+        Coarse prediction for the bucket each full-resolution timestamp falls in
+
+        Buckets the model was fitted on use the in-sample prediction, later
+        ones the forecast.
+
+        Args:
+            timestamps: Full-resolution timestamps
+
+        Returns:
+            Predicted bucket mean per timestamp
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        step = self.step_seconds
+        buckets = np.ceil(timestamps / step) * step
+        predictions = np.empty(len(timestamps))
+
+        inside = buckets <= self.last_timestamp
+        index = np.searchsorted(self.timestamps, buckets[inside])
+        predictions[inside] = self.fitted[np.clip(index, 0, len(self.fitted) - 1)]
+
+        ahead = np.rint((buckets[~inside] - self.last_timestamp) / step).astype(int)
+        if len(ahead):
+            predictions[~inside] = self.state.forecast(int(ahead.max()))[ahead - 1]
+        return predictions
+
+
+class MultiResolutionModel:
+    """Coarse Holt-Winters model scored against a short full-resolution window"""
+
+    def __init__(self, coarse: CoarseFit, timestamps: np.ndarray, values: np.ndarray):
+        """
+        Initialize model
+
+        Residuals are taken between each full-resolution point and the
+        coarse prediction for its bucket, so the spread within a bucket sets
+        the width of the prediction interval.
+
+        Args:
+            coarse: Fit on the downsampled history
+            timestamps: Recent full-resolution timestamps
+            values: Recent full-resolution values
+        """
+        self.coarse = coarse
+        self.resid = np.asarray(values, dtype=np.float64) - coarse.predict(timestamps)
+        self.residual_std = float(np.std(self.resid))
+        self.last_timestamp = float(timestamps[-1])
+        self.step_seconds = float(np.median(np.diff(timestamps))) if len(timestamps) > 1 else 1.0
+
+    def forecast(self, steps: int = 1) -> np.ndarray:
+        """
+        Forecast the next full-resolution points
+
+        Args:
+            steps: Number of points to forecast
+
+        Returns:
+            Array of forecasts
+        """
+        return self.coarse.predict(self.last_timestamp + self.step_seconds * np.arange(1, steps + 1))
+
+
+class MultiResolutionStore:
+    """Coarse fits per series, refitted once a newer bucket is complete"""
+
+    def __init__(
+        self,
+        step: str = '1h',
+        seasonal_periods: int = 24,
+        days: int = 30,
+        max_backoff_seconds: float = 86400
+    ):
+        """
+        Initialize store
+
+        A series whose coarse fit fails is not retried every cycle: it waits
+        one bucket after the first failure, doubling with each further one up
+        to max_backoff_seconds, and keeps its previous fit (or the fallback)
+        meanwhile.
+
+        Args:
+            step: Bucket width of the downsampled history
+            seasonal_periods: Buckets per seasonal cycle (24 daily, 168 weekly at 1h)
+            days: Length of the downsampled history in days
+            max_backoff_seconds: Longest wait before retrying a failed fit
+        """
+        self.step = step
+        self.step_seconds = parse_step(step)
+        self.seasonal_periods = seasonal_periods
+        self.days = days
+        self.max_backoff_seconds = max_backoff_seconds
+        self._fits: Dict[Tuple[str, str], CoarseFit] = {}
+        # Consecutive failures and earliest retry time per series
+        self._failures: Dict[Tuple[str, str], Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        logger.info(
+            f"Initialized MultiResolutionStore with step={step}, "
+            f"seasonal_periods={seasonal_periods}, days={days}"
+        )
+
+    def stale_keys(
+        self,
+        metric_name: str,
+        keys: Iterable[str],
+        now: Optional[float] = None
+    ) -> List[str]:
+        """
+        Series whose fit is missing or older than the latest complete bucket
+
+        Series backing off after a failed fit are left out until their retry time.
+
+        Args:
+            metric_name: Name of the metric
+            keys: Series keys to check
+            now: Current time, defaults to time.time()
+
+        Returns:
+            Keys that need a coarse refit
+        """
+        now = now if now is not None else time.time()
+        latest_bucket = now // self.step_seconds * self.step_seconds
+        with self._lock:
+            return [
+                key for key in keys
+                if (
+                    (metric_name, key) not in self._fits
+                    or self._fits[(metric_name, key)].last_timestamp < latest_bucket
+                )
+                and self._failures.get((metric_name, key), (0, 0.0))[1] <= now
+            ]
+
+    def put(self, metric_name: str, fit: CoarseFit, series_key: str = ''):
+        """
+        Store the coarse fit for a series
+
+        Args:
+            metric_name: Name of the metric
+            fit: Coarse fit
+            series_key: Identifier of the series within the metric
+        """
+        with self._lock:
+            self._fits[(metric_name, series_key)] = fit
+            self._failures.pop((metric_name, series_key), None)
+
+    def failed(self, metric_name: str, series_key: str = '', now: Optional[float] = None) -> float:
+        """
+        Record a failed coarse fit and back off before the next attempt
+
+        Args:
+            metric_name: Name of the metric
+            series_key: Identifier of the series within the metric
+            now: Current time, defaults to time.time()
+
+        Returns:
+            Seconds until the series is retried
+        """
+        now = now if now is not None else time.time()
+        with self._lock:
+            failures = self._failures.get((metric_name, series_key), (0, 0.0))[0] + 1
+            backoff = min(self.max_backoff_seconds, self.step_seconds * 2 ** (failures - 1))
+            self._failures[(metric_name, series_key)] = (failures, now + backoff)
+        return backoff
+
+    def model(
+        self,
+        metric_name: str,
+        time_series: TimeSeriesBuffer,
+        series_key: str = ''
+    ) -> Optional[MultiResolutionModel]:
+        """
+        Combine the stored coarse fit with the recent full-resolution window
+
+        Args:
+            metric_name: Name of the metric
+            time_series: Recent full-resolution history
+            series_key: Identifier of the series within the metric
+
+        Returns:
+            MultiResolutionModel or None if no coarse fit is stored
+        """
+        with self._lock:
+            fit = self._fits.get((metric_name, series_key))
+        if fit is None or not len(time_series):
+            return None
+        return MultiResolutionModel(fit, time_series.timestamps, time_series.values)
@@ -1,25 +1,215 @@
 import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+import numpy as np
 import requests
-from prometheus_api_client import PrometheusConnect
+from urllib3.util.retry import Retry
+from http_session import PooledSession
+from matrix_decoder import MatrixDecoder
+from timeseries import TimeSeriesBuffer, parse_step, series_key
 
 logger = logging.getLogger(__name__)
 
+# (connect, read) timeout in seconds for sessions without a default timeout
+QUERY_TIMEOUT = (3.05, 30.0)
+
+
+def _decode_values(points) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Convert Prometheus [timestamp, "value"] pairs into float arrays
+    
+    Args:
+        points: 'values' of a matrix result, a list of pairs or an (n, 2)
+            array from MatrixDecoder
+        
+    Returns:
+        Tuple of (timestamps, values) or None if a point is invalid
+    """
+    if isinstance(points, np.ndarray):
+        return points[:, 0], points[:, 1]
+    try:
+        timestamps = np.fromiter((p[0] for p in points), dtype=np.float64, count=len(points))
+        values = np.fromiter((p[1] for p in points), dtype=np.float64, count=len(points))
+    except (ValueError, TypeError) as e:
+        logger.warning(f"Invalid value in series, skipping it: {e}")
+        return None
+    return timestamps, values
+
+
+def _series_selector(series: Optional[List[Dict[str, str]]]) -> str:
+    """
+    Build a label selector matching a set of label sets
+    
+    The selector matches the cross product of the values, so callers
+    still filter the result down to the exact label sets.
+    
+    Args:
+        series: Label sets to match, or None for no restriction
+        
+    Returns:
+        Selector string such as '{http_route=~"/a|/b"}', '' for no restriction
+    """
+    if not series:
+        return ''
+    matchers = []
+    for label in sorted({name for labels in series for name in labels}):
+        values = sorted({labels[label] for labels in series if label in labels})
+        matchers.append(f'{label}=~"{_regex_union(values)}"')
+    return '{' + ','.join(matchers) + '}'
+
+
+def _regex_union(values: List[str]) -> str:
+    """
+    Build an escaped alternation regex for use inside a PromQL string
+    
+    Args:
+        values: Literal values to match
+        
+    Returns:
+        Pattern such as 'a|b\\-c'
+    """
+    pattern = '|'.join(re.escape(v) for v in values)
+    return pattern.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def _stitch_chunks(chunks: List[List[Dict]]) -> List[Dict]:
+    """
+    Merge matrix results of consecutive time chunks into one result
+    
+    Points of each series are appended in chunk order; points at or before
+    the last timestamp already merged (chunk boundary overlap) are dropped.
+    Decoded (n, 2) arrays are concatenated into one array per series.
+    
+    Args:
+        chunks: Matrix results ordered by chunk start time
+        
+    Returns:
+        Matrix result with one entry per label set
+    """
+    merged: Dict[Tuple, Dict] = {}
+    for chunk in chunks:
+        for item in chunk:
+            metric = item.get('metric', {})
+            points = item.get('values', [])
+            key = tuple(sorted(metric.items()))
+            entry = merged.setdefault(key, {'metric': metric, 'parts': [], 'last': float('-inf')})
+            if isinstance(points, np.ndarray):
+                points = points[points[:, 0] > entry['last']]
+                if len(points):
+                    entry['last'] = float(points[-1, 0])
+            else:
+                points = [p for p in points if float(p[0]) > entry['last']]
+                if points:
+                    entry['last'] = float(points[-1][0])
+            entry['parts'].append(points)
+    
+    result = []
+    for entry in merged.values():
+        parts = entry['parts']
+        if isinstance(parts[0], np.ndarray):
+            values = np.concatenate(parts)
+        else:
+            values = [p for part in parts for p in part]
+        result.append({'metric': entry['metric'], 'values': values})
+    return result
+
+
 class PrometheusQueryClient:
     """Client for querying Prometheus metrics"""
     
-    def __init__(self, prometheus_url: str):
+    def __init__(
+        self,
+        prometheus_url: str,
+        session: Optional[requests.Session] = None,
+        chunk_points: int = 2500,
+        chunk_workers: int = 4,
+        decoder: str = 'numpy'
+    ):
         """
         Initialize Prometheus client
         
         Args:
             prometheus_url: URL of the Prometheus server
+            session: Optional shared session (e.g. PooledSession) for all requests
+            chunk_points: Maximum points per series in one range query
+                (Prometheus rejects more than 11,000)
+            chunk_workers: Concurrent requests when a range is split into chunks
+            decoder: 'numpy' queries the HTTP API directly and streams range
+                responses into arrays, 'json' goes through prometheus_api_client
         """
-        self.prometheus_url = prometheus_url
-        self.client = PrometheusConnect(url=prometheus_url, disable_ssl=True)
+        self.prometheus_url = prometheus_url.rstrip('/')
+        self.session = session
+        self.chunk_points = chunk_points
+        self.chunk_workers = chunk_workers
+        self.decoder = decoder
+        self._chunk_executor: Optional[ThreadPoolExecutor] = None
+        self._http = session if session is not None else PooledSession()
+        # Only a session created here may be closed by reset_connections
+        self._owns_http = session is None
+        # Last successful top-series selection per query, reused while ranking fails
+        self._top_series: Dict[str, List[Dict[str, str]]] = {}
+        self._client = None
         logger.info(f"Initialized Prometheus client for {prometheus_url}")
     
+    @property
+    def client(self):
+        """
+        prometheus_api_client connection, created on first use
+        
+        The library imports pandas, so it is only loaded for the 'json'
+        decoder (or when accessed explicitly). It keeps its own connection
+        pool, configured with the session's retry policy.
+        """
+        if self._client is None:
+            from prometheus_api_client import PrometheusConnect
+            retry = getattr(self._http, 'retry', None)
+            self._client = PrometheusConnect(
+                url=self.prometheus_url,
+                disable_ssl=True,
+                retry=retry if isinstance(retry, Retry) else None
+            )
+        return self._client
+    
+    def _get(self, path: str, params: Dict, **kwargs) -> requests.Response:
+        """
+        Send a GET request to the Prometheus HTTP API
+        
+        Args:
+            path: API path such as '/api/v1/query'
+            params: Query string parameters
+            **kwargs: Extra arguments for requests, e.g. stream=True; the
+                timeout defaults to the session's
+            
+        Returns:
+            Response with status 200
+            
+        Raises:
+            requests.HTTPError: On any other status code
+        """
+        kwargs.setdefault('timeout', getattr(self._http, 'timeout', QUERY_TIMEOUT))
+        response = self._http.get(f"{self.prometheus_url}{path}", params=params, **kwargs)
+        if response.status_code != 200:
+            body = response.content
+            response.close()
+            raise requests.HTTPError(f"HTTP Status Code {response.status_code} ({body!r})")
+        return response
+    
+    def _instant_query(self, query: str) -> List[Dict]:
+        """
+        Run an instant query
+        
+        Args:
+            query: PromQL query string
+            
+        Returns:
+            Vector result
+        """
+        if self.decoder != 'numpy':
+            return self.client.custom_query(query=query)
+        return self._get('/api/v1/query', {'query': query}).json()['data']['result']
+    
     def query_range(
         self,
         query: str,
@@ -40,12 +230,15 @@ class PrometheusQueryClient:
             List of metric data points or None if query fails
         """
         try:
-            result = self.client.custom_query_range(
-                query=query,
-                start_time=start_time,
-                end_time=end_time,
-                step=step
-            )
+            chunks = self._range_chunks(start_time, end_time, step)
+            if len(chunks) == 1:
+                result = self._fetch_range(query, start_time, end_time, step)
+            else:
+                result = _stitch_chunks(list(self._executor().map(
+                    lambda chunk: self._fetch_range(query, chunk[0], chunk[1], step),
+                    chunks
+                )))
+                logger.debug(f"Query split into {len(chunks)} chunks")
             
             if not result:
                 logger.warning(f"No data returned for query: {query}")
@@ -58,12 +251,105 @@ class PrometheusQueryClient:
             logger.error(f"Error querying Prometheus: {e}")
             return None
     
+    def _fetch_range(
+        self,
+        query: str,
+        start_time: datetime,
+        end_time: datetime,
+        step: str
+    ) -> List[Dict]:
+        """
+        Send one query_range request
+        
+        With the 'numpy' decoder the body is streamed through MatrixDecoder,
+        so each series arrives as an (n, 2) array instead of a list of
+        [timestamp, "value"] pairs.
+        
+        Args:
+            query: PromQL query string
+            start_time: Start time for the query
+            end_time: End time for the query
+            step: Query resolution step
+            
+        Returns:
+            Matrix result
+        """
+        if self.decoder != 'numpy':
+            return self.client.custom_query_range(
+                query=query,
+                start_time=start_time,
+                end_time=end_time,
+                step=step
+            )
+        
+        response = self._get(
+            '/api/v1/query_range',
+            {
+                'query': query,
+                'start': round(start_time.timestamp()),
+                'end': round(end_time.timestamp()),
+                'step': step
+            },
+            stream=True
+        )
+        try:
+            decoder = MatrixDecoder()
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                decoder.feed(chunk)
+            return decoder.close()
+        finally:
+            response.close()
+    
+    def _range_chunks(
+        self,
+        start_time: datetime,
+        end_time: datetime,
+        step: str
+    ) -> List[Tuple[datetime, datetime]]:
+        """
+        Split a range into chunks of at most chunk_points evaluation steps
+        
+        Chunk starts stay on the grid start + k * step, so the stitched
+        result has the same timestamps as a single query.
+        
+        Args:
+            start_time: Start time for the query
+            end_time: End time for the query
+            step: Query resolution step
+            
+        Returns:
+            List of (start, end) pairs, inclusive, in time order
+        """
+        step_seconds = parse_step(step)
+        # custom_query_range sends whole seconds
+        start = round(start_time.timestamp())
+        end = round(end_time.timestamp())
+        span = self.chunk_points * step_seconds
+        if step_seconds <= 0 or end - start < span:
+            return [(start_time, end_time)]
+        
+        return [
+            (
+                datetime.fromtimestamp(chunk_start),
+                datetime.fromtimestamp(min(chunk_start + span - step_seconds, end))
+            )
+            for chunk_start in range(start, end + 1, span)
+        ]
+    
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._chunk_executor is None:
+            self._chunk_executor = ThreadPoolExecutor(
+                max_workers=self.chunk_workers,
+                thread_name_prefix='prom-chunk'
+            )
+        return self._chunk_executor
+    
     def get_metric_history(
         self,
         metric_name: str,
         days: int = 7,
         aggregation: str = 'avg'
-    ) -> Optional[List[tuple]]:
+    ) -> Optional[TimeSeriesBuffer]:
         """
         Get historical data for a specific metric
         
@@ -73,11 +359,43 @@ class PrometheusQueryClient:
             aggregation: Aggregation function (avg, max, min, sum)
             
         Returns:
-            List of (timestamp, value) tuples or None if query fails
+            TimeSeriesBuffer sized for the window or None if query fails
         """
         end_time = datetime.now()
         start_time = end_time - timedelta(days=days)
         
+        return self.get_metric_range(
+            metric_name=metric_name,
+            start_time=start_time,
+            end_time=end_time,
+            aggregation=aggregation,
+            step='5m',
+            capacity=days * 24 * 12 + 1
+        )
+    
+    def get_metric_range(
+        self,
+        metric_name: str,
+        start_time: datetime,
+        end_time: datetime,
+        aggregation: str = 'avg',
+        step: str = '5m',
+        capacity: Optional[int] = None
+    ) -> Optional[TimeSeriesBuffer]:
+        """
+        Get data for a specific metric between two points in time
+        
+        Args:
+            metric_name: Name of the metric to query
+            start_time: Start time for the query
+            end_time: End time for the query
+            aggregation: Aggregation function (avg, max, min, sum)
+            step: Query resolution step
+            capacity: Capacity of the returned buffer, defaults to the point count
+            
+        Returns:
+            TimeSeriesBuffer with the data points or None if query fails
+        """
         # Build PromQL query with aggregation
         query = f'{aggregation}({metric_name})'
         
@@ -85,32 +403,276 @@ class PrometheusQueryClient:
             query=query,
             start_time=start_time,
             end_time=end_time,
-            step='5m'
+            step=step
         )
         
         if not result:
             return None
         
-        # Extract time series data
-        time_series = []
-        for series in result:
-            values = series.get('values', [])
-            for timestamp, value in values:
-                try:
-                    time_series.append((timestamp, float(value)))
-                except (ValueError, TypeError) as e:
-                    logger.warning(f"Invalid value in series: {e}")
-                    continue
-        
-        if not time_series:
+        # Extract time series data into contiguous arrays
+        decoded = [_decode_values(series.get('values', [])) for series in result]
+        decoded = [d for d in decoded if d is not None]
+        
+        if not decoded or not sum(len(t) for t, _ in decoded):
             logger.warning(f"No valid data points for metric: {metric_name}")
             return None
         
+        timestamps = np.concatenate([t for t, _ in decoded])
+        values = np.concatenate([v for _, v in decoded])
+        
         # Sort by timestamp
-        time_series.sort(key=lambda x: x[0])
+        if len(timestamps) > 1 and np.any(np.diff(timestamps) < 0):
+            order = np.argsort(timestamps, kind='stable')
+            timestamps = timestamps[order]
+            values = values[order]
         
-        logger.info(f"Retrieved {len(time_series)} data points for {metric_name}")
-        return time_series
+        logger.info(f"Retrieved {len(timestamps)} data points for {metric_name}")
+        return TimeSeriesBuffer.from_arrays(timestamps, values, capacity=capacity)
+    
+    def get_series_range(
+        self,
+        metric_name: str,
+        start_time: datetime,
+        end_time: datetime,
+        group_by: List[str],
+        aggregation: str = 'avg',
+        step: str = '5m',
+        capacity: Optional[int] = None,
+        series: Optional[List[Dict[str, str]]] = None,
+        limit: Optional[int] = None
+    ) -> Optional[Dict[str, TimeSeriesBuffer]]:
+        """
+        Get data for a metric split into one series per label set
+        
+        Args:
+            metric_name: Name of the metric to query
+            start_time: Start time for the query
+            end_time: End time for the query
+            group_by: Labels to keep, e.g. ['service_name', 'http_route']
+            aggregation: Aggregation function (avg, max, min, sum)
+            step: Query resolution step
+            capacity: Capacity of each returned buffer, defaults to its point count
+            series: Optional label sets to restrict the result to
+            limit: Optional cap applied in the query with topk; it holds per
+                step, so series that trade places can still exceed it
+            
+        Returns:
+            TimeSeriesBuffer per series key or None if query fails
+        """
+        query = f'{aggregation} by ({", ".join(group_by)}) ({metric_name}{_series_selector(series)})'
+        if limit:
+            query = f'topk({limit}, {query})'
+        
+        result = self.query_range(
+            query=query,
+            start_time=start_time,
+            end_time=end_time,
+            step=step
+        )
+        
+        if not result:
+            return None
+        
+        wanted = {series_key(labels) for labels in series} if series else None
+        buffers = {}
+        for item in result:
+            labels = {k: v for k, v in item.get('metric', {}).items() if k in group_by}
+            key = series_key(labels)
+            if wanted is not None and key not in wanted:
+                continue
+            decoded = _decode_values(item.get('values', []))
+            if decoded is None or not len(decoded[0]):
+                continue
+            buffers[key] = TimeSeriesBuffer.from_arrays(
+                decoded[0], decoded[1], capacity=capacity, labels=labels
+            )
+        
+        logger.info(f"Retrieved {len(buffers)} series for {metric_name}")
+        return buffers
+    
+    def get_series_history(
+        self,
+        metric_name: str,
+        group_by: List[str],
+        days: int = 7,
+        aggregation: str = 'avg',
+        series: Optional[List[Dict[str, str]]] = None,
+        limit: Optional[int] = None
+    ) -> Optional[Dict[str, TimeSeriesBuffer]]:
+        """
+        Get historical data for a metric split into one series per label set
+        
+        Args:
+            metric_name: Name of the metric to query
+            group_by: Labels to keep
+            days: Number of days of historical data
+            aggregation: Aggregation function (avg, max, min, sum)
+            series: Optional label sets to restrict the result to
+            limit: Optional topk cap on the number of series
+            
+        Returns:
+            TimeSeriesBuffer per series key or None if query fails
+        """
+        end_time = datetime.now()
+        start_time = end_time - timedelta(days=days)
+        
+        return self.get_series_range(
+            metric_name=metric_name,
+            start_time=start_time,
+            end_time=end_time,
+            group_by=group_by,
+            aggregation=aggregation,
+            step='5m',
+            capacity=days * 24 * 12 + 1,
+            series=series,
+            limit=limit
+        )
+    
+    def get_downsampled_history(
+        self,
+        metric_name: str,
+        days: int = 30,
+        step: str = '1h',
+        aggregation: str = 'avg',
+        group_by: Optional[List[str]] = None,
+        series: Optional[List[Dict[str, str]]] = None
+    ) -> Optional[Dict[str, TimeSeriesBuffer]]:
+        """
+        Get a long history averaged server-side into coarse buckets
+        
+        Each point is avg_over_time over the preceding step, evaluated on a
+        grid aligned to whole steps, so a point at T covers (T - step, T]
+        and only complete buckets are returned.
+        
+        Args:
+            metric_name: Name of the metric to query
+            days: Number of days of history
+            step: Bucket width and query resolution, e.g. '1h'
+            aggregation: Aggregation function (avg, max, min, sum)
+            group_by: Labels to keep, None for one aggregated series
+            series: Optional label sets to restrict the result to
+            
+        Returns:
+            TimeSeriesBuffer per series key ('' without group_by) or None if query fails
+        """
+        step_seconds = parse_step(step)
+        end = datetime.now().timestamp() // step_seconds * step_seconds
+        selector = f'{metric_name}{_series_selector(series)}[{step}]'
+        if group_by:
+            query = f'{aggregation} by ({", ".join(group_by)}) (avg_over_time({selector}))'
+        else:
+            query = f'{aggregation}(avg_over_time({selector}))'
+        
+        result = self.query_range(
+            query=query,
+            start_time=datetime.fromtimestamp(end - days * 86400),
+            end_time=datetime.fromtimestamp(end),
+            step=step
+        )
+        
+        if not result:
+            return None
+        
+        wanted = {series_key(labels) for labels in series} if series else None
+        buffers = {}
+        for item in result:
+            labels = {k: v for k, v in item.get('metric', {}).items() if k in (group_by or [])}
+            key = series_key(labels)
+            if wanted is not None and key not in wanted:
+                continue
+            decoded = _decode_values(item.get('values', []))
+            if decoded is None or not len(decoded[0]):
+                continue
+            buffers[key] = TimeSeriesBuffer.from_arrays(decoded[0], decoded[1], labels=labels)
+        
+        logger.info(f"Retrieved {len(buffers)} downsampled ({step}) series for {metric_name}")
+        return buffers
+    
+    def get_top_series(
+        self,
+        group_by: List[str],
+        limit: int,
+        traffic_metric: str = 'http_server_requests_total',
+        window: str = '1h'
+    ) -> Optional[List[Dict[str, str]]]:
+        """
+        Select the label sets with the most traffic
+        
+        If the ranking query fails, the last successful selection for the
+        same query is returned so the cycle stays capped to known series.
+        
+        Args:
+            group_by: Labels identifying a series
+            limit: Maximum number of label sets to return
+            traffic_metric: Counter used to rank series by request rate
+            window: Rate window for the ranking
+            
+        Returns:
+            Label sets ordered by traffic, highest first, or None if the query
+            fails before any selection succeeded
+        """
+        labels = ', '.join(group_by)
+        query = f'topk({limit}, sum by ({labels}) (rate({traffic_metric}[{window}])))'
+        
+        try:
+            result = self._instant_query(query)
+        except Exception as e:
+            logger.error(f"Error selecting top series: {e}")
+            previous = self._top_series.get(query)
+            if previous is not None:
+                logger.warning(f"Degraded: reusing the last selection of {len(previous)} series")
+            return previous
+        
+        if not result:
+            logger.warning(f"No series found for traffic metric: {traffic_metric}")
+            return None
+        
+        result = sorted(result, key=lambda item: float(item['value'][1]), reverse=True)
+        selected = [
+            {k: v for k, v in item.get('metric', {}).items() if k in group_by}
+            for item in result[:limit]
+        ]
+        self._top_series[query] = selected
+        logger.info(f"Selected {len(selected)} series by traffic")
+        return selected
+    
+    def get_current_series_values(
+        self,
+        metric_name: str,
+        group_by: List[str],
+        aggregation: str = 'avg'
+    ) -> Optional[Dict[str, float]]:
+        """
+        Get the current value of every series of a metric in one query
+        
+        Args:
+            metric_name: Name of the metric to query
+            group_by: Labels identifying a series
+            aggregation: Aggregation function (avg, max, min, sum)
+            
+        Returns:
+            Current value per series key or None if query fails
+        """
+        query = f'{aggregation} by ({", ".join(group_by)}) ({metric_name})'
+        
+        try:
+            result = self._instant_query(query)
+        except Exception as e:
+            logger.error(f"Error getting current values: {e}")
+            return None
+        
+        if not result:
+            logger.warning(f"No current data for metric: {metric_name}")
+            return None
+        
+        values = {}
+        for item in result:
+            labels = {k: v for k, v in item.get('metric', {}).items() if k in group_by}
+            try:
+                values[series_key(labels)] = float(item['value'][1])
+            except (KeyError, IndexError, ValueError, TypeError) as e:
+                logger.warning(f"Invalid current value for {metric_name}: {e}")
+        return values
     
     def get_current_value(self, metric_name: str, aggregation: str = 'avg') -> Optional[float]:
         """
@@ -126,7 +688,7 @@ class PrometheusQueryClient:
         query = f'{aggregation}({metric_name})'
         
         try:
-            result = self.client.custom_query(query=query)
+            result = self._instant_query(query)
             
             if not result:
                 logger.warning(f"No current data for metric: {metric_name}")
@@ -141,6 +703,49 @@ class PrometheusQueryClient:
             logger.error(f"Error getting current value: {e}")
             return None
     
+    def get_current_values(
+        self,
+        metric_names: List[str],
+        aggregation: str = 'avg',
+        group_by: Optional[List[str]] = None
+    ) -> Optional[Dict[Tuple[str, str], float]]:
+        """
+        Get the current value of several metrics in one instant query
+        
+        Args:
+            metric_names: Names of the metrics to query
+            aggregation: Aggregation function (avg, max, min, sum)
+            group_by: Labels identifying a series, None for one value per metric
+            
+        Returns:
+            Current value keyed by (metric name, series key) or None if query fails
+        """
+        group_by = list(group_by or [])
+        labels = ', '.join(['__name__'] + group_by)
+        query = f'{aggregation} by ({labels}) ({{__name__=~"{_regex_union(metric_names)}"}})'
+        
+        try:
+            result = self._instant_query(query)
+        except Exception as e:
+            logger.error(f"Error getting current values: {e}")
+            return None
+        
+        if not result:
+            logger.warning(f"No current data for metrics: {', '.join(metric_names)}")
+            return None
+        
+        values = {}
+        for item in result:
+            metric = item.get('metric', {})
+            series_labels = {k: v for k, v in metric.items() if k in group_by}
+            try:
+                values[(metric['__name__'], series_key(series_labels))] = float(item['value'][1])
+            except (KeyError, IndexError, ValueError, TypeError) as e:
+                logger.warning(f"Invalid current value in batch result: {e}")
+        
+        logger.debug(f"Fetched {len(values)} current values in one query")
+        return values
+    
     def health_check(self) -> bool:
         """
         Check if Prometheus is reachable
@@ -149,7 +754,10 @@ class PrometheusQueryClient:
             True if Prometheus is healthy, False otherwise
         """
         try:
-            response = requests.get(f"{self.prometheus_url}/-/healthy", timeout=5)
+            response = self._http.get(
+                f"{self.prometheus_url}/-/healthy",
+                timeout=getattr(self._http, 'timeout', 5)
+            )
             is_healthy = response.status_code == 200
             
             if is_healthy:
@@ -162,3 +770,25 @@ class PrometheusQueryClient:
         except Exception as e:
             logger.error(f"Prometheus health check error: {e}")
             return False
+    
+    def reset_connections(self):
+        """
+        Drop this client's pooled connections so the next request reconnects
+        
+        A session created by the client is closed. On a shared session only
+        the adapter mounted for the Prometheus URL is reset, so other users
+        of the session (e.g. webhooks) keep their connections.
+        """
+        if self._owns_http:
+            self._http.close()
+            return
+        adapters = getattr(self._http, 'adapters', {})
+        for prefix, adapter in adapters.items():
+            if prefix.rstrip('/').lower() == self.prometheus_url.lower():
+                adapter.close()
+                logger.info(f"Reset connections to {self.prometheus_url}")
+                return
+        logger.warning(
+            f"Shared session has no connection pool dedicated to {self.prometheus_url}, "
+            f"not resetting it"
+        )
@@ -0,0 +1,168 @@
+import logging
+import math
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+from timeseries import parse_step
+
+logger = logging.getLogger(__name__)
+
+
+def parse_schedule(spec: str) -> Dict[str, Tuple[float, int]]:
+    """
+    Parse per-metric intervals and priorities
+
+    Args:
+        spec: Comma-separated 'metric=interval[:priority]' entries, interval
+            in Prometheus step notation (e.g. 'errors_total=30s:10,latency=5m')
+
+    Returns:
+        Dictionary of metric name to (interval in seconds, priority)
+    """
+    schedule = {}
+    for entry in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, value = entry.partition('=')
+        interval, _, priority = value.partition(':')
+        schedule[name.strip()] = (float(parse_step(interval.strip())), int(priority or 0))
+    return schedule
+
+
+class ScheduledJob:
+    """One recurring job on an absolute timeline"""
+
+    def __init__(self, name: str, interval_seconds: float, priority: int, anchor: float, jitter_seconds: float):
+        """
+        Initialize job
+
+        Args:
+            name: Job name, e.g. the metric it analyzes
+            interval_seconds: Time between runs
+            priority: Jobs with a higher priority run first when due together
+            anchor: Time of the first slot; slot k is at anchor + k * interval
+            jitter_seconds: Maximum random delay added to each slot
+        """
+        self.name = name
+        self.interval_seconds = interval_seconds
+        self.priority = priority
+        self.anchor = anchor
+        self.jitter_seconds = jitter_seconds
+        self.slot = 0
+        self.next_run = anchor + random.uniform(0, jitter_seconds)
+
+    def advance(self, now: float) -> int:
+        """
+        Move to the first slot after now
+
+        Args:
+            now: Current time
+
+        Returns:
+            Number of slots skipped because they were already overdue
+        """
+        next_slot = max(self.slot + 1, math.floor((now - self.anchor) / self.interval_seconds) + 1)
+        skipped = next_slot - self.slot - 1
+        self.slot = next_slot
+        # Jitter is drawn per slot, never carried over, so runs do not drift
+        self.next_run = (
+            self.anchor + next_slot * self.interval_seconds + random.uniform(0, self.jitter_seconds)
+        )
+        return skipped
+
+
+class Scheduler:
+    """Runs jobs with their own intervals and priorities on a drift-free timeline"""
+
+    def __init__(self, jitter_seconds: float = 0.0, clock=time.time):
+        """
+        Initialize scheduler
+
+        Each job's runs are planned at fixed offsets from its first slot, so
+        the time a run takes never shifts the later ones. Every slot is
+        delayed by a random jitter of up to jitter_seconds (at most a tenth
+        of the job's interval) so replicas and jobs do not hit Prometheus in
+        lockstep. A job that missed several slots runs once and the missed
+        slots are skipped rather than queued up.
+
+        Args:
+            jitter_seconds: Maximum random delay per run
+            clock: Function returning the current time in seconds
+        """
+        self.jitter_seconds = jitter_seconds
+        self.clock = clock
+        self.jobs: Dict[str, ScheduledJob] = {}
+        self._stats = {'runs': 0, 'skipped_runs': 0, 'lag_seconds': 0.0, 'max_lag_seconds': 0.0}
+        logger.info(f"Initialized Scheduler with jitter={jitter_seconds}s")
+
+    def add(self, name: str, interval_seconds: float, priority: int = 0, start: Optional[float] = None):
+        """
+        Schedule a recurring job
+
+        Args:
+            name: Job name
+            interval_seconds: Time between runs
+            priority: Jobs with a higher priority run first when due together
+            start: Time of the first run, defaults to now
+        """
+        start = start if start is not None else self.clock()
+        jitter = min(self.jitter_seconds, interval_seconds / 10)
+        self.jobs[name] = ScheduledJob(name, interval_seconds, priority, start, jitter)
+        logger.info(f"Scheduled {name} every {interval_seconds:.0f}s with priority {priority}")
+
+    def due(self) -> List[ScheduledJob]:
+        """
+        Take the jobs whose next run has come and plan their following run
+
+        Returns:
+            Due jobs, highest priority first, then most overdue first
+        """
+        now = self.clock()
+        due = sorted(
+            (job for job in self.jobs.values() if job.next_run <= now),
+            key=lambda job: (-job.priority, job.next_run)
+        )
+        if not due:
+            return []
+
+        lag = now - min(job.next_run for job in due)
+        skipped = 0
+        for job in due:
+            overdue = now - job.next_run
+            missed = job.advance(now)
+            if missed:
+                logger.warning(f"{job.name} is {overdue:.0f}s behind, skipping {missed} overdue runs")
+            skipped += missed
+
+        self._stats['runs'] += len(due)
+        self._stats['skipped_runs'] += skipped
+        self._stats['lag_seconds'] = lag
+        self._stats['max_lag_seconds'] = max(self._stats['max_lag_seconds'], lag)
+        return due
+
+    def seconds_until_next(self) -> float:
+        """
+        Time until the earliest planned run
+
+        Returns:
+            Seconds to wait, 0 if a job is already due
+        """
+        if not self.jobs:
+            return 0.0
+        return max(0.0, min(job.next_run for job in self.jobs.values()) - self.clock())
+
+    def stats(self) -> Dict:
+        """
+        Scheduling counters since start
+
+        Returns:
+            Dictionary with runs, skipped_runs, lag_seconds (how late the last
+            batch of due jobs started) and max_lag_seconds
+        """
+        return dict(self._stats)
+
+    def log_stats(self):
+        """Log the scheduling lag and skipped runs"""
+        stats = self.stats()
+        logger.info(
+            f"Scheduling lag: {stats['lag_seconds']:.2f}s (max {stats['max_lag_seconds']:.2f}s), "
+            f"{stats['runs']} runs, {stats['skipped_runs']} overdue runs skipped"
+        )
@@ -0,0 +1,134 @@
+import bisect
+import hashlib
+import logging
+import re
+from typing import Dict, Iterable, List, Optional
+from timeseries import series_key
+
+logger = logging.getLogger(__name__)
+
+
+def _hash(value: str) -> int:
+    """Stable 64-bit hash, identical in every process (unlike hash())"""
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], 'big')
+
+
+class HashRing:
+    """Consistent hash ring over shard indices"""
+
+    def __init__(self, shard_count: int, virtual_nodes: int = 128):
+        """
+        Initialize ring
+
+        Every shard owns virtual_nodes points on the ring and a key belongs
+        to the shard of the next point clockwise. Going from N to N + 1
+        shards only moves the keys the new shard's points take over, about
+        1 / (N + 1) of them; keys never move between the existing shards.
+
+        Args:
+            shard_count: Number of shards
+            virtual_nodes: Points per shard, more points even out the split
+        """
+        points = sorted(
+            (_hash(f'shard-{shard}-{node}'), shard)
+            for shard in range(shard_count)
+            for node in range(virtual_nodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    def shard_for(self, key: str) -> int:
+        """
+        Shard that owns a key
+
+        Args:
+            key: Key to place
+
+        Returns:
+            Shard index
+        """
+        index = bisect.bisect(self._hashes, _hash(key))
+        return self._shards[index % len(self._shards)]
+
+
+class Shard:
+    """The part of the monitored series one replica is responsible for"""
+
+    def __init__(self, index: int, count: int, virtual_nodes: int = 128):
+        """
+        Initialize shard
+
+        Series split by labels are placed by their series key, so a label
+        set belongs to the same replica for every metric. Aggregated metrics
+        (empty series key) are placed by metric name.
+
+        Args:
+            index: Index of this replica, 0 to count - 1
+            count: Number of replicas
+            virtual_nodes: Points per replica on the hash ring
+        """
+        if not 0 <= index < count:
+            raise ValueError(f"Shard index {index} is outside 0..{count - 1}")
+        self.index = index
+        self.count = count
+        self.ring = HashRing(count, virtual_nodes)
+        logger.info(f"Initialized Shard {index} of {count}")
+
+    @classmethod
+    def from_env(cls, index: str, count: int, hostname: str = '') -> 'Shard':
+        """
+        Build from configuration, taking the index from a StatefulSet pod name if not set
+
+        Args:
+            index: Configured replica index, may be empty
+            count: Number of replicas
+            hostname: Pod name such as 'anomaly-detector-2'
+
+        Returns:
+            Shard for this replica
+        """
+        if not index:
+            match = re.search(r'-(\d+)$', hostname)
+            if match is None:
+                raise ValueError(f"SHARD_INDEX is not set and hostname '{hostname}' has no ordinal")
+            index = match.group(1)
+        return cls(int(index), count)
+
+    def owns(self, metric_name: str, key: str = '') -> bool:
+        """
+        Whether a series belongs to this replica
+
+        Args:
+            metric_name: Name of the metric
+            key: Series key within the metric, '' for an aggregated metric
+
+        Returns:
+            True if this replica analyzes the series
+        """
+        return self.ring.shard_for(key or metric_name) == self.index
+
+    def filter_metrics(self, metrics: Iterable[str]) -> List[str]:
+        """
+        Aggregated metrics owned by this replica
+
+        Args:
+            metrics: Metric names
+
+        Returns:
+            Owned metric names, in their original order
+        """
+        return [metric for metric in metrics if self.owns(metric)]
+
+    def filter_series(self, series: Optional[List[Dict[str, str]]]) -> Optional[List[Dict[str, str]]]:
+        """
+        Label sets owned by this replica
+
+        Args:
+            series: Label sets, or None for no selection
+
+        Returns:
+            Owned label sets in their original order, None if none were given
+        """
+        if series is None:
+            return None
+        return [labels for labels in series if self.owns('', series_key(labels))]
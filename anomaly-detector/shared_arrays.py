@@ -0,0 +1,93 @@
+import gc
+import logging
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Iterator, List, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# (block name, block shape, dtype string, row, row length)
+RowSpec = Tuple[str, Tuple[int, int], str, int, int]
+
+
+class SharedArray:
+    """Rows of float data in one shared memory block that worker processes attach to by name"""
+
+    def __init__(self, rows: List[np.ndarray], dtype=np.float64):
+        """
+        Copy rows of possibly different lengths into a new shared block
+
+        Args:
+            rows: 1D arrays, one per series
+            dtype: NumPy dtype of the block
+        """
+        self.dtype = np.dtype(dtype)
+        self.lengths = [len(row) for row in rows]
+        self.shape = (len(rows), max(self.lengths, default=0))
+        size = max(int(np.prod(self.shape)) * self.dtype.itemsize, 1)
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+
+        block = np.ndarray(self.shape, dtype=self.dtype, buffer=self._shm.buf)
+        for i, row in enumerate(rows):
+            block[i, :len(row)] = row
+        # Views must be gone before the block can be closed
+        del block
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def spec(self, row: int) -> RowSpec:
+        """
+        Picklable reference to one row, for passing to a worker
+
+        Args:
+            row: Row index
+
+        Returns:
+            RowSpec to hand to attach_row
+        """
+        return self.name, self.shape, self.dtype.str, row, self.lengths[row]
+
+    def close(self):
+        """Release and destroy the shared block"""
+        self._shm.close()
+        try:
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> 'SharedArray':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+@contextmanager
+def attach_row(spec: RowSpec) -> Iterator[np.ndarray]:
+    """
+    Map one row of a SharedArray in a worker process without copying
+
+    Args:
+        spec: RowSpec from SharedArray.spec
+
+    Yields:
+        Read-only view of the row; it must not be kept after the block closes
+    """
+    name, shape, dtype, row, length = spec
+    shm = shared_memory.SharedMemory(name=name)
+    block = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    view = block[row, :length]
+    view.flags.writeable = False
+    try:
+        yield view
+    finally:
+        del view, block
+        try:
+            shm.close()
+        except BufferError:
+            # A fitted model may still reference the row through a cycle
+            gc.collect()
+            shm.close()
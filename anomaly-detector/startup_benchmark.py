@@ -0,0 +1,124 @@
+"""
+Startup benchmark for the anomaly detector service
+
+Imports main.py and builds the service components in a fresh interpreter
+(no Prometheus connection is made), then reports the import/startup time,
+the peak resident memory and which heavy optional dependencies got loaded.
+Exits with status 1 when a budget is exceeded.
+
+Usage:
+    python startup_benchmark.py
+"""
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+# Budgets, overridable for slower machines
+STARTUP_TIME_BUDGET_SECONDS = float(os.getenv('STARTUP_TIME_BUDGET_SECONDS', '1.0'))
+STARTUP_RSS_BUDGET_MB = float(os.getenv('STARTUP_RSS_BUDGET_MB', '100'))
+
+# Modules that must only be imported by the code paths that need them
+HEAVY_MODULES = ['pandas', 'statsmodels', 'sklearn', 'scipy', 'prometheus_api_client', 'matplotlib']
+
+_PROBE = """
+import json, resource, sys, time
+
+
+def peak_rss_mb():
+    # VmHWM belongs to this process image; ru_maxrss survives fork/exec from a large parent
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+start = time.perf_counter()
+import main
+from config import Config
+from prometheus_client import PrometheusQueryClient
+from anomaly_detector import AnomalyDetector
+from alert_manager import AlertManager
+from history_cache import MetricHistoryCache
+from executors import StageExecutors
+from model_registry import ModelRegistry
+from http_session import PooledSession
+from checkpoint_store import CheckpointStore
+from forecast_table import ForecastTable
+session = PooledSession()
+PrometheusQueryClient(Config.PROMETHEUS_URL, session=session)
+AnomalyDetector(history_cache=MetricHistoryCache(), model_registry=ModelRegistry())
+AlertManager(Config.ALERT_WEBHOOK_URL, session=session)
+seconds = time.perf_counter() - start
+json.dump({
+    'seconds': seconds,
+    'peak_rss_mb': peak_rss_mb(),
+    'modules': sorted({name.split('.')[0] for name in sys.modules})
+}, sys.stdout)
+"""
+
+
+def measure() -> Dict:
+    """
+    Measure the service startup in a fresh interpreter
+
+    Returns:
+        Dictionary with seconds, peak_rss_mb and the heavy modules loaded
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run(
+        [sys.executable, '-c', _PROBE],
+        cwd=here,
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    loaded = set(result.pop('modules'))
+    result['heavy_modules'] = [name for name in HEAVY_MODULES if name in loaded]
+    return result
+
+
+def check_budget(result: Dict) -> List[str]:
+    """
+    Compare a measurement with the budgets
+
+    Args:
+        result: Measurement from measure()
+
+    Returns:
+        List of budget violations, empty if within budget
+    """
+    violations = []
+    if result['seconds'] > STARTUP_TIME_BUDGET_SECONDS:
+        violations.append(
+            f"startup took {result['seconds']:.2f}s (budget {STARTUP_TIME_BUDGET_SECONDS:.2f}s)"
+        )
+    if result['peak_rss_mb'] > STARTUP_RSS_BUDGET_MB:
+        violations.append(
+            f"peak RSS {result['peak_rss_mb']:.0f}MB (budget {STARTUP_RSS_BUDGET_MB:.0f}MB)"
+        )
+    if result['heavy_modules']:
+        violations.append(f"heavy modules loaded at startup: {', '.join(result['heavy_modules'])}")
+    return violations
+
+
+def main():
+    result = measure()
+    print(f"Startup time: {result['seconds']:.3f}s (budget {STARTUP_TIME_BUDGET_SECONDS:.2f}s)")
+    print(f"Peak RSS:     {result['peak_rss_mb']:.1f}MB (budget {STARTUP_RSS_BUDGET_MB:.0f}MB)")
+    print(f"Heavy modules loaded: {', '.join(result['heavy_modules']) or 'none'}")
+
+    violations = check_budget(result)
+    for violation in violations:
+        print(f"OVER BUDGET: {violation}")
+    sys.exit(1 if violations else 0)
+
+
+if __name__ == '__main__':
+    main()
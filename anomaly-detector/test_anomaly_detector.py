@@ -2,13 +2,37 @@
 Unit tests for anomaly detection logic
 Tests Holt-Winters algorithm, deviation calculation, alert generation, and graceful degradation
 """
+import os
+import threading
+import time
+from collections import Counter
 import pytest
 import numpy as np
 from unittest.mock import Mock, MagicMock, patch
 from datetime import datetime, timedelta
 from anomaly_detector import AnomalyDetector
 from alert_manager import AlertManager
+from alert_dispatcher import AlertDispatcher
+from alert_state import AlertStateStore, fingerprint
+from alert_outbox import AlertOutbox
+from scheduler import Scheduler, parse_schedule
+from sharding import HashRing, Shard
 from prometheus_client import PrometheusQueryClient
+from history_cache import MetricHistoryCache
+from timeseries import TimeSeriesBuffer, series_key
+from executors import StageExecutors
+from model_registry import HoltWintersState, ModelRegistry
+from batch_holt_winters import BatchHoltWinters
+from http_session import PooledSession
+from matrix_decoder import MatrixDecoder
+from checkpoint_store import CheckpointStore
+from forecast_table import ForecastTable
+from shared_arrays import SharedArray, attach_row
+from multi_resolution import CoarseFit, MultiResolutionModel, MultiResolutionStore
+from fourier_regression import FourierModel, FourierRegression
+from executors import available_cpus
+import startup_benchmark
+import main
 
 
 class TestHoltWintersAlgorithm:
@@ -358,7 +382,7 @@ class TestPrometheusClient:
     
     def test_health_check_success(self):
         """Test successful Prometheus health check"""
-        with patch('requests.get') as mock_get:
+        with patch.object(PooledSession, 'get') as mock_get:
             mock_response = Mock()
             mock_response.status_code = 200
             mock_get.return_value = mock_response
@@ -370,7 +394,7 @@ class TestPrometheusClient:
     
     def test_health_check_failure(self):
         """Test failed Prometheus health check"""
-        with patch('requests.get') as mock_get:
+        with patch.object(PooledSession, 'get') as mock_get:
             mock_response = Mock()
             mock_response.status_code = 503
             mock_get.return_value = mock_response
@@ -379,6 +403,1909 @@ class TestPrometheusClient:
             is_healthy = client.health_check()
             
             assert is_healthy is False
+    
+    def test_get_metric_history_returns_sorted_buffer(self):
+        """Test that range results are decoded into a sorted TimeSeriesBuffer"""
+        client = PrometheusQueryClient('http://prometheus:9090')
+        raw = [{'metric': {}, 'values': [[300.0, '2.5'], [0.0, '1'], [600.0, 'NaN']]}]
+        
+        with patch.object(client, 'query_range', return_value=raw):
+            result = client.get_metric_history('test_metric', days=1)
+        
+        assert isinstance(result, TimeSeriesBuffer)
+        np.testing.assert_array_equal(result.timestamps, [0.0, 300.0, 600.0])
+        assert result.values[1] == 2.5
+        assert result.capacity == 24 * 12 + 1
+
+
+class TestMetricHistoryCache:
+    """Test incremental history fetching"""
+    
+    def test_first_call_fetches_full_window(self):
+        """Test that an empty cache pulls the whole window once"""
+        cache = MetricHistoryCache(step='5m')
+        now = datetime.now().timestamp()
+        time_series = [(now - 300 * i, float(i)) for i in range(200, 0, -1)]
+        
+        mock_prom_client = Mock()
+        mock_prom_client.get_metric_history.return_value = time_series
+        
+        result = cache.get_history(mock_prom_client, 'test_metric', days=7)
+        
+        assert result.to_pairs() == time_series
+        mock_prom_client.get_metric_history.assert_called_once()
+        mock_prom_client.get_metric_range.assert_not_called()
+    
+    def test_second_call_fetches_only_delta_and_trims(self):
+        """Test that later calls fetch new points only and drop expired ones"""
+        cache = MetricHistoryCache(step='5m')
+        now = datetime.now().timestamp()
+        expired = [(now - 8 * 86400, 1.0)]
+        recent = [(now - 600, 2.0), (now - 300, 3.0)]
+        
+        mock_prom_client = Mock()
+        mock_prom_client.get_metric_history.return_value = expired + recent
+        mock_prom_client.get_metric_range.return_value = [(now - 300, 3.0), (now, 4.0)]
+        
+        cache.get_history(mock_prom_client, 'test_metric', days=7)
+        result = cache.get_history(mock_prom_client, 'test_metric', days=7)
+        
+        assert result.to_pairs() == recent + [(now, 4.0)]
+        assert mock_prom_client.get_metric_history.call_count == 1
+        _, kwargs = mock_prom_client.get_metric_range.call_args
+        assert kwargs['start_time'].timestamp() > now - 300
+
+
+class TestTimeSeriesBuffer:
+    """Test the array-backed ring buffer"""
+    
+    def test_append_wraps_and_keeps_contiguous_view(self):
+        """Test that the oldest samples are overwritten and views stay ordered"""
+        buffer = TimeSeriesBuffer(capacity=4)
+        for t in range(6):
+            buffer.append(float(t), float(t * 10))
+        
+        assert len(buffer) == 4
+        np.testing.assert_array_equal(buffer.timestamps, [2, 3, 4, 5])
+        np.testing.assert_array_equal(buffer.values, [20, 30, 40, 50])
+        assert buffer.last_timestamp == 5.0
+    
+    def test_views_are_zero_copy_and_read_only(self):
+        """Test that views share memory with the buffer and cannot be written"""
+        buffer = TimeSeriesBuffer.from_pairs([(1.0, 1.0), (2.0, 2.0)], capacity=8)
+        
+        values = buffer.values
+        assert np.shares_memory(values, buffer._values)
+        assert not values.flags.writeable
+    
+    def test_extend_and_drop_before(self):
+        """Test bulk append and trimming of old samples"""
+        buffer = TimeSeriesBuffer(capacity=5, value_dtype=np.float32)
+        buffer.extend(np.arange(3, dtype=np.float64), np.ones(3))
+        buffer.extend(np.arange(3, 7, dtype=np.float64), np.zeros(4))
+        
+        assert buffer.values.dtype == np.float32
+        np.testing.assert_array_equal(buffer.timestamps, [2, 3, 4, 5, 6])
+        
+        assert buffer.drop_before(4.0) == 2
+        np.testing.assert_array_equal(buffer.timestamps, [4, 5, 6])
+
+
+class TestConcurrentDetection:
+    """Test the concurrent detection cycle"""
+    
+    def test_concurrent_cycle_analyzes_all_metrics_and_alerts(self):
+        """Test that every metric is analyzed and anomalies are alerted"""
+        executors = StageExecutors(io_workers=3, fit_workers=0, alert_workers=2)
+        mock_detector = Mock()
+        mock_detector.detect_anomaly.side_effect = lambda prom_client, metric_name, **kwargs: {
+            'metric': metric_name,
+            'is_anomaly': metric_name.endswith('errors_total')
+        }
+        mock_alert_manager = Mock()
+        mock_alert_manager.generate_and_send_alert.return_value = True
+        
+        try:
+            main.run_detection_cycle(Mock(), mock_detector, mock_alert_manager, executors)
+        finally:
+            executors.shutdown()
+        
+        analyzed = {c.kwargs['metric_name'] for c in mock_detector.detect_anomaly.call_args_list}
+        assert analyzed == set(main.Config.METRICS_TO_MONITOR)
+        mock_alert_manager.generate_and_send_alert.assert_called_once()
+    
+    def test_fit_runs_in_process_pool(self):
+        """Test that model fitting can be offloaded to worker processes"""
+        executors = StageExecutors(io_workers=1, fit_workers=1, alert_workers=1)
+        detector = AnomalyDetector(threshold=2.5, min_data_points=100, fit_executor=executors.fit)
+        
+        timestamps = list(range(200))
+        values = [50 + 10 * np.sin(2 * np.pi * t / 50) for t in timestamps]
+        
+        try:
+            fitted_model = detector.fit_holt_winters(list(zip(timestamps, values)), seasonal_periods=50)
+        finally:
+            executors.shutdown()
+        
+        assert fitted_model is not None
+        assert hasattr(fitted_model, 'forecast')
+
+
+class TestModelRegistry:
+    """Test persistent Holt-Winters state and incremental updates"""
+    
+    def _seasonal_series(self, n, period=50, seed=0):
+        rng = np.random.default_rng(seed)
+        t = np.arange(n)
+        values = 50 + 0.02 * t + 10 * np.sin(2 * np.pi * t / period) + rng.normal(0, 3, n)
+        return (t * 300.0, values)
+    
+    def test_state_forecast_matches_fitted_model(self):
+        """Test that the extracted state reproduces the statsmodels forecast"""
+        detector = AnomalyDetector(threshold=2.5, min_data_points=100)
+        timestamps, values = self._seasonal_series(300)
+        fitted_model = detector.fit_holt_winters(list(zip(timestamps, values)), seasonal_periods=50)
+        
+        state = HoltWintersState.from_fitted(fitted_model, timestamps)
+        
+        np.testing.assert_allclose(state.forecast(3), fitted_model.forecast(3))
+        assert state.residual_std == pytest.approx(np.std(fitted_model.resid))
+    
+    def test_update_many_matches_full_recursion(self):
+        """Test that incremental updates follow the Holt-Winters recursion"""
+        from statsmodels.tsa.holtwinters import ExponentialSmoothing
+        detector = AnomalyDetector(threshold=2.5, min_data_points=100)
+        timestamps, values = self._seasonal_series(310)
+        fitted_model = detector.fit_holt_winters(
+            list(zip(timestamps[:300], values[:300])), seasonal_periods=50
+        )
+        state = HoltWintersState.from_fitted(fitted_model, timestamps[:300])
+        
+        residuals = state.update_many(timestamps, values)
+        
+        params = fitted_model.params
+        replay = ExponentialSmoothing(
+            values, seasonal_periods=50, trend='add', seasonal='add',
+            initialization_method='known',
+            initial_level=params['initial_level'],
+            initial_trend=params['initial_trend'],
+            initial_seasonal=params['initial_seasons']
+        ).fit(
+            smoothing_level=params['smoothing_level'],
+            smoothing_trend=params['smoothing_trend'],
+            smoothing_seasonal=params['smoothing_seasonal'],
+            optimized=False
+        )
+        assert len(residuals) == 10
+        np.testing.assert_allclose(state.forecast(1), replay.forecast(1))
+    
+    def test_refit_reasons(self):
+        """Test that refits are scheduled on age and residual drift"""
+        registry = ModelRegistry(refit_interval_seconds=600, drift_threshold=2.0)
+        state = HoltWintersState(0.1, 0.0, 0.0, 10.0, 0.0, np.zeros(4), 1.0, 0.0, 300.0, fitted_at=1000.0)
+        
+        assert registry.refit_reason(None) == 'missing'
+        assert registry.refit_reason(state, now=1100.0) is None
+        assert registry.refit_reason(state, now=1700.0) == 'age'
+        
+        for _ in range(20):
+            state.update(100.0)
+        assert registry.refit_reason(state, now=1100.0) == 'drift'
+    
+    def test_detector_reuses_state_between_cycles(self):
+        """Test that the second cycle advances the model instead of refitting"""
+        detector = AnomalyDetector(threshold=2.5, min_data_points=100, model_registry=ModelRegistry())
+        timestamps, values = self._seasonal_series(301)
+        
+        with patch.object(detector, 'fit_holt_winters', wraps=detector.fit_holt_winters) as mock_fit:
+            first = detector.get_model('test_metric', list(zip(timestamps[:300], values[:300])))
+            second = detector.get_model('test_metric', list(zip(timestamps, values)))
+        
+        assert mock_fit.call_count == 1
+        assert second is first
+        assert second.updates == 1
+
+
+class TestBatchHoltWinters:
+    """Test the vectorized batch Holt-Winters engine"""
+    
+    def _series(self, n_series, n_points=400, period=50):
+        rng = np.random.default_rng(7)
+        t = np.arange(n_points)
+        return np.stack([
+            100 * (i + 1) + 0.01 * t + 10 * np.sin(2 * np.pi * t / period + i) + rng.normal(0, 1 + i, n_points)
+            for i in range(n_series)
+        ])
+    
+    def test_batch_matches_per_series_fit(self):
+        """Test that batch forecasts and residual std match fit_holt_winters"""
+        detector = AnomalyDetector(threshold=2.5, min_data_points=100)
+        values = self._series(3)
+        
+        result = BatchHoltWinters(seasonal_periods=50).fit(values)
+        forecasts = result.forecast(1)[:, 0]
+        
+        for i in range(3):
+            fitted_model = detector.fit_holt_winters(
+                list(zip(range(values.shape[1]), values[i])), seasonal_periods=50
+            )
+            residual_std = np.std(fitted_model.resid)
+            assert result.residual_std[i] == pytest.approx(residual_std, rel=0.15)
+            assert abs(forecasts[i] - fitted_model.forecast(1)[0]) < residual_std
+    
+    def test_states_continue_the_batch_forecast(self):
+        """Test that per-series states reproduce the batch forecasts"""
+        values = self._series(2)
+        timestamps = np.arange(values.shape[1]) * 300.0
+        
+        result = BatchHoltWinters(seasonal_periods=50).fit(values)
+        states = result.to_states(timestamps)
+        
+        for i, state in enumerate(states):
+            np.testing.assert_allclose(state.forecast(5), result.forecast(5)[i])
+            assert state.last_timestamp == timestamps[-1]
+    
+    def test_fit_many_uses_batch_engine_for_many_series(self):
+        """Test that fit_many switches to the batch engine above the threshold"""
+        detector = AnomalyDetector(threshold=2.5, min_data_points=100, batch_min_series=2)
+        values = self._series(2)
+        timestamps = np.arange(values.shape[1]) * 300.0
+        series = {f's{i}': TimeSeriesBuffer.from_arrays(timestamps, values[i]) for i in range(2)}
+        series['flat'] = TimeSeriesBuffer.from_arrays(timestamps, np.ones(len(timestamps)))
+        
+        with patch.object(detector, 'fit_holt_winters') as mock_fit:
+            models = detector.fit_many(series, seasonal_periods=50)
+        
+        mock_fit.assert_not_called()
+        assert isinstance(models['s0'], HoltWintersState)
+        assert models['flat'] is None
+    
+    def test_fit_many_keeps_each_series_on_its_own_grid(self):
+        """Test that series with different timestamps are not stacked on one grid"""
+        detector = AnomalyDetector(threshold=2.5, min_data_points=100, batch_min_series=2)
+        values = self._series(3)
+        timestamps = np.arange(values.shape[1]) * 300.0
+        series = {
+            's0': TimeSeriesBuffer.from_arrays(timestamps, values[0]),
+            's1': TimeSeriesBuffer.from_arrays(timestamps, values[1]),
+            # Started later and stopped one scrape earlier
+            'late': TimeSeriesBuffer.from_arrays(timestamps[30:-1], values[2][30:-1])
+        }
+        
+        models = detector.fit_many(series, seasonal_periods=50)
+        
+        assert models['s0'].last_timestamp == timestamps[-1]
+        assert models['late'].last_timestamp == timestamps[-2]
+        alone = BatchHoltWinters(seasonal_periods=50).fit(values[2:3, 30:-1])
+        np.testing.assert_allclose(models['late'].forecast(3), alone.forecast(3)[0])
+
+
+class TestPerSeriesDetection:
+    """Test per-label series detection"""
+    
+    def _history(self, labels, n=200, seed=0):
+        rng = np.random.default_rng(seed)
+        timestamps = np.arange(n) * 300.0
+        return TimeSeriesBuffer.from_arrays(timestamps, 100 + rng.normal(0, 1, n), labels=labels)
+    
+    def test_get_series_range_splits_and_filters_by_labels(self):
+        """Test that grouped results become one buffer per selected label set"""
+        client = PrometheusQueryClient('http://prometheus:9090')
+        raw = [
+            {'metric': {'service_name': 'demo-app', 'http_route': '/a'}, 'values': [[0, '1'], [300, '2']]},
+            {'metric': {'service_name': 'demo-app', 'http_route': '/b'}, 'values': [[0, '3']]},
+        ]
+        selected = [{'service_name': 'demo-app', 'http_route': '/a'}]
+        
+        with patch.object(client, 'query_range', return_value=raw) as mock_query:
+            result = client.get_series_range(
+                'test_metric', datetime.now(), datetime.now(),
+                group_by=['service_name', 'http_route'], series=selected
+            )
+        
+        query = mock_query.call_args.kwargs['query']
+        assert query.startswith('avg by (service_name, http_route) (test_metric{')
+        assert 'http_route=~"/a"' in query
+        assert list(result) == ['{http_route="/a",service_name="demo-app"}']
+        assert result['{http_route="/a",service_name="demo-app"}'].labels['http_route'] == '/a'
+    
+    def test_detect_series_anomalies_flags_only_the_bad_route(self):
+        """Test that one misbehaving route is not averaged away"""
+        detector = AnomalyDetector(threshold=2.5, min_data_points=100)
+        good = self._history({'http_route': '/good'}, seed=1)
+        bad = self._history({'http_route': '/bad'}, seed=2)
+        
+        mock_prom_client = Mock()
+        mock_prom_client.get_series_history.return_value = {good.key: good, bad.key: bad}
+        mock_prom_client.get_current_series_values.return_value = {good.key: 100.2, bad.key: 180.0}
+        
+        results = detector.detect_series_anomalies(
+            mock_prom_client, 'test_metric', group_by=['http_route'], days=7
+        )
+        
+        by_route = {r['labels']['http_route']: r for r in results}
+        assert by_route['/bad']['is_anomaly'] is True
+        assert by_route['/good']['is_anomaly'] is False
+        assert by_route['/bad']['series'] == '{http_route="/bad"}'
+    
+    def test_series_cache_fetches_delta_and_new_selections(self):
+        """Test that cached series get a delta and newly selected ones a full fetch"""
+        cache = MetricHistoryCache(step='5m')
+        now = datetime.now().timestamp()
+        first = TimeSeriesBuffer.from_arrays(
+            np.array([now - 600, now - 300]), np.array([1.0, 2.0]), labels={'http_route': '/a'}
+        )
+        second = TimeSeriesBuffer.from_arrays(
+            np.array([now - 300, now]), np.array([5.0, 6.0]), labels={'http_route': '/b'}
+        )
+        delta = TimeSeriesBuffer.from_arrays(np.array([now]), np.array([3.0]), labels={'http_route': '/a'})
+        
+        mock_prom_client = Mock()
+        mock_prom_client.get_series_history.side_effect = [{first.key: first}, {second.key: second}]
+        mock_prom_client.get_series_range.return_value = {delta.key: delta}
+        
+        cache.get_series_history(
+            mock_prom_client, 'test_metric', ['http_route'], series=[{'http_route': '/a'}]
+        )
+        result = cache.get_series_history(
+            mock_prom_client, 'test_metric', ['http_route'],
+            series=[{'http_route': '/a'}, {'http_route': '/b'}]
+        )
+        
+        np.testing.assert_array_equal(result[first.key].values, [1.0, 2.0, 3.0])
+        np.testing.assert_array_equal(result[second.key].values, [5.0, 6.0])
+        assert mock_prom_client.get_series_history.call_args.kwargs['series'] == [{'http_route': '/b'}]
+    
+    def test_failed_selection_reuses_last_top_series(self):
+        """Test that a failing ranking query falls back to the previous selection"""
+        client = PrometheusQueryClient('http://prometheus:9090')
+        ranked = [{'metric': {'http_route': '/a'}, 'value': [0, '5']}]
+        
+        with patch.object(client, '_instant_query', side_effect=[ranked, ConnectionError('down')]):
+            first = client.get_top_series(['http_route'], limit=10)
+            second = client.get_top_series(['http_route'], limit=10)
+        
+        assert first == second == [{'http_route': '/a'}]
+    
+    def test_missing_selection_caps_the_range_query(self):
+        """Test that without a selection the cap is applied by the query, not after fetching"""
+        detector = AnomalyDetector(threshold=2.5, min_data_points=100)
+        mock_prom_client = Mock()
+        mock_prom_client.get_series_history.return_value = None
+        
+        detector.detect_series_anomalies(
+            mock_prom_client, 'test_metric', group_by=['http_route'], days=7, max_series=20
+        )
+        
+        assert mock_prom_client.get_series_history.call_args.kwargs['limit'] == 20
+        client = PrometheusQueryClient('http://prometheus:9090')
+        with patch.object(client, 'query_range', return_value=[]) as mock_query:
+            client.get_series_history('test_metric', ['http_route'], limit=20)
+        assert mock_query.call_args.kwargs['query'].startswith('topk(20, avg by (http_route)')
+    
+    def test_alert_payload_includes_series_labels(self):
+        """Test that per-series alerts carry their labels"""
+        alert_manager = AlertManager(webhook_url='http://test.com/webhook')
+        anomaly_result = {
+            'metric': 'test_metric',
+            'series': '{http_route="/bad",service_name="checkout"}',
+            'labels': {'http_route': '/bad', 'service_name': 'checkout'},
+            'severity': 'high'
+        }
+        
+        payload = alert_manager.format_alert_payload(anomaly_result)
+        
+        assert payload['tags']['http_route'] == '/bad'
+        assert payload['tags']['service'] == 'checkout'
+        assert '/bad' in payload['title']
+
+
+class TestPooledSession:
+    """Test the shared HTTP connection pool"""
+    
+    def test_session_applies_default_timeout_and_pool_sizes(self):
+        """Test that per-host pools are mounted and timeouts default from config"""
+        session = PooledSession(
+            pool_maxsize=2, connect_timeout=1.0, read_timeout=7.0,
+            pool_sizes={'http://prometheus:9090': 20}
+        )
+        
+        assert session.get_adapter('http://prometheus:9090/api/v1/query')._pool_maxsize == 20
+        assert session.get_adapter('http://grafana:3000/api/alerts')._pool_maxsize == 2
+        
+        with patch('requests.Session.request') as mock_request:
+            session.get('http://prometheus:9090/-/healthy')
+        assert mock_request.call_args.kwargs['timeout'] == (1.0, 7.0)
+    
+    def test_components_share_the_session(self):
+        """Test that queries, health checks and webhooks all use one session"""
+        session = Mock()
+        session.timeout = (1.0, 5.0)
+        session.get.return_value.status_code = 200
+        session.post.return_value.status_code = 200
+        
+        client = PrometheusQueryClient('http://prometheus:9090', session=session)
+        alert_manager = AlertManager(webhook_url='http://test.com/webhook', session=session)
+        
+        assert client.health_check() is True
+        assert session.get.call_args.kwargs['timeout'] == (1.0, 5.0)
+        client._get('/api/v1/query', {'query': 'up'})
+        assert session.get.call_args.kwargs['timeout'] == (1.0, 5.0)
+        assert alert_manager.send_webhook({'title': 'Test Alert'}) is True
+        assert session.post.call_args.kwargs['timeout'] == 10
+    
+    def test_json_client_uses_the_session_retry_policy(self):
+        """Test that prometheus_api_client gets the retries through its constructor"""
+        session = PooledSession(max_retries=7)
+        client = PrometheusQueryClient('http://prometheus:9090', session=session, decoder='json')
+        
+        assert client.client._session is not session
+        assert client.client._session.get_adapter('http://prometheus:9090').max_retries.total == 7
+    
+    def test_reset_leaves_other_pools_of_a_shared_session(self):
+        """Test that only the Prometheus pool of a shared session is reset"""
+        session = PooledSession(pool_sizes={'http://prometheus:9090/': 4, 'http://alerts:8080': 2})
+        client = PrometheusQueryClient('http://prometheus:9090', session=session)
+        
+        with patch.object(session.adapters['http://prometheus:9090/'], 'close') as prometheus_close, \
+                patch.object(session.adapters['http://alerts:8080'], 'close') as alerts_close, \
+                patch.object(session, 'close') as session_close:
+            client.reset_connections()
+        
+        prometheus_close.assert_called_once()
+        alerts_close.assert_not_called()
+        session_close.assert_not_called()
+    
+    def test_reset_closes_an_owned_session(self):
+        """Test that a session the client created itself is closed"""
+        client = PrometheusQueryClient('http://prometheus:9090')
+        
+        with patch.object(client._http, 'close') as close:
+            client.reset_connections()
+        
+        close.assert_called_once()
+
+
+class TestBatchedCurrentValues:
+    """Test batched current-value lookups"""
+    
+    def test_get_current_values_uses_one_query(self):
+        """Test that several metrics are fetched with a single __name__ regex query"""
+        client = PrometheusQueryClient('http://prometheus:9090')
+        raw = [
+            {'metric': {'__name__': 'metric_a', 'http_route': '/a'}, 'value': [0, '1.5']},
+            {'metric': {'__name__': 'metric_b', 'http_route': '/a'}, 'value': [0, '2.5']},
+        ]
+        
+        with patch.object(client, '_instant_query', return_value=raw) as mock_query:
+            values = client.get_current_values(['metric_a', 'metric_b'], group_by=['http_route'])
+        
+        mock_query.assert_called_once()
+        assert mock_query.call_args.args[0] == (
+            'avg by (__name__, http_route) ({__name__=~"metric_a|metric_b"})'
+        )
+        assert values[('metric_b', '{http_route="/a"}')] == 2.5
+    
+    def test_detect_anomaly_uses_batched_value(self):
+        """Test that a batched value avoids the per-metric instant query"""
+        detector = AnomalyDetector(threshold=2.5, min_data_points=100)
+        mock_prom_client = Mock()
+        mock_prom_client.get_metric_history.return_value = [(t, 100.0) for t in range(150)]
+        
+        result = detector.detect_anomaly(
+            mock_prom_client, 'test_metric', days=7,
+            current_values={('test_metric', ''): 150.0}
+        )
+        
+        assert result['actual_value'] == 150.0
+        mock_prom_client.get_current_value.assert_not_called()
+    
+    def test_history_tail_replaces_current_value_query(self):
+        """Test that a fresh history tail is used without a round trip"""
+        detector = AnomalyDetector(threshold=2.5, min_data_points=100, current_value_max_age=600)
+        now = datetime.now().timestamp()
+        mock_prom_client = Mock()
+        mock_prom_client.get_metric_history.return_value = [
+            (now - 300 * i, 100.0 + (i == 0) * 50) for i in range(150, -1, -1)
+        ]
+        
+        result = detector.detect_anomaly(mock_prom_client, 'test_metric', days=7)
+        
+        assert result['actual_value'] == 150.0
+        mock_prom_client.get_current_value.assert_not_called()
+
+
+class TestChunkedRangeQueries:
+    """Test splitting long range queries into concurrent chunks"""
+    
+    @staticmethod
+    def _fake_range(query, start_time, end_time, step):
+        """Answer like Prometheus: one point per step from start to end inclusive"""
+        start, end = round(start_time.timestamp()), round(end_time.timestamp())
+        return [{'metric': {}, 'values': [[t, str(t)] for t in range(start, end + 1, 60)]}]
+    
+    def test_short_range_uses_single_query(self):
+        """Test that ranges within the chunk size are not split"""
+        client = PrometheusQueryClient('http://prometheus:9090', chunk_points=100)
+        end_time = datetime(2024, 1, 1, 12, 0)
+        
+        with patch.object(client, '_fetch_range', side_effect=self._fake_range) as mock_query:
+            client.query_range('up', end_time - timedelta(minutes=50), end_time, step='1m')
+        
+        mock_query.assert_called_once()
+    
+    def test_long_range_is_chunked_and_stitched(self):
+        """Test that chunks stay below the limit and stitch to the single-query grid"""
+        client = PrometheusQueryClient('http://prometheus:9090', chunk_points=100, chunk_workers=3)
+        end_time = datetime(2024, 1, 1, 12, 0)
+        start_time = end_time - timedelta(minutes=1000)
+        
+        with patch.object(client, '_fetch_range', side_effect=self._fake_range) as mock_query:
+            result = client.query_range('up', start_time, end_time, step='1m')
+        
+        assert mock_query.call_count == 11
+        for call in mock_query.call_args_list:
+            span = call.args[2] - call.args[1]
+            assert span <= timedelta(minutes=99)
+        
+        expected = self._fake_range('up', start_time, end_time, '1m')[0]['values']
+        assert len(result) == 1
+        assert result[0]['values'] == expected
+    
+    def test_overlapping_chunks_are_deduplicated(self):
+        """Test that points repeated at chunk boundaries are kept once per series"""
+        from prometheus_client import _stitch_chunks
+        
+        chunks = [
+            [{'metric': {'route': '/a'}, 'values': [[0, '1'], [60, '2']]}],
+            [{'metric': {'route': '/a'}, 'values': [[60, '2'], [120, '3']]},
+             {'metric': {'route': '/b'}, 'values': [[120, '9']]}],
+        ]
+        
+        result = _stitch_chunks(chunks)
+        
+        assert result[0]['values'] == [[0, '1'], [60, '2'], [120, '3']]
+        assert result[1] == {'metric': {'route': '/b'}, 'values': [[120, '9']]}
+
+
+class TestMatrixDecoder:
+    """Test streaming decode of query_range responses into arrays"""
+    
+    BODY = (
+        b'{"status":"success","data":{"resultType":"matrix","result":['
+        b'{"metric":{"http_route":"/a"},"values":[[1700000000,"1.5"],[1700000300.5,"NaN"]]},'
+        b'{"metric":{"http_route":"/b"},"values":[]},'
+        b'{"metric":{"http_route":"/c"},"values":[[1700000000,"oops"]]}'
+        b']}}'
+    )
+    
+    def test_decodes_series_fed_in_small_chunks(self):
+        """Test that series split across network chunks decode into arrays"""
+        decoder = MatrixDecoder()
+        for i in range(0, len(self.BODY), 7):
+            decoder.feed(self.BODY[i:i + 7])
+        
+        result = decoder.close()
+        
+        assert [item['metric'] for item in result] == [{'http_route': '/a'}, {'http_route': '/b'}]
+        assert result[0]['values'].shape == (2, 2)
+        assert result[0]['values'][1, 0] == 1700000300.5
+        assert np.isnan(result[0]['values'][1, 1])
+        assert result[1]['values'].shape == (0, 2)
+        assert decoder.invalid == 1
+    
+    def test_skips_keys_after_the_values(self):
+        """Test that extra keys such as native-histogram 'histograms' do not break decoding"""
+        body = (
+            b'{"status":"success","data":{"resultType":"matrix","result":['
+            b'{"metric":{},"values":[[1,"1"]],"histograms":[]},'
+            b'{"metric":{"le":"a}\\"b"},"histograms":[[2,{"count":"3","buckets":[[0,"1","2","3"]]}]]},'
+            b'{"metric":{"http_route":"/a"},"values":[[3,"4"]]}'
+            b']}}'
+        )
+        for size in (len(body), 5):
+            decoder = MatrixDecoder()
+            for i in range(0, len(body), size):
+                decoder.feed(body[i:i + size])
+            
+            result = decoder.close()
+            
+            assert [item['metric'] for item in result] == [{}, {'le': 'a}"b'}, {'http_route': '/a'}]
+            assert result[0]['values'].tolist() == [[1.0, 1.0]]
+            assert result[1]['values'].shape == (0, 2)
+            assert result[2]['values'].tolist() == [[3.0, 4.0]]
+    
+    def test_rejects_truncated_and_non_matrix_responses(self):
+        """Test that incomplete bodies and other result types raise"""
+        decoder = MatrixDecoder()
+        decoder.feed(self.BODY[:80])
+        with pytest.raises(ValueError):
+            decoder.close()
+        
+        with pytest.raises(ValueError):
+            MatrixDecoder().feed(b'{"status":"success","data":{"resultType":"vector","result":[]}}')
+    
+    def test_metric_range_streams_response_into_buffer(self):
+        """Test that get_metric_range reads the body through the decoder"""
+        session = Mock()
+        response = session.get.return_value
+        response.status_code = 200
+        response.iter_content.return_value = [self.BODY[:50], self.BODY[50:]]
+        client = PrometheusQueryClient('http://prometheus:9090', session=session)
+        end_time = datetime.now()
+        
+        buffer = client.get_metric_range('test_metric', end_time - timedelta(hours=1), end_time)
+        
+        assert session.get.call_args.kwargs['stream'] is True
+        assert session.get.call_args.kwargs['params']['query'] == 'avg(test_metric)'
+        assert list(buffer.timestamps) == [1700000000, 1700000300.5]
+        response.close.assert_called_once()
+
+
+class TestCheckpointStore:
+    """Test warm restarts from on-disk checkpoints"""
+    
+    def _warm_cache(self):
+        now = datetime.now().timestamp()
+        history = TimeSeriesBuffer.from_arrays(
+            now - 300 * np.arange(200, 0, -1), np.arange(200, dtype=float)
+        )
+        mock_prom_client = Mock()
+        mock_prom_client.get_metric_history.return_value = history
+        cache = MetricHistoryCache()
+        cache.get_history(mock_prom_client, 'test_metric', days=1)
+        return cache, history
+    
+    def test_restored_cache_fetches_only_the_gap(self, tmp_path):
+        """Test that a restored window is extended with a delta query"""
+        cache, history = self._warm_cache()
+        CheckpointStore(str(tmp_path)).save(history_cache=cache)
+        
+        restored = MetricHistoryCache()
+        assert CheckpointStore(str(tmp_path)).load(history_cache=restored) is True
+        mock_prom_client = Mock()
+        mock_prom_client.get_metric_range.return_value = None
+        
+        buffer = restored.get_history(mock_prom_client, 'test_metric', days=1)
+        
+        mock_prom_client.get_metric_history.assert_not_called()
+        mock_prom_client.get_metric_range.assert_called_once()
+        np.testing.assert_array_equal(buffer.values, history.values[-len(buffer):])
+    
+    def test_restored_model_continues_the_forecast(self, tmp_path):
+        """Test that a saved state, including its seasonal position, round-trips"""
+        state = HoltWintersState(
+            alpha=0.3, beta=0.1, gamma=0.2, level=10.0, trend=0.5,
+            season=np.arange(4, dtype=float), residual_std=1.5,
+            last_timestamp=1000.0, step_seconds=300.0
+        )
+        state.update_many(np.array([1300.0, 1600.0]), np.array([12.0, 9.0]))
+        registry = ModelRegistry()
+        registry.put('test_metric', state, '{route="/a"}')
+        CheckpointStore(str(tmp_path)).save(model_registry=registry)
+        
+        restored = ModelRegistry()
+        CheckpointStore(str(tmp_path)).load(model_registry=restored)
+        loaded = restored.get('test_metric', '{route="/a"}')
+        
+        np.testing.assert_allclose(loaded.forecast(6), state.forecast(6))
+        assert loaded.fitted_at == state.fitted_at
+        assert loaded.updates == 2
+    
+    def test_evicted_windows_are_removed_from_disk(self, tmp_path):
+        """Test that files of windows no longer cached are deleted"""
+        cache, _ = self._warm_cache()
+        store = CheckpointStore(str(tmp_path))
+        store.save(history_cache=cache)
+        assert len(list((tmp_path / 'series').iterdir())) == 1
+        
+        cache.invalidate('test_metric')
+        store.save(history_cache=cache)
+        
+        assert list((tmp_path / 'series').iterdir()) == []
+    
+    def test_interrupted_save_keeps_previous_checkpoint(self, tmp_path):
+        """Test that data files of a save that never wrote its manifest are not loaded"""
+        cache, history = self._warm_cache()
+        CheckpointStore(str(tmp_path)).save(history_cache=cache)
+        
+        cache.invalidate('test_metric')
+        mock_prom_client = Mock()
+        mock_prom_client.get_metric_history.return_value = TimeSeriesBuffer.from_arrays(
+            history.timestamps, 2 * history.values
+        )
+        cache.get_history(mock_prom_client, 'test_metric', days=1)
+        with patch('checkpoint_store.json.dump', side_effect=OSError('disk full')):
+            assert CheckpointStore(str(tmp_path)).save(history_cache=cache) is False
+        
+        restored = MetricHistoryCache()
+        CheckpointStore(str(tmp_path)).load(history_cache=restored)
+        windows, _ = restored.export()
+        
+        np.testing.assert_array_equal(next(iter(windows.values())).values, history.values)
+    
+    def test_each_save_writes_a_new_generation(self, tmp_path):
+        """Test that a save never overwrites files the current manifest references"""
+        cache, _ = self._warm_cache()
+        store = CheckpointStore(str(tmp_path))
+        store.save(history_cache=cache)
+        first = {path.name for path in (tmp_path / 'series').iterdir()}
+        
+        windows, _ = cache.export()
+        buffer = next(iter(windows.values()))
+        buffer.append(buffer.last_timestamp + 300, 1.0)
+        CheckpointStore(str(tmp_path)).save(history_cache=cache)
+        second = {path.name for path in (tmp_path / 'series').iterdir()}
+        
+        assert len(second) == 1 and first.isdisjoint(second)
+    
+    def test_unchanged_entries_keep_their_files(self, tmp_path):
+        """Test that only changed entries are rewritten, after a restart too"""
+        cache, _ = self._warm_cache()
+        state = HoltWintersState(
+            alpha=0.3, beta=0.1, gamma=0.2, level=10.0, trend=0.5,
+            season=np.arange(4, dtype=float), residual_std=1.5,
+            last_timestamp=1000.0, step_seconds=300.0
+        )
+        registry = ModelRegistry()
+        registry.put('test_metric', state)
+        CheckpointStore(str(tmp_path)).save(history_cache=cache, model_registry=registry)
+        models = {path.name for path in (tmp_path / 'models').iterdir()}
+        series = {path.name for path in (tmp_path / 'series').iterdir()}
+        
+        windows, _ = cache.export()
+        buffer = next(iter(windows.values()))
+        buffer.append(buffer.last_timestamp + 300, 1.0)
+        store = CheckpointStore(str(tmp_path))
+        with patch.object(CheckpointStore, '_fsync_directory', wraps=store._fsync_directory) as fsync:
+            assert store.save(history_cache=cache, model_registry=registry) is True
+        
+        assert {path.name for path in (tmp_path / 'models').iterdir()} == models
+        assert {path.name for path in (tmp_path / 'series').iterdir()}.isdisjoint(series)
+        assert [c.args[0] for c in fsync.call_args_list] == [
+            str(tmp_path / 'series'), str(tmp_path / 'models'), str(tmp_path)
+        ]
+        restored_cache, restored_registry = MetricHistoryCache(), ModelRegistry()
+        CheckpointStore(str(tmp_path)).load(history_cache=restored_cache, model_registry=restored_registry)
+        restored, _ = restored_cache.export()
+        np.testing.assert_array_equal(next(iter(restored.values())).values, buffer.values)
+        np.testing.assert_allclose(restored_registry.get('test_metric').forecast(4), state.forecast(4))
+
+
+class TestForecastTable:
+    """Test precomputed forecasts and the fast-path check"""
+    
+    def _state(self):
+        return HoltWintersState(
+            alpha=0.3, beta=0.1, gamma=0.2, level=100.0, trend=0.0,
+            season=np.zeros(4), residual_std=2.0,
+            last_timestamp=1000.0, step_seconds=300.0
+        )
+    
+    def test_table_matches_model_forecast_and_widens(self):
+        """Test forecasts, interval growth and timestamp lookup"""
+        state = self._state()
+        table = ForecastTable.from_model(state, 1000.0, 300.0, horizon=6)
+        
+        np.testing.assert_allclose(table.forecasts, state.forecast(6))
+        assert table.sigmas[0] == 2.0
+        assert np.all(np.diff(table.sigmas) > 0)
+        assert table.interval(2.5) == (95.0, 105.0)
+        assert table.index(1100.0) == 0
+        assert table.index(1000.0 + 3 * 300) == 2
+        assert table.index(1000.0 + 7 * 300) is None
+    
+    def test_fast_check_scores_values_with_lookup(self):
+        """Test that fast_check uses the table built during detection"""
+        detector = AnomalyDetector(threshold=2.5, min_data_points=100)
+        detector.update_forecast_table('test_metric', self._state(), TimeSeriesBuffer(1))
+        
+        results = detector.fast_check(
+            {('test_metric', ''): 120.0, ('other_metric', ''): 1.0},
+            now=1000.0 + 300
+        )
+        
+        assert len(results) == 1
+        assert results[0]['method'] == 'fast_path'
+        assert results[0]['expected_value'] == 100.0
+        assert results[0]['deviation_std'] == 10.0
+        assert results[0]['is_anomaly'] is True
+        assert detector.fast_check({('test_metric', ''): 120.0}, now=1000.0 + 300 * 20) == []
+    
+    def test_detect_anomaly_precomputes_table(self):
+        """Test that a full detection leaves a table whose first row it scored against"""
+        detector = AnomalyDetector(threshold=2.5, min_data_points=100, forecast_horizon=5)
+        mock_prom_client = Mock()
+        mock_prom_client.get_metric_history.return_value = [
+            (300 * t, 50 + 10 * np.sin(2 * np.pi * t / 24) + 0.1 * (t % 3)) for t in range(240)
+        ]
+        
+        result = detector.detect_anomaly(
+            mock_prom_client, 'test_metric', days=7, current_values={('test_metric', ''): 60.0}
+        )
+        
+        table = detector.forecast_tables[('test_metric', '')]
+        assert table.horizon == 5
+        assert table.last_timestamp == 300 * 239
+        assert result['expected_value'] == pytest.approx(table.forecasts[0])
+
+
+class TestBackfillScoring:
+    """Test scoring of every point since the previous cycle"""
+    
+    def test_score_points_finds_worst_point_and_intervals(self):
+        """Test vectorized scoring of a batch of residuals"""
+        detector = AnomalyDetector(threshold=2.5, min_data_points=100)
+        timestamps = 300.0 * np.arange(8)
+        residuals = np.array([0.1, 3.0, 4.0, 0.2, -0.1, -6.0, 0.0, 0.3])
+        
+        backfill = detector.score_points(timestamps, residuals + 10, residuals, residual_std=1.0)
+        
+        assert backfill['points'] == 8
+        assert backfill['anomalous_points'] == 3
+        assert [i['points'] for i in backfill['intervals']] == [2, 1]
+        assert backfill['intervals'][0]['max_deviation_std'] == 4.0
+        assert backfill['worst']['deviation_std'] == 6.0
+        assert backfill['worst']['expected_value'] == 10.0
+    
+    def test_short_spike_between_cycles_is_flagged(self):
+        """Test that a spike that is over by the next cycle is still reported"""
+        detector = AnomalyDetector(threshold=2.5, min_data_points=100, model_registry=ModelRegistry())
+        rng = np.random.default_rng(0)
+        t = np.arange(600)
+        values = 50 + 10 * np.sin(2 * np.pi * t / 48) + rng.normal(0, 0.5, len(t))
+        values[590:592] += 30
+        mock_prom_client = Mock()
+        
+        mock_prom_client.get_metric_history.return_value = list(zip(300.0 * t[:580], values[:580]))
+        first = detector.detect_anomaly(
+            mock_prom_client, 'test_metric', current_values={('test_metric', ''): values[579]}
+        )
+        mock_prom_client.get_metric_history.return_value = list(zip(300.0 * t, values))
+        second = detector.detect_anomaly(
+            mock_prom_client, 'test_metric', current_values={('test_metric', ''): values[-1]}
+        )
+        
+        assert 'backfill' not in first
+        assert second['backfill']['points'] == 20
+        spike = [
+            i for i in second['backfill']['intervals']
+            if i['start'] == datetime.fromtimestamp(300.0 * 590).isoformat()
+        ]
+        assert spike and spike[0]['points'] == 2
+        assert second['backfill']['worst']['deviation_std'] > 10
+        assert second['is_anomaly'] is True
+    
+    def test_alert_lists_backfilled_intervals(self):
+        """Test that the alert message describes anomalies between cycles"""
+        alert_manager = AlertManager(webhook_url='http://test.com/webhook')
+        result = {
+            'metric': 'test_metric', 'severity': 'high', 'is_anomaly': True,
+            'backfill': {
+                'points': 5, 'anomalous_points': 2,
+                'worst': {'timestamp': 't1', 'actual_value': 90.0,
+                          'expected_value': 50.0, 'deviation_std': 5.0},
+                'intervals': [{'start': 't0', 'end': 't1', 'points': 2, 'max_deviation_std': 5.0}]
+            }
+        }
+        
+        payload = alert_manager.format_alert_payload(result)
+        
+        assert 't0 to t1 (2 points)' in payload['message']
+        assert payload['annotations']['anomalous_intervals'] == '1'
+
+
+class TestCascadedDetection:
+    """Test cheap screening before Holt-Winters"""
+    
+    def _histories(self):
+        rng = np.random.default_rng(1)
+        timestamps = 300.0 * np.arange(200)
+        return {
+            f'{{route="/{i}"}}': TimeSeriesBuffer.from_arrays(
+                timestamps, 100 + rng.normal(0, 1, 200), labels={'route': f'/{i}'}
+            )
+            for i in range(5)
+        }
+    
+    def test_screen_scores_all_series_at_once(self):
+        """Test robust z-scores of the current values"""
+        detector = AnomalyDetector(threshold=2.5, screen_threshold=1.5)
+        histories = self._histories()
+        latest = {key: 100.0 for key in histories}
+        latest['{route="/3"}'] = 150.0
+        
+        screened = detector.screen(histories, latest)
+        
+        assert set(screened) == set(histories)
+        assert screened['{route="/3"}'][2] > 20
+        assert screened['{route="/0"}'][2] < 1.5
+        assert screened['{route="/3"}'][0] == pytest.approx(100, abs=0.5)
+    
+    def test_only_suspicious_series_reach_holt_winters(self):
+        """Test that quiet series are scored by the screen and counted"""
+        detector = AnomalyDetector(threshold=2.5, min_data_points=100, screen_threshold=1.5)
+        histories = self._histories()
+        current_values = {('test_metric', key): 100.0 for key in histories}
+        current_values[('test_metric', '{route="/3"}')] = 150.0
+        mock_prom_client = Mock()
+        mock_prom_client.get_series_history.return_value = histories
+        
+        with patch.object(detector, 'get_models', return_value={'{route="/3"}': None}) as mock_models:
+            results = detector.detect_series_anomalies(
+                mock_prom_client, 'test_metric', ['route'], current_values=current_values
+            )
+        
+        assert list(mock_models.call_args.args[1]) == ['{route="/3"}']
+        methods = {r['series']: r.get('method') for r in results}
+        assert methods['{route="/0"}'] == 'screen'
+        assert methods['{route="/3"}'] == 'fallback'
+        assert detector.tier_counts == {'screened': 4, 'holt_winters': 0, 'fallback': 1}
+        assert not any(r['is_anomaly'] for r in results if r['series'] != '{route="/3"}')
+    
+    def test_quiet_metric_skips_model(self):
+        """Test that detect_anomaly returns the screen result without fitting"""
+        detector = AnomalyDetector(threshold=2.5, min_data_points=100, screen_threshold=1.5)
+        mock_prom_client = Mock()
+        mock_prom_client.get_metric_history.return_value = self._histories()['{route="/0"}']
+        
+        with patch.object(detector, 'get_model') as mock_get_model:
+            result = detector.detect_anomaly(
+                mock_prom_client, 'test_metric', current_values={('test_metric', ''): 100.0}
+            )
+        
+        mock_get_model.assert_not_called()
+        assert result['method'] == 'screen'
+        assert result['is_anomaly'] is False
+        assert detector.tier_counts['screened'] == 1
+    
+    def test_screen_above_anomaly_threshold_never_alerts(self):
+        """Test that a screened series is not anomalous when the screen is looser than the threshold"""
+        detector = AnomalyDetector(threshold=2.5, min_data_points=100, screen_threshold=4.0)
+        history = self._histories()['{route="/0"}']
+        median = float(np.median(history.values))
+        mad = float(np.median(np.abs(history.values - median))) * 1.4826
+        mock_prom_client = Mock()
+        mock_prom_client.get_metric_history.return_value = history
+        
+        with patch.object(detector, 'get_model') as mock_get_model:
+            result = detector.detect_anomaly(
+                mock_prom_client, 'test_metric', current_values={('test_metric', ''): median + 3.5 * mad}
+            )
+        
+        mock_get_model.assert_not_called()
+        assert result['method'] == 'screen'
+        assert result['is_anomaly'] is False
+        assert result['deviation_std'] > detector.threshold
+
+
+class TestSharedMemoryFitting:
+    """Test process-pool fitting over shared memory"""
+    
+    def test_rows_are_mapped_without_copy(self):
+        """Test that a row spec maps the stored values"""
+        rows = [np.arange(5, dtype=float), np.arange(3, dtype=float) * 2]
+        
+        with SharedArray(rows) as shared:
+            spec = shared.spec(1)
+            with attach_row(spec) as row:
+                np.testing.assert_array_equal(row, [0.0, 2.0, 4.0])
+                assert not row.flags.writeable
+        
+        assert spec[1] == (2, 5)
+    
+    def test_pool_fits_match_in_process_fits(self):
+        """Test that compact results from workers rebuild the same models"""
+        t = np.arange(240)
+        series = {
+            f'{{route="/{i}"}}': TimeSeriesBuffer.from_arrays(
+                300.0 * t, 50 + 10 * np.sin(2 * np.pi * t / 24) + 0.3 * np.cos(t * (i + 1))
+            )
+            for i in range(3)
+        }
+        series['{route="/flat"}'] = TimeSeriesBuffer.from_arrays(300.0 * t, np.ones(240))
+        executors = StageExecutors(io_workers=1, fit_workers=2, alert_workers=1)
+        pooled = AnomalyDetector(threshold=2.5, fit_executor=executors.fit)
+        
+        try:
+            models = pooled.fit_many(series, seasonal_periods=24)
+        finally:
+            executors.shutdown()
+        
+        local = AnomalyDetector(threshold=2.5).fit_many(series, seasonal_periods=24)
+        assert models['{route="/flat"}'] is None
+        for key in ['{route="/0"}', '{route="/1"}', '{route="/2"}']:
+            np.testing.assert_allclose(models[key].forecast(3), local[key].forecast(3))
+            assert models[key].last_timestamp == 300.0 * 239
+    
+    def test_auto_workers_follow_available_cpus(self):
+        """Test that 'auto' sizes the pool from the CPU allowance"""
+        executors = StageExecutors(io_workers=1, fit_workers='auto', alert_workers=1)
+        try:
+            assert executors.fit._max_workers == available_cpus()
+        finally:
+            executors.shutdown()
+
+
+class TestStartupBudget:
+    """Test lazy loading of heavy dependencies"""
+    
+    def test_startup_skips_heavy_modules(self):
+        """Test that importing and building the service skips heavy modules"""
+        result = startup_benchmark.measure()
+        
+        assert result['heavy_modules'] == []
+    
+    @pytest.mark.skipif(
+        not os.getenv('RUN_STARTUP_BENCHMARK'),
+        reason="Timing budget depends on the machine; set RUN_STARTUP_BENCHMARK=1 to check it"
+    )
+    def test_startup_stays_within_budget(self):
+        """Test the startup time and memory against the budget"""
+        assert startup_benchmark.check_budget(startup_benchmark.measure()) == []
+    
+    def test_budget_violations_are_reported(self):
+        """Test that slow, large or heavy startups are flagged"""
+        result = {
+            'seconds': startup_benchmark.STARTUP_TIME_BUDGET_SECONDS + 1,
+            'peak_rss_mb': startup_benchmark.STARTUP_RSS_BUDGET_MB + 1,
+            'heavy_modules': ['pandas']
+        }
+        
+        assert len(startup_benchmark.check_budget(result)) == 3
+    
+    def test_statsmodels_is_loaded_on_first_fit(self):
+        """Test that fitting still works once statsmodels is imported lazily"""
+        detector = AnomalyDetector(threshold=2.5)
+        t = np.arange(240)
+        
+        model = detector.fit_holt_winters(
+            TimeSeriesBuffer.from_arrays(300.0 * t, 50 + 10 * np.sin(2 * np.pi * t / 24)),
+            seasonal_periods=24
+        )
+        
+        assert model is not None
+        assert len(model.forecast(steps=3)) == 3
+
+
+class TestTimeBudgetedFitting:
+    """Test per-series and per-cycle fit time budgets"""
+    
+    def _series(self, n=240):
+        t = np.arange(n)
+        return TimeSeriesBuffer.from_arrays(
+            300.0 * t, 50 + 10 * np.sin(2 * np.pi * t / 24) + 0.3 * np.cos(t)
+        )
+    
+    def test_spent_budget_keeps_last_good_model(self):
+        """Test that a due refit is skipped once the cycle budget is spent"""
+        registry = ModelRegistry(refit_interval_seconds=0)
+        detector = AnomalyDetector(threshold=2.5, model_registry=registry)
+        series = self._series()
+        state = HoltWintersState.from_fitted(
+            detector.fit_holt_winters(series, seasonal_periods=24), series.timestamps
+        )
+        registry.put('test_metric', state)
+        
+        detector.start_cycle(budget_seconds=1e-9)
+        model = detector.get_model('test_metric', series)
+        
+        assert model is state
+        assert detector.finish_cycle() == [{
+            'metric': 'test_metric', 'series': '', 'refit_reason': 'age',
+            'cause': 'deadline', 'used': 'last_good'
+        }]
+        detector.start_cycle()
+        assert detector.degraded == []
+    
+    def test_spent_budget_without_model_uses_fallback(self):
+        """Test that a series with no model falls back to the statistical method"""
+        detector = AnomalyDetector(threshold=2.5, model_registry=ModelRegistry())
+        mock_prom_client = Mock()
+        mock_prom_client.get_metric_history.return_value = self._series()
+        mock_prom_client.get_current_value.return_value = 55.0
+        
+        detector.start_cycle(budget_seconds=1e-9)
+        with patch('anomaly_detector._fit_values') as mock_fit:
+            result = detector.detect_anomaly(mock_prom_client, 'test_metric')
+        
+        mock_fit.assert_not_called()
+        assert result['method'] == 'fallback'
+        assert detector.degraded[0]['used'] == 'fallback'
+    
+    def test_pooled_fits_are_abandoned_after_timeout(self):
+        """Test that fits not back within fit_timeout degrade their series"""
+        from concurrent.futures import Future
+        executor = Mock()
+        executor.submit.side_effect = lambda *args: Future()
+        detector = AnomalyDetector(
+            threshold=2.5, fit_executor=executor, model_registry=ModelRegistry(), fit_timeout=0.01
+        )
+        histories = {'{route="/a"}': self._series(), '{route="/b"}': self._series()}
+        
+        models = detector.get_models('test_metric', histories)
+        
+        assert models == {'{route="/a"}': None, '{route="/b"}': None}
+        assert [d['cause'] for d in detector.degraded] == ['timeout', 'timeout']
+        # Workers stop abandoned fits themselves after the same limit
+        assert all(call.args[-1] == 0.01 for call in executor.submit.call_args_list)
+    
+    def test_sequential_fits_are_abandoned_after_timeout(self):
+        """Test that fit_timeout also stops fits running in-process"""
+        detector = AnomalyDetector(threshold=2.5, model_registry=ModelRegistry(), fit_timeout=1e-6)
+        histories = {'{route="/a"}': self._series(), '{route="/b"}': self._series()}
+        
+        models = detector.get_models('test_metric', histories)
+        
+        assert models == {'{route="/a"}': None, '{route="/b"}': None}
+        assert [d['cause'] for d in detector.degraded] == ['timeout', 'timeout']
+    
+    def test_fit_stops_once_time_limit_passes(self):
+        """Test that the optimiser is interrupted rather than run to completion"""
+        from anomaly_detector import FitTimeout, _fit_values
+        
+        with pytest.raises(FitTimeout):
+            _fit_values(self._series().values, 24, time_limit=1e-6)
+        with pytest.raises(FitTimeout):
+            _fit_values(self._series().values, 24, time_limit=0.0)
+    
+    def test_spent_budget_submits_no_pooled_fits(self):
+        """Test that nothing is left running on the pool once the budget is spent"""
+        executor = Mock()
+        detector = AnomalyDetector(
+            threshold=2.5, fit_executor=executor, model_registry=ModelRegistry(), fit_timeout=10
+        )
+        detector.start_cycle(budget_seconds=1e-9)
+        time.sleep(0.01)
+        
+        assert detector.fit_holt_winters(self._series()) is None
+        models, skipped = detector._fit_in_pool({'{route="/a"}': self._series()}, 24)
+        
+        executor.submit.assert_not_called()
+        assert skipped == ['{route="/a"}']
+    
+    def test_optimiser_iterations_are_capped(self):
+        """Test that fit_max_iterations reaches the optimiser"""
+        detector = AnomalyDetector(threshold=2.5, fit_max_iterations=3)
+        
+        fitted_model = detector.fit_holt_winters(self._series(), seasonal_periods=24)
+        
+        assert fitted_model.mle_retvals.nit <= 3
+
+
+class TestMultiResolutionFitting:
+    """Test fitting on downsampled history with a full-resolution residual window"""
+    
+    def _hourly(self, end, days=30):
+        timestamps = end - 3600.0 * np.arange(days * 24)[::-1]
+        rng = np.random.default_rng(2)
+        values = 100 + 20 * np.sin(2 * np.pi * timestamps / 86400) + rng.normal(0, 1, len(timestamps))
+        return TimeSeriesBuffer.from_arrays(timestamps, values)
+    
+    def _fine(self, end):
+        timestamps = end - 300.0 * np.arange(288)[::-1]
+        rng = np.random.default_rng(3)
+        values = 100 + 20 * np.sin(2 * np.pi * timestamps / 86400) + rng.normal(0, 2, 288)
+        return TimeSeriesBuffer.from_arrays(timestamps, values)
+    
+    def test_coarse_predictions_cover_fitted_and_future_buckets(self):
+        """Test that points map to the in-sample prediction or the forecast of their bucket"""
+        from anomaly_detector import _fit_values
+        hourly = self._hourly(3600.0 * 1000)
+        fit = CoarseFit.from_fitted(_fit_values(hourly.values, 24), hourly.timestamps)
+        
+        predictions = fit.predict([3600.0 * 999 + 60, 3600.0 * 1000, 3600.0 * 1000 + 60])
+        
+        assert predictions[0] == pytest.approx(fit.fitted[-1])
+        assert predictions[1] == pytest.approx(fit.fitted[-1])
+        assert predictions[2] == pytest.approx(fit.state.forecast(1)[0])
+    
+    def test_detection_refits_once_per_bucket(self):
+        """Test that the downsampled query and fit run only for a new bucket"""
+        now = datetime.now().timestamp()
+        hour = now // 3600 * 3600
+        detector = AnomalyDetector(threshold=3.0, multi_resolution=MultiResolutionStore())
+        mock_prom_client = Mock()
+        mock_prom_client.get_downsampled_history.return_value = {'': self._hourly(hour)}
+        mock_prom_client.get_metric_history.return_value = self._fine(now)
+        mock_prom_client.get_current_value.return_value = 100 + 20 * np.sin(2 * np.pi * now / 86400)
+        
+        first = detector.detect_anomaly(mock_prom_client, 'test_metric', days=1)
+        second = detector.detect_anomaly(mock_prom_client, 'test_metric', days=1)
+        
+        assert mock_prom_client.get_downsampled_history.call_count == 1
+        assert 'method' not in first
+        assert not first['is_anomaly'] and not second['is_anomaly']
+        assert isinstance(detector.forecast_tables[('test_metric', '')], ForecastTable)
+    
+    def test_spike_scored_against_fine_residuals(self):
+        """Test that a spike is flagged using the full-resolution residual spread"""
+        now = datetime.now().timestamp()
+        detector = AnomalyDetector(threshold=3.0, multi_resolution=MultiResolutionStore())
+        mock_prom_client = Mock()
+        mock_prom_client.get_downsampled_history.return_value = {'': self._hourly(now // 3600 * 3600)}
+        mock_prom_client.get_metric_history.return_value = self._fine(now)
+        mock_prom_client.get_current_value.return_value = 200.0
+        
+        result = detector.detect_anomaly(mock_prom_client, 'test_metric', days=1)
+        
+        assert result['is_anomaly']
+        assert result['deviation_std'] > 10
+    
+    def test_short_downsampled_history_uses_fallback(self):
+        """Test that the season is not shortened when buckets are missing"""
+        now = datetime.now().timestamp()
+        detector = AnomalyDetector(threshold=3.0, multi_resolution=MultiResolutionStore())
+        mock_prom_client = Mock()
+        mock_prom_client.get_downsampled_history.return_value = {'': self._hourly(now // 3600 * 3600, days=1)}
+        mock_prom_client.get_metric_history.return_value = self._fine(now)
+        mock_prom_client.get_current_value.return_value = 100.0
+        
+        result = detector.detect_anomaly(mock_prom_client, 'test_metric', days=1)
+        
+        assert result['method'] == 'fallback'
+    
+    def test_failed_coarse_fit_backs_off(self):
+        """Test that a failed fit is not refetched every cycle and retried later"""
+        now = datetime.now().timestamp()
+        detector = AnomalyDetector(threshold=3.0, multi_resolution=MultiResolutionStore())
+        mock_prom_client = Mock()
+        mock_prom_client.get_downsampled_history.return_value = {'': self._hourly(now // 3600 * 3600, days=1)}
+        mock_prom_client.get_metric_history.return_value = self._fine(now)
+        mock_prom_client.get_current_value.return_value = 100.0
+        
+        detector.detect_anomaly(mock_prom_client, 'test_metric', days=1)
+        second = detector.detect_anomaly(mock_prom_client, 'test_metric', days=1)
+        
+        assert mock_prom_client.get_downsampled_history.call_count == 1
+        assert second['method'] == 'fallback'
+        store = detector.multi_resolution
+        assert store.stale_keys('test_metric', [''], now=now + 3601) == ['']
+        assert store.failed('test_metric', '', now=now) == 7200
+    
+    def test_downsampled_query_is_grouped_and_aligned(self):
+        """Test the avg_over_time query and its whole-bucket range"""
+        client = PrometheusQueryClient('http://prometheus:9090')
+        
+        with patch.object(client, 'query_range', return_value=[{
+            'metric': {'route': '/a'}, 'values': [[7200, '1.5'], [10800, '2.5']]
+        }]) as mock_range:
+            result = client.get_downsampled_history(
+                'm', days=2, step='1h', group_by=['route'], series=[{'route': '/a'}]
+            )
+        
+        kwargs = mock_range.call_args.kwargs
+        assert kwargs['query'] == 'avg by (route) (avg_over_time(m{route=~"/a"}[1h]))'
+        assert kwargs['end_time'].timestamp() % 3600 == 0
+        assert (kwargs['end_time'] - kwargs['start_time']).total_seconds() == 2 * 86400
+        np.testing.assert_array_equal(result['{route="/a"}'].values, [1.5, 2.5])
+
+
+class TestFourierRegression:
+    """Test the multi-seasonal Fourier regression engine"""
+    
+    def _pattern(self, timestamps):
+        daily = 20 * np.sin(2 * np.pi * timestamps / 86400)
+        # Busier first day of each week
+        weekly = 15 * (np.mod(timestamps, 604800) < 86400)
+        return 100 + daily + weekly
+    
+    def _series(self, days=14, noise=1.0, seed=0):
+        timestamps = 1_700_000_400.0 + 300.0 * np.arange(days * 288)
+        rng = np.random.default_rng(seed)
+        return TimeSeriesBuffer.from_arrays(
+            timestamps, self._pattern(timestamps) + rng.normal(0, noise, len(timestamps))
+        )
+    
+    def test_daily_and_weekly_cycles_are_captured(self):
+        """Test that forecasts follow both seasons across the week boundary"""
+        series = self._series()
+        model = FourierRegression(seasons=[(86400, 6), (604800, 12)]).fit_many({'': series})['']
+        
+        future = series.last_timestamp + 300.0 * np.arange(1, 289)
+        
+        assert isinstance(model, FourierModel)
+        assert model.residual_std < 3.0
+        assert np.abs(model.forecast(288) - self._pattern(future)).mean() < 3.0
+    
+    def test_batched_fit_matches_single_fits(self):
+        """Test that one least squares call for many series gives per-series results"""
+        engine = FourierRegression()
+        series = {f'{{route="/{i}"}}': self._series(seed=i) for i in range(3)}
+        
+        batched = engine.fit_many(series)
+        
+        for key, time_series in series.items():
+            single = engine.fit(time_series.timestamps, time_series.values)[0]
+            np.testing.assert_allclose(batched[key].coef, single.coef)
+            np.testing.assert_allclose(batched[key].forecast(3), single.forecast(3))
+    
+    def test_seasons_longer_than_the_window_are_left_out(self):
+        """Test that a short history still gets a daily model"""
+        model = FourierRegression().fit_many({'': self._series(days=3)})['']
+        
+        assert model.seasons == [(86400.0, 6)]
+        assert len(model.coef) == 2 + 2 * 6
+    
+    def test_detector_uses_fourier_engine(self):
+        """Test that weekly peaks are expected while spikes are still flagged"""
+        detector = AnomalyDetector(threshold=3.0, fourier=FourierRegression())
+        series = self._series(days=21)
+        mock_prom_client = Mock()
+        mock_prom_client.get_metric_history.return_value = series
+        next_timestamp = series.last_timestamp + 300
+        
+        mock_prom_client.get_current_value.return_value = float(self._pattern(next_timestamp))
+        normal = detector.detect_anomaly(mock_prom_client, 'test_metric')
+        mock_prom_client.get_current_value.return_value = float(self._pattern(next_timestamp)) + 30
+        spike = detector.detect_anomaly(mock_prom_client, 'test_metric')
+        
+        assert not normal['is_anomaly']
+        assert spike['is_anomaly']
+        assert 'method' not in spike
+        assert detector.tier_counts == Counter(fourier=2)
+
+
+class TestChangePointRefits:
+    """Test CUSUM change-point refit triggers"""
+    
+    def _state(self):
+        # Static model around 100 so residuals are the noise itself
+        return HoltWintersState(
+            alpha=0.0, beta=0.0, gamma=0.0, level=100.0, trend=0.0,
+            season=np.zeros(24), residual_std=1.0, last_timestamp=0.0, step_seconds=300.0
+        )
+    
+    def _advance(self, state, values):
+        timestamps = state.last_timestamp + 300.0 * np.arange(1, len(values) + 1)
+        return state.update_many(timestamps, np.asarray(values, dtype=float))
+    
+    def test_stable_series_never_fires(self):
+        """Test that noise around the model keeps the CUSUM low"""
+        registry = ModelRegistry(refit_interval_seconds=86400, change_point_threshold=5.0)
+        state = self._state()
+        
+        self._advance(state, 100 + np.random.default_rng(0).normal(0, 1, 2000))
+        
+        assert registry.refit_reason(state) is None
+    
+    def test_level_shift_fires_and_single_spike_does_not(self):
+        """Test that a sustained shift fires while one outlier is absorbed"""
+        registry = ModelRegistry(
+            refit_interval_seconds=86400, drift_threshold=100.0, change_point_threshold=5.0
+        )
+        state = self._state()
+        
+        self._advance(state, [100.0, 150.0, 100.0, 100.0])
+        assert registry.refit_reason(state) is None
+        
+        self._advance(state, [102.0] * 5)
+        assert registry.refit_reason(state) == 'change_point'
+        assert state.cusum_high > 5.0 and state.cusum_low == 0.0
+        
+        fields, season = state.to_checkpoint()
+        assert HoltWintersState.from_checkpoint(fields, season).change_score == state.change_score
+    
+    def test_refits_are_counted_by_reason(self):
+        """Test that the registry counts each full refit with its trigger"""
+        registry = ModelRegistry(
+            refit_interval_seconds=86400, drift_threshold=100.0, change_point_threshold=5.0
+        )
+        detector = AnomalyDetector(threshold=2.5, model_registry=registry)
+        t = np.arange(240)
+        values = 50 + 10 * np.sin(2 * np.pi * t / 24) + np.random.default_rng(1).normal(0, 1, 240)
+        
+        detector.get_model('test_metric', TimeSeriesBuffer.from_arrays(300.0 * t, values))
+        shifted = np.concatenate([values, values[-24:] + 20])
+        detector.get_model('test_metric', TimeSeriesBuffer.from_arrays(300.0 * np.arange(264), shifted))
+        
+        assert registry.refit_counts == {'missing': 1, 'change_point': 1}
+
+
+class TestAlertDispatcher:
+    """Test queued, batched alert delivery"""
+    
+    def _result(self, i=0):
+        return {
+            'metric': f'metric_{i}', 'expected_value': 100.0, 'actual_value': 200.0,
+            'deviation': 100.0, 'deviation_std': 5.0, 'severity': 'high', 'confidence': 0.9
+        }
+    
+    def test_slow_webhook_does_not_block_detection(self):
+        """Test that queuing returns immediately while senders wait on the webhook"""
+        alert_manager = AlertManager(webhook_url='http://test.com/webhook')
+        
+        with patch.object(alert_manager, 'send_webhook', side_effect=lambda p: time.sleep(0.2) or True):
+            dispatcher = AlertDispatcher(alert_manager, workers=2, linger_seconds=0)
+            start = time.monotonic()
+            queued = [dispatcher.generate_and_send_alert(self._result(i)) for i in range(4)]
+            elapsed = time.monotonic() - start
+            dispatcher.close()
+        
+        assert all(queued)
+        assert elapsed < 0.1
+        assert dispatcher.stats()['sent'] == 4
+    
+    def test_alerts_are_batched_within_linger(self):
+        """Test that alerts arriving together share one request"""
+        alert_manager = AlertManager(webhook_url='http://test.com/webhook')
+        
+        with patch.object(alert_manager, 'send_batch', return_value=True) as mock_batch:
+            dispatcher = AlertDispatcher(alert_manager, workers=1, batch_size=10, linger_seconds=0.3)
+            for i in range(3):
+                dispatcher.generate_and_send_alert(self._result(i))
+            dispatcher.close()
+        
+        mock_batch.assert_called_once()
+        assert [p['tags']['metric'] for p in mock_batch.call_args.args[0]] == [
+            'metric_0', 'metric_1', 'metric_2'
+        ]
+        assert dispatcher.stats()['batches'] == 1
+    
+    def test_full_queue_drops_and_counts(self):
+        """Test backpressure when senders cannot keep up"""
+        alert_manager = AlertManager(webhook_url='http://test.com/webhook')
+        release = threading.Event()
+        
+        with patch.object(alert_manager, 'send_webhook', side_effect=lambda p: release.wait(5)):
+            dispatcher = AlertDispatcher(alert_manager, max_queue=2, workers=1, linger_seconds=0)
+            dispatcher.generate_and_send_alert(self._result(0))
+            time.sleep(0.05)  # the sender is now blocked on the first alert
+            queued = [dispatcher.generate_and_send_alert(self._result(i)) for i in range(1, 5)]
+            stats = dispatcher.stats()
+            release.set()
+            dispatcher.close()
+        
+        assert queued == [True, True, False, False]
+        assert stats['dropped'] == 2
+        assert stats['queue_depth'] == 2
+        assert dispatcher.stats()['sent'] == 3
+    
+    def test_batch_is_posted_as_json_array(self):
+        """Test that send_batch posts one request with every payload"""
+        session = Mock()
+        session.post.return_value = Mock(status_code=200)
+        alert_manager = AlertManager(webhook_url='http://test.com/webhook', session=session)
+        
+        assert alert_manager.send_batch([{'title': 'a'}, {'title': 'b'}])
+        
+        assert session.post.call_args.kwargs['json'] == [{'title': 'a'}, {'title': 'b'}]
+
+
+class TestAlertDeduplication:
+    """Test alert fingerprinting, repeat suppression and resolve hysteresis"""
+    
+    def _result(self, severity='high', is_anomaly=True, route='/api'):
+        return {
+            'metric': 'latency', 'series': f'{{http_route="{route}"}}', 'labels': {'http_route': route},
+            'expected_value': 100.0, 'actual_value': 200.0, 'deviation': 100.0,
+            'deviation_std': 5.0, 'severity': severity, 'confidence': 0.9, 'is_anomaly': is_anomaly
+        }
+    
+    def test_sustained_anomaly_sent_once_until_repeat_interval(self):
+        """Test that an unchanged firing alert is only re-sent after the repeat interval"""
+        store = AlertStateStore(repeat_interval_seconds=3600)
+        key = fingerprint(self._result())
+        
+        decisions = [store.on_anomaly(self._result(), now=0)]
+        store.delivered(key, 'alerting', 'high', now=0)
+        decisions += [store.on_anomaly(self._result(), now=300 * i) for i in range(1, 12)]
+        
+        assert decisions[0] == 'new'
+        assert decisions[1:] == [None] * 11
+        assert store.on_anomaly(self._result(), now=3600) == 'repeat'
+        assert store.counts['suppressed'] == 11
+    
+    def test_escalation_is_sent_immediately(self):
+        """Test that a higher severity re-sends while a lower one stays suppressed"""
+        store = AlertStateStore(repeat_interval_seconds=3600)
+        
+        key = fingerprint(self._result())
+        
+        assert store.on_anomaly(self._result('medium'), now=0) == 'new'
+        store.delivered(key, 'alerting', 'medium', now=0)
+        assert store.on_anomaly(self._result('critical'), now=300) == 'escalated'
+        store.delivered(key, 'alerting', 'critical', now=300)
+        assert store.on_anomaly(self._result('high'), now=600) is None
+        assert fingerprint(self._result('medium')) == fingerprint(self._result('critical'))
+        assert fingerprint(self._result(route='/a')) != fingerprint(self._result(route='/b'))
+    
+    def test_resolve_needs_consecutive_normal_results(self):
+        """Test that a flapping series stays one alert and resolves after the hysteresis"""
+        alert_manager = AlertManager(
+            webhook_url='http://test.com/webhook',
+            state_store=AlertStateStore(resolve_after=2)
+        )
+        normal = self._result(is_anomaly=False)
+        
+        with patch.object(alert_manager, 'send_webhook', return_value=True) as mock_send:
+            assert alert_manager.generate_and_send_alert(self._result()) is True
+            assert alert_manager.resolve_alert(normal) is False
+            assert alert_manager.generate_and_send_alert(self._result()) is False
+            assert alert_manager.resolve_alert(normal) is False
+            assert alert_manager.resolve_alert(normal) is True
+            assert alert_manager.resolve_alert(normal) is False
+        
+        payloads = [call.args[0] for call in mock_send.call_args_list]
+        assert [p['state'] for p in payloads] == ['alerting', 'ok']
+        assert payloads[0]['annotations']['fingerprint'] == payloads[1]['annotations']['fingerprint']
+        assert payloads[0]['annotations']['notification'] == 'new'
+    
+    def test_resolve_in_flight_is_not_queued_again(self):
+        """Test that a slow receiver gets one resolved notification, and a failed one is retried"""
+        store = AlertStateStore(resolve_after=1)
+        key = fingerprint(self._result())
+        normal = self._result(is_anomaly=False)
+        store.on_anomaly(self._result(), now=0)
+        store.delivered(key, 'alerting', 'high', now=0)
+        
+        assert store.on_normal(normal, now=300) is True
+        assert store.on_normal(normal, now=600) is False
+        store.failed(key, 'ok')
+        assert store.on_normal(normal, now=900) is True
+        store.delivered(key, 'ok', now=900)
+        
+        assert len(store) == 0
+        assert store.counts['failed'] == 1
+    
+    def test_failed_webhook_is_resent_next_cycle(self):
+        """Test that an undelivered alert is not suppressed as already firing"""
+        alert_manager = AlertManager(
+            webhook_url='http://test.com/webhook',
+            state_store=AlertStateStore(repeat_interval_seconds=3600)
+        )
+        
+        with patch.object(alert_manager, 'send_webhook', side_effect=[False, True, True]) as mock_send:
+            assert alert_manager.generate_and_send_alert(self._result()) is False
+            assert alert_manager.generate_and_send_alert(self._result()) is True
+            assert alert_manager.generate_and_send_alert(self._result()) is False
+        
+        assert mock_send.call_count == 2
+        assert alert_manager.state_store.counts['failed'] == 1
+    
+    def test_dropped_alert_is_resent(self):
+        """Test that an alert dropped by a full dispatcher queue is retried"""
+        alert_manager = AlertManager(webhook_url='http://test.com/webhook', state_store=AlertStateStore())
+        release = threading.Event()
+        
+        with patch.object(alert_manager, 'send_webhook', side_effect=lambda p: release.wait(5)):
+            dispatcher = AlertDispatcher(alert_manager, max_queue=1, workers=1, linger_seconds=0)
+            dispatcher.generate_and_send_alert(self._result(route='/busy'))
+            time.sleep(0.1)
+            dispatcher.generate_and_send_alert(self._result(route='/queued'))
+            assert dispatcher.generate_and_send_alert(self._result(route='/dropped')) is False
+            release.set()
+            dispatcher.close()
+        
+        assert alert_manager.state_store.on_anomaly(self._result(route='/dropped')) == 'new'
+        assert alert_manager.state_store.on_anomaly(self._result(route='/queued')) is None
+    
+    def test_state_is_bounded_by_ttl_and_max_entries(self):
+        """Test that stale and excess alerts are evicted"""
+        store = AlertStateStore(ttl_seconds=600, max_entries=3)
+        
+        for i in range(5):
+            store.on_anomaly(self._result(route=f'/r{i}'), now=i)
+        assert len(store) == 3
+        
+        store.on_anomaly(self._result(route='/late'), now=1000)
+        assert len(store) == 1
+        assert store.counts['evicted'] == 5
+    
+    def test_dispatcher_skips_suppressed_alerts(self):
+        """Test that repeats never reach the alert queue"""
+        alert_manager = AlertManager(webhook_url='http://test.com/webhook', state_store=AlertStateStore())
+        
+        with patch.object(alert_manager, 'send_webhook', return_value=True):
+            dispatcher = AlertDispatcher(alert_manager, workers=1, linger_seconds=0)
+            queued = [dispatcher.generate_and_send_alert(self._result()) for _ in range(10)]
+            dispatcher.close()
+        
+        assert queued == [True] + [False] * 9
+        assert dispatcher.stats()['enqueued'] == 1
+
+
+class TestAlertOutbox:
+    """Test disk-backed alert delivery with retries"""
+    
+    def _result(self, i=0):
+        return {
+            'metric': f'metric_{i}', 'expected_value': 100.0, 'actual_value': 200.0,
+            'deviation': 100.0, 'deviation_std': 5.0, 'severity': 'high', 'confidence': 0.9
+        }
+    
+    def _wait_for(self, condition, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return condition()
+    
+    def test_failed_delivery_is_retried_with_backoff(self, tmp_path):
+        """Test that an alert survives a receiver outage"""
+        alert_manager = AlertManager(webhook_url='http://test.com/webhook')
+        outcomes = iter([503, None, 200])
+        
+        with patch.object(alert_manager, 'post_webhook', side_effect=lambda p, url=None: next(outcomes)) as mock_send:
+            outbox = AlertOutbox(alert_manager, str(tmp_path), workers=1, base_backoff_seconds=0.01)
+            start = time.monotonic()
+            assert outbox.generate_and_send_alert(self._result()) is True
+            assert time.monotonic() - start < 0.1
+            assert self._wait_for(lambda: outbox.stats()['sent'] == 1)
+            outbox.close()
+        
+        assert mock_send.call_count == 3
+        assert mock_send.call_args.kwargs['url'] == 'http://test.com/webhook'
+        assert outbox.stats()['retried'] == 2
+        assert outbox.stats()['pending'] == 0
+    
+    def test_client_errors_are_not_retried(self, tmp_path):
+        """Test that a 4xx rejection drops the alert while 429 is retried"""
+        alert_manager = AlertManager(webhook_url='http://test.com/webhook')
+        outcomes = iter([400, 429, 200])
+        
+        with patch.object(alert_manager, 'post_webhook', side_effect=lambda p, url=None: next(outcomes)) as mock_send:
+            outbox = AlertOutbox(alert_manager, str(tmp_path), workers=1, base_backoff_seconds=0.01)
+            outbox.generate_and_send_alert(self._result(0))
+            assert self._wait_for(lambda: outbox.stats()['rejected'] == 1)
+            outbox.generate_and_send_alert(self._result(1))
+            assert self._wait_for(lambda: outbox.stats()['sent'] == 1)
+            outbox.close()
+        
+        assert mock_send.call_count == 3
+        assert outbox.stats()['retried'] == 1
+        assert outbox.stats()['pending'] == 0
+    
+    def test_records_are_fsynced_off_the_detection_thread(self, tmp_path):
+        """Test that appended alerts are fsynced by the background thread"""
+        alert_manager = AlertManager(webhook_url='http://test.com/webhook')
+        outbox = AlertOutbox(alert_manager, str(tmp_path), workers=1, base_backoff_seconds=60)
+        synced_on = []
+        
+        with patch('alert_outbox.os.fsync', side_effect=lambda fd: synced_on.append(threading.current_thread())), \
+                patch.object(alert_manager, 'post_webhook', return_value=503):
+            outbox.generate_and_send_alert(self._result())
+            assert self._wait_for(lambda: synced_on)
+            outbox.close(timeout=0)
+        
+        assert threading.current_thread() not in synced_on
+        assert synced_on[0].name == 'alert-outbox-sync'
+    
+    def test_dedup_state_follows_the_delivery_outcome(self, tmp_path):
+        """Test that a rejected alert is sent again while a delivered one is suppressed"""
+        alert_manager = AlertManager(webhook_url='http://test.com/webhook', state_store=AlertStateStore())
+        outcomes = iter([400, 200])
+        
+        with patch.object(alert_manager, 'post_webhook', side_effect=lambda p, url=None: next(outcomes)):
+            outbox = AlertOutbox(alert_manager, str(tmp_path), workers=1)
+            assert outbox.generate_and_send_alert(self._result()) is True
+            assert self._wait_for(lambda: outbox.stats()['rejected'] == 1)
+            assert outbox.generate_and_send_alert(self._result()) is True
+            assert self._wait_for(lambda: outbox.stats()['sent'] == 1)
+            assert outbox.generate_and_send_alert(self._result()) is False
+            outbox.close()
+    
+    def test_backoff_grows_exponentially_with_jitter(self, tmp_path):
+        """Test that retry delays double up to the cap and are jittered"""
+        outbox = AlertOutbox(
+            Mock(webhook_url='http://test.com/webhook'), str(tmp_path),
+            base_backoff_seconds=1.0, max_backoff_seconds=8.0
+        )
+        
+        delays = [outbox._backoff(attempt) for attempt in range(1, 7)]
+        outbox.close()
+        
+        for delay, cap in zip(delays, [1, 2, 4, 8, 8, 8]):
+            assert cap / 2 <= delay <= cap
+    
+    def test_pending_alerts_survive_restart(self, tmp_path):
+        """Test that undelivered alerts are replayed from disk by the next outbox"""
+        alert_manager = AlertManager(webhook_url='http://test.com/webhook')
+        
+        with patch.object(alert_manager, 'post_webhook', return_value=503):
+            outbox = AlertOutbox(alert_manager, str(tmp_path), workers=1, base_backoff_seconds=60)
+            for i in range(3):
+                outbox.generate_and_send_alert(self._result(i))
+            outbox.close(timeout=1)
+        
+        with patch.object(alert_manager, 'post_webhook', return_value=200) as mock_send:
+            restarted = AlertOutbox(alert_manager, str(tmp_path), workers=1)
+            assert self._wait_for(lambda: restarted.stats()['sent'] == 3)
+            restarted.close()
+        
+        assert sorted(call.args[0]['tags']['metric'] for call in mock_send.call_args_list) == [
+            'metric_0', 'metric_1', 'metric_2'
+        ]
+    
+    def test_compaction_keeps_only_pending_alerts(self, tmp_path):
+        """Test that acknowledged alerts are removed from the outbox file"""
+        alert_manager = AlertManager(webhook_url='http://test.com/webhook')
+        
+        with patch.object(alert_manager, 'post_webhook', return_value=200):
+            outbox = AlertOutbox(alert_manager, str(tmp_path), workers=1, compact_after=5)
+            for i in range(10):
+                outbox.generate_and_send_alert(self._result(i))
+            assert self._wait_for(lambda: outbox.stats()['sent'] == 10)
+            outbox.close()
+        
+        assert outbox.stats()['compactions'] == 2
+        assert (tmp_path / 'alert_outbox.jsonl').read_text() == ''
+    
+    def test_concurrency_limited_per_destination(self, tmp_path):
+        """Test that one webhook never sees more than the allowed parallel requests"""
+        alert_manager = AlertManager(webhook_url='http://test.com/webhook')
+        lock = threading.Lock()
+        active, peak = [0], [0]
+        
+        def slow_send(payload, url=None):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            return 200
+        
+        with patch.object(alert_manager, 'post_webhook', side_effect=slow_send):
+            outbox = AlertOutbox(alert_manager, str(tmp_path), workers=4, per_destination=2)
+            for i in range(8):
+                outbox.generate_and_send_alert(self._result(i))
+            assert self._wait_for(lambda: outbox.stats()['sent'] == 8)
+            outbox.close()
+        
+        assert peak[0] == 2
+
+
+class TestScheduler:
+    """Test drift-free per-metric scheduling"""
+    
+    class _Clock:
+        def __init__(self, now=1000.0):
+            self.now = now
+        
+        def __call__(self):
+            return self.now
+    
+    def test_runs_stay_on_timeline_despite_cycle_time(self):
+        """Test that the time a run takes does not shift later runs"""
+        clock = self._Clock()
+        scheduler = Scheduler(clock=clock)
+        scheduler.add('latency', 300)
+        
+        starts = []
+        for _ in range(5):
+            clock.now += scheduler.seconds_until_next()
+            assert [job.name for job in scheduler.due()] == ['latency']
+            starts.append(clock.now)
+            clock.now += 40  # time spent in the cycle
+        
+        assert starts == [1000.0 + 300 * i for i in range(5)]
+    
+    def test_per_metric_intervals_and_priorities(self):
+        """Test that metrics keep their own cadence and higher priorities run first"""
+        clock = self._Clock()
+        scheduler = Scheduler(clock=clock)
+        scheduler.add('latency', 300, priority=0)
+        scheduler.add('errors', 30, priority=10)
+        
+        runs = []
+        while clock.now < 1000 + 300:
+            runs.append([job.name for job in scheduler.due()])
+            clock.now += scheduler.seconds_until_next()
+        
+        assert runs[0] == ['errors', 'latency']
+        assert sum(names.count('errors') for names in runs) == 10
+        assert sum(names.count('latency') for names in runs) == 1
+    
+    def test_overdue_runs_are_coalesced(self):
+        """Test that a stall runs each job once and skips missed slots"""
+        clock = self._Clock()
+        scheduler = Scheduler(clock=clock)
+        scheduler.add('errors', 30)
+        scheduler.due()
+        
+        clock.now += 100  # slots at 1030, 1060 and 1090 missed
+        assert len(scheduler.due()) == 1
+        assert scheduler.due() == []
+        stats = scheduler.stats()
+        assert stats['skipped_runs'] == 2
+        assert stats['lag_seconds'] == pytest.approx(70)
+        assert scheduler.jobs['errors'].next_run == 1120
+    
+    def test_jitter_is_bounded_and_not_cumulative(self):
+        """Test that jitter delays each slot by at most a tenth of the interval"""
+        clock = self._Clock()
+        scheduler = Scheduler(jitter_seconds=60, clock=clock)
+        scheduler.add('errors', 30)
+        
+        for slot in range(50):
+            job = scheduler.jobs['errors']
+            assert 1000 + 30 * slot <= job.next_run <= 1000 + 30 * slot + 3
+            clock.now = job.next_run
+            scheduler.due()
+    
+    def test_parse_schedule(self):
+        """Test parsing per-metric intervals and priorities"""
+        assert parse_schedule('errors=30s:10, latency=5m') == {
+            'errors': (30.0, 10), 'latency': (300.0, 0)
+        }
+        assert parse_schedule('') == {}
+
+
+class TestSharding:
+    """Test consistent-hash sharding of series across replicas"""
+    
+    _keys = [f'{{http_route="/r{i}",service_name="svc{i % 7}"}}' for i in range(2000)]
+    
+    def test_every_series_has_exactly_one_owner(self):
+        """Test that replicas split the series without overlap and roughly evenly"""
+        shards = [Shard(index, 3) for index in range(3)]
+        
+        owners = [[shard.index for shard in shards if shard.owns('latency', key)] for key in self._keys]
+        
+        assert all(len(owner) == 1 for owner in owners)
+        counts = Counter(owner[0] for owner in owners)
+        assert all(500 <= counts[index] <= 850 for index in range(3))
+    
+    def test_adding_a_replica_moves_only_its_share(self):
+        """Test that growing from 3 to 4 replicas only moves series to the new one"""
+        before, after = HashRing(3), HashRing(4)
+        
+        moved = [key for key in self._keys if before.shard_for(key) != after.shard_for(key)]
+        
+        assert all(after.shard_for(key) == 3 for key in moved)
+        assert 0.15 < len(moved) / len(self._keys) < 0.35
+    
+    def test_index_from_statefulset_hostname(self):
+        """Test taking the replica index from the pod name when not configured"""
+        assert Shard.from_env('', 3, 'anomaly-detector-2').index == 2
+        assert Shard.from_env('1', 3, 'anomaly-detector-2').index == 1
+        with pytest.raises(ValueError):
+            Shard.from_env('', 3, 'anomaly-detector-7d9f8')
+        with pytest.raises(ValueError):
+            Shard(3, 3)
+    
+    def test_selection_and_checkpoint_restricted_to_own_shard(self, tmp_path):
+        """Test that a replica only queries and restores its own series"""
+        shard = Shard(0, 2)
+        top = [{'http_route': f'/r{i}'} for i in range(20)]
+        mock_prom_client = Mock()
+        mock_prom_client.get_top_series.return_value = top
+        
+        with patch.object(main.Config, 'SERIES_GROUP_BY', ['http_route']):
+            selected = main.select_series(mock_prom_client, shard)
+        
+        assert selected == [labels for labels in top if shard.owns('', series_key(labels))]
+        assert 0 < len(selected) < len(top)
+        
+        state = HoltWintersState(
+            alpha=0.3, beta=0.1, gamma=0.2, level=10.0, trend=0.5,
+            season=np.arange(4, dtype=float), residual_std=1.5,
+            last_timestamp=1000.0, step_seconds=300.0
+        )
+        registry = ModelRegistry()
+        for labels in top:
+            registry.put('latency', state, series_key(labels))
+        CheckpointStore(str(tmp_path)).save(model_registry=registry)
+        
+        restored = ModelRegistry()
+        CheckpointStore(str(tmp_path)).load(model_registry=restored, owns=shard.owns)
+        
+        assert sorted(key for _, key in restored.export()) == sorted(series_key(l) for l in selected)
+    
+    def test_each_shard_keeps_its_own_top_k(self):
+        """Test that ownership is applied before the cardinality cap"""
+        shard = Shard(1, 2)
+        top = [{'http_route': f'/r{i}'} for i in range(40)]
+        mock_prom_client = Mock()
+        mock_prom_client.get_top_series.return_value = top
+        
+        with patch.object(main.Config, 'SERIES_GROUP_BY', ['http_route']), \
+                patch.object(main.Config, 'MAX_SERIES_PER_METRIC', 5):
+            selected = main.select_series(mock_prom_client, shard)
+        
+        assert mock_prom_client.get_top_series.call_args.kwargs['limit'] == 10
+        assert selected == [labels for labels in top if shard.owns('', series_key(labels))][:5]
+        assert len(selected) == 5
 
 
 class TestEndToEndScenarios:
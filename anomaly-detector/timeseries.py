@@ -0,0 +1,226 @@
+import numpy as np
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+# Seconds per Prometheus duration unit
+STEP_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_step(step: str) -> int:
+    """
+    Convert a Prometheus step string (e.g. '5m') into seconds
+
+    Args:
+        step: Step string with a single unit suffix
+
+    Returns:
+        Step length in seconds
+    """
+    unit = step[-1]
+    if unit not in STEP_UNITS:
+        return int(float(step))
+    return int(float(step[:-1]) * STEP_UNITS[unit])
+
+
+def series_key(labels: Optional[Dict[str, str]]) -> str:
+    """
+    Build a canonical identifier for a label set
+
+    Args:
+        labels: Series labels, or None/empty for an aggregated series
+
+    Returns:
+        String like '{http_route="/api",service_name="demo-app"}', '' if no labels
+    """
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{labels[k]}"' for k in sorted(labels)) + '}'
+
+
+class TimeSeriesBuffer:
+    """Fixed-capacity ring buffer of (timestamp, value) samples backed by NumPy arrays"""
+
+    def __init__(
+        self,
+        capacity: int,
+        value_dtype=np.float64,
+        labels: Optional[Dict[str, str]] = None
+    ):
+        """
+        Initialize an empty buffer
+
+        Every sample is stored twice, at slot i and i + capacity, so the live
+        window is always one contiguous slice and can be handed out as a view.
+
+        Args:
+            capacity: Maximum number of samples kept; older samples are overwritten
+            value_dtype: NumPy dtype for values (float64 or float32)
+            labels: Labels identifying the series, empty for an aggregate
+        """
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = int(capacity)
+        self._timestamps = np.empty(2 * self.capacity, dtype=np.float64)
+        self._values = np.empty(2 * self.capacity, dtype=value_dtype)
+        self.labels = dict(labels or {})
+        self._head = 0
+        self._size = 0
+
+    @property
+    def key(self) -> str:
+        """Canonical series identifier built from the labels"""
+        return series_key(self.labels)
+
+    @classmethod
+    def from_arrays(
+        cls,
+        timestamps: np.ndarray,
+        values: np.ndarray,
+        capacity: Optional[int] = None,
+        value_dtype=np.float64,
+        labels: Optional[Dict[str, str]] = None
+    ) -> 'TimeSeriesBuffer':
+        """
+        Build a buffer from timestamp and value arrays sorted by timestamp
+
+        Args:
+            timestamps: Sample timestamps in seconds
+            values: Sample values
+            capacity: Buffer capacity, defaults to the number of samples
+            value_dtype: NumPy dtype for values
+            labels: Labels identifying the series
+
+        Returns:
+            New TimeSeriesBuffer holding the samples
+        """
+        buffer = cls(capacity or max(len(timestamps), 1), value_dtype=value_dtype, labels=labels)
+        buffer.extend(timestamps, values)
+        return buffer
+
+    @classmethod
+    def from_pairs(
+        cls,
+        pairs: Iterable[Tuple[float, float]],
+        capacity: Optional[int] = None,
+        value_dtype=np.float64
+    ) -> 'TimeSeriesBuffer':
+        """
+        Build a buffer from (timestamp, value) pairs sorted by timestamp
+
+        Args:
+            pairs: Iterable of (timestamp, value) tuples
+            capacity: Buffer capacity, defaults to the number of samples
+            value_dtype: NumPy dtype for values
+
+        Returns:
+            New TimeSeriesBuffer holding the samples
+        """
+        pairs = list(pairs)
+        timestamps = np.fromiter((t for t, _ in pairs), dtype=np.float64, count=len(pairs))
+        values = np.fromiter((v for _, v in pairs), dtype=np.float64, count=len(pairs))
+        return cls.from_arrays(timestamps, values, capacity=capacity, value_dtype=value_dtype)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Tuple[float, float]]:
+        return zip(self.timestamps.tolist(), self.values.tolist())
+
+    @property
+    def _start(self) -> int:
+        start = self._head - self._size
+        return start if start >= 0 else start + self.capacity
+
+    def _view(self, array: np.ndarray) -> np.ndarray:
+        start = self._start
+        view = array[start:start + self._size]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        """Read-only view of timestamps, oldest first"""
+        return self._view(self._timestamps)
+
+    @property
+    def values(self) -> np.ndarray:
+        """Read-only view of values, oldest first"""
+        return self._view(self._values)
+
+    @property
+    def last_timestamp(self) -> Optional[float]:
+        """Timestamp of the newest sample or None if empty"""
+        if not self._size:
+            return None
+        return float(self._timestamps[self._head + self.capacity - 1])
+
+    def append(self, timestamp: float, value: float):
+        """
+        Append one sample, overwriting the oldest one when full
+
+        Args:
+            timestamp: Sample timestamp in seconds
+            value: Sample value
+        """
+        i = self._head
+        self._timestamps[i] = self._timestamps[i + self.capacity] = timestamp
+        self._values[i] = self._values[i + self.capacity] = value
+        self._head = (i + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def extend(self, timestamps: np.ndarray, values: np.ndarray):
+        """
+        Append many samples at once
+
+        Args:
+            timestamps: Sample timestamps in seconds, sorted
+            values: Sample values
+        """
+        count = len(timestamps)
+        if count == 0:
+            return
+        if count > self.capacity:
+            timestamps = timestamps[-self.capacity:]
+            values = values[-self.capacity:]
+            count = self.capacity
+
+        slots = (self._head + np.arange(count)) % self.capacity
+        self._timestamps[slots] = timestamps
+        self._timestamps[slots + self.capacity] = timestamps
+        self._values[slots] = values
+        self._values[slots + self.capacity] = values
+        self._head = (self._head + count) % self.capacity
+        self._size = min(self._size + count, self.capacity)
+
+    def drop_before(self, cutoff: float) -> int:
+        """
+        Drop samples older than a cutoff timestamp
+
+        Args:
+            cutoff: Samples with timestamp < cutoff are dropped
+
+        Returns:
+            Number of samples dropped
+        """
+        dropped = int(np.searchsorted(self.timestamps, cutoff, side='left'))
+        self._size -= dropped
+        return dropped
+
+    def to_pairs(self) -> List[Tuple[float, float]]:
+        """Return the samples as a list of (timestamp, value) tuples"""
+        return list(self)
+
+
+def as_buffer(time_series) -> TimeSeriesBuffer:
+    """
+    Coerce a time series into a TimeSeriesBuffer
+
+    Args:
+        time_series: TimeSeriesBuffer or sequence of (timestamp, value) tuples
+
+    Returns:
+        The buffer itself, or a new buffer holding the pairs
+    """
+    if isinstance(time_series, TimeSeriesBuffer):
+        return time_series
+    return TimeSeriesBuffer.from_pairs(time_series)